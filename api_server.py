@@ -0,0 +1,346 @@
+"""
+Local JSON-RPC 2.0 API over HTTP for scripts (comskip post-processing, intro
+detectors) that want to read and write segments without hand-writing EDLs.
+
+The server binds to 127.0.0.1 only and accepts POST /jsonrpc. A request body
+may be a single call or a batch (JSON array); within one call, the "videos"
+and "items" parameters take lists so thousands of videos can be handled in
+one round trip, fanned out over the library thread pool.
+
+Requests need Content-Type: application/json and no Origin header, which a
+web page open in a local browser can't send without a preflight the server
+never answers. Files the API writes (export output, validation report)
+must be inside the addon profile or one of the configured library roots.
+
+Methods:
+    segments.list      {"directory", "recursive"=false}
+    segments.get       {"videos": [path, ...]}
+    segments.set       {"items": [{"video", "segments", "formats"}, ...]}
+    segments.validate  {"videos": [path, ...]} or {"items": [{"video", "segments"}, ...]}
+    segments.import    {"dump", "roots", "formats"=["edl"], "use_fingerprints"=false, "dry_run"=false,
+                        "replace"=false}
+    segments.export    {"roots", "output"}  (NDJSON backup)
+    segments.restore   {"path", "dry_run"=false}
+    segments.validate_library  {"roots", "report"=<profile>/validation_report.txt, "full"=false}
+
+"formats" are sidecar format names from sidecar_formats (edl, xml, comskip,
+mplayer, ffmetadata, webvtt).
+
+Segments are {"start_ms", "end_ms", "label", "action_type"}; "start"/"end"
+may be given instead as seconds or HH:MM:SS.mmm strings.
+"""
+import hmac
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import xbmcvfs
+
+from segment_parser import validate_segments, get_action_mapping
+from library import (
+    list_directory, walk_directories, group_sidecars, parallel_map, read_video_segments,
+    sibling_dir, segment_to_dict, segment_from_dict, DEFAULT_WORKERS
+)
+from segment_store import bulk_write_segments
+from sidecar_formats import format_names
+from media_probe import get_video_duration_ms
+from importer import import_dump
+from backup import export_library, import_library, IMPORT_BATCH_SIZE
+from validator import validate_library
+from watcher import get_library_roots
+from jobs import Job, PRIORITY_NORMAL
+from utils import log, log_always, get_profile_path
+
+API_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+# How long a library-wide call waits for its job before answering with an error
+JOB_TIMEOUT_SECONDS = 30 * 60
+VALID_FORMATS = tuple(format_names())
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+class APIError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+def _segment_from_dict(data):
+    try:
+        return segment_from_dict(data, "api")
+    except (KeyError, TypeError, ValueError) as e:
+        raise APIError(INVALID_PARAMS, f"invalid segment {data!r}: {e}")
+
+def _require_list(params, key):
+    value = params.get(key)
+    if not isinstance(value, list):
+        raise APIError(INVALID_PARAMS, f"'{key}' must be a list")
+    return value
+
+def _resolve_path(path):
+    """Comparable form of a local path or VFS URL (symlinks and '..' resolved for local paths)"""
+    path = xbmcvfs.translatePath(path)
+    if "://" in path:
+        return path.rstrip("/")
+    return os.path.realpath(path)
+
+def _writable_path(params, key):
+    """Return params[key] if it names a file inside the addon profile or a library root"""
+    path = params.get(key)
+    if not isinstance(path, str) or ("://" in path and ".." in path.split("/")):
+        raise APIError(INVALID_PARAMS, f"'{key}' must be a path inside the addon profile or a library root")
+    target = _resolve_path(path)
+    for root in [get_profile_path()] + get_library_roots():
+        root = _resolve_path(root)
+        sep = "/" if "://" in root else os.sep
+        if target.startswith(root.rstrip(sep) + sep):
+            return path
+    raise APIError(INVALID_PARAMS, f"'{key}' must be a path inside the addon profile or a library root")
+
+def _sidecars_by_video(videos):
+    """Map each video to its sidecars using one listing per directory"""
+    listings = {}
+    for video in videos:
+        directory = sibling_dir(video)
+        if directory not in listings:
+            listings[directory] = dict(group_sidecars(directory, list_directory(directory)[1]))
+    return {video: listings[sibling_dir(video)].get(video, {}) for video in videos}
+
+class SegmentAPI:
+    """Method implementations; each takes a params dict and returns a JSON-serializable result"""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, scheduler=None):
+        self.max_workers = max_workers
+        self.scheduler = scheduler
+        self.methods = {
+            "segments.list": self.list,
+            "segments.get": self.get,
+            "segments.set": self.set,
+            "segments.validate": self.validate,
+            "segments.import": self.import_dump,
+            "segments.export": self.export,
+            "segments.restore": self.restore,
+            "segments.validate_library": self.validate_library,
+        }
+
+    def _run_job(self, name, func, *args):
+        """Run library-wide work through the service's job scheduler (throttled during playback)"""
+        if not self.scheduler:
+            return func(*args)
+        job = self.scheduler.submit(func, *args, name=name, priority=PRIORITY_NORMAL)
+        result = job.wait(JOB_TIMEOUT_SECONDS)
+        if job.status in (Job.QUEUED, Job.RUNNING):
+            raise APIError(
+                INTERNAL_ERROR, f"'{name}' did not finish within {JOB_TIMEOUT_SECONDS}s; it keeps running in the background"
+            )
+        return result
+
+    def list(self, params):
+        directory = params.get("directory")
+        if not directory:
+            raise APIError(INVALID_PARAMS, "'directory' is required")
+        walker = walk_directories(directory) if params.get("recursive") else [(directory,) + list_directory(directory)]
+        return [
+            {"video": video, "sidecars": sidecars}
+            for current, _, files in walker
+            for video, sidecars in group_sidecars(current, files)
+        ]
+
+    def get(self, params):
+        videos = _require_list(params, "videos")
+        sidecars = _sidecars_by_video(videos)
+        action_mapping = get_action_mapping()
+        segments = parallel_map(
+            lambda video: read_video_segments(sidecars[video], action_mapping), videos, self.max_workers
+        )
+        return {video: [segment_to_dict(seg) for seg in segs] for video, segs in zip(videos, segments)}
+
+    def set(self, params):
+        items = []
+        for item in _require_list(params, "items"):
+            video = item.get("video") if isinstance(item, dict) else None
+            if not video:
+                raise APIError(INVALID_PARAMS, "every item needs a 'video'")
+            formats = tuple(item.get("formats") or ("edl",))
+            if not set(formats) <= set(VALID_FORMATS):
+                raise APIError(INVALID_PARAMS, f"formats must be among {VALID_FORMATS}")
+            segments = [_segment_from_dict(seg) for seg in item.get("segments", [])]
+            segments.sort(key=lambda s: (s.start_ms, s.end_ms))
+            items.append((video, segments, formats))
+        return bulk_write_segments(items, self.max_workers)
+
+    def validate(self, params):
+        action_mapping = get_action_mapping()
+        if "items" in params:
+            jobs = [
+                (item["video"], [_segment_from_dict(seg) for seg in item.get("segments", [])])
+                for item in _require_list(params, "items")
+            ]
+        else:
+            videos = _require_list(params, "videos")
+            sidecars = _sidecars_by_video(videos)
+            jobs = parallel_map(
+                lambda video: (video, read_video_segments(sidecars[video], action_mapping)), videos, self.max_workers
+            )
+
+        def check(job):
+            video, segments = job
+            issues = validate_segments(segments, get_video_duration_ms(video), action_mapping)
+            return {
+                "video": video,
+                "issues": [{"index": i, "severity": severity, "message": message} for i, severity, message in issues]
+            }
+
+        return parallel_map(check, jobs, self.max_workers)
+
+    def import_dump(self, params):
+        if not params.get("dump") or not params.get("roots"):
+            raise APIError(INVALID_PARAMS, "'dump' and 'roots' are required")
+        formats = tuple(params.get("formats") or ("edl",))
+        if not set(formats) <= set(VALID_FORMATS):
+            raise APIError(INVALID_PARAMS, f"formats must be among {VALID_FORMATS}")
+        return self._run_job(
+            "import dump", import_dump, params["dump"], params["roots"], formats,
+            bool(params.get("use_fingerprints")), bool(params.get("dry_run")), self.max_workers,
+            bool(params.get("replace"))
+        )
+
+    def export(self, params):
+        if not params.get("roots") or not params.get("output"):
+            raise APIError(INVALID_PARAMS, "'roots' and 'output' are required")
+        output = _writable_path(params, "output")
+        return self._run_job("export library", export_library, params["roots"], output, self.max_workers)
+
+    def restore(self, params):
+        if not params.get("path"):
+            raise APIError(INVALID_PARAMS, "'path' is required")
+        return self._run_job(
+            "restore library", import_library, params["path"], bool(params.get("dry_run")),
+            IMPORT_BATCH_SIZE, self.max_workers
+        )
+
+    def validate_library(self, params):
+        if not params.get("roots"):
+            raise APIError(INVALID_PARAMS, "'roots' is required")
+        report = _writable_path(params, "report") if params.get("report") else None
+        return self._run_job(
+            "validate library", validate_library, params["roots"], report, bool(params.get("full"))
+        )
+
+    def call(self, request):
+        """Execute one JSON-RPC request object; returns the response object or None for notifications"""
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or "method" not in request:
+                raise APIError(INVALID_REQUEST, "invalid JSON-RPC 2.0 request")
+            method = self.methods.get(request["method"])
+            if method is None:
+                raise APIError(METHOD_NOT_FOUND, f"unknown method {request['method']}")
+            params = request.get("params") or {}
+            if not isinstance(params, dict):
+                raise APIError(INVALID_PARAMS, "params must be an object")
+            response = {"jsonrpc": "2.0", "id": request_id, "result": method(params)}
+        except APIError as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": str(e)}}
+        except Exception as e:
+            log(f"❌ API method failed: {e}")
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": INTERNAL_ERROR, "message": str(e)}}
+        if isinstance(request, dict) and "id" not in request:
+            return None
+        return response
+
+    def handle(self, body):
+        """Handle a raw request body (single call or batch); returns the response body or None"""
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": str(e)}}
+        if isinstance(payload, list):
+            if not payload:
+                return {"jsonrpc": "2.0", "id": None, "error": {"code": INVALID_REQUEST, "message": "empty batch"}}
+            responses = [response for response in map(self.call, payload) if response is not None]
+            return responses or None
+        return self.call(payload)
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    server_version = "SegmentEditorAPI/1.0"
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        token = self.server.token
+        if not token:
+            return True
+        header = self.headers.get("Authorization", "")
+        return hmac.compare_digest(header, f"Bearer {token}")
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/jsonrpc":
+            self._send_json(404, {"error": "not found"})
+            return
+        if not self._authorized():
+            self._send_json(401, {"error": "unauthorized"})
+            return
+        # Browsers send Origin, and can only POST JSON after a CORS preflight we don't answer
+        if self.headers.get("Origin"):
+            self._send_json(403, {"error": "cross-origin requests are not allowed"})
+            return
+        if self.headers.get_content_type() != "application/json":
+            self._send_json(415, {"error": "Content-Type must be application/json"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_REQUEST_BYTES:
+            self._send_json(413 if length > 0 else 411, {"error": "bad request size"})
+            return
+        response = self.server.api.handle(self.rfile.read(length))
+        if response is None:
+            self.send_response(204)
+            self.end_headers()
+        else:
+            self._send_json(200, response)
+
+    def log_message(self, format, *args):
+        log(f"🌐 API {self.address_string()} {format % args}")
+
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=DEFAULT_PORT, token="", max_workers=DEFAULT_WORKERS, scheduler=None):
+        super().__init__((API_HOST, port), APIRequestHandler)
+        self.api = SegmentAPI(max_workers, scheduler)
+        self.token = token
+
+def start_api_server(port=DEFAULT_PORT, token="", scheduler=None):
+    """Start the API server on a daemon thread. Returns the server, or None if it couldn't bind."""
+    try:
+        server = APIServer(port, token, scheduler=scheduler)
+    except OSError as e:
+        log_always(f"❌ Could not start segment API on {API_HOST}:{port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log_always(f"🌐 Segment API listening on http://{API_HOST}:{port}/jsonrpc")
+    return server
+
+def stop_api_server(server):
+    if server:
+        server.shutdown()
+        server.server_close()
+        log_always("🌐 Segment API stopped")
@@ -0,0 +1,88 @@
+"""
+NDJSON backup of every segment in the library.
+
+Export walks the library one directory at a time and streams one JSON object
+per video to the output through a buffered VFS writer; import streams the
+file back line by line and rewrites sidecars in batches. Neither direction
+holds more than one directory / batch in memory.
+
+Record format (one per line):
+    {"video": path, "formats": ["edl", "xml"], "segments": [{"start_ms", "end_ms", "label", "action_type", "source"}]}
+"""
+import json
+
+from segment_parser import get_action_mapping
+from library import (
+    walk_directories, group_sidecars, parallel_map, read_video_segments,
+    segment_to_dict, segment_from_dict, DEFAULT_WORKERS
+)
+from segment_store import bulk_write_segments
+from utils import log, log_always, iter_lines, BufferedVFSWriter
+
+IMPORT_BATCH_SIZE = 500
+
+def export_library(roots, output_path, max_workers=DEFAULT_WORKERS):
+    """Write every video with segments under roots to an NDJSON file. Returns a summary dict."""
+    if isinstance(roots, str):
+        roots = [roots]
+    summary = {"videos": 0, "segments": 0, "bytes": 0}
+    action_mapping = get_action_mapping()
+    with BufferedVFSWriter(output_path) as writer:
+        for root in roots:
+            for directory, _, files in walk_directories(root):
+                jobs = [(video, sidecars) for video, sidecars in group_sidecars(directory, files) if sidecars]
+                if not jobs:
+                    continue
+                results = parallel_map(
+                    lambda job: read_video_segments(job[1], action_mapping), jobs, max_workers
+                )
+                for (video, sidecars), segments in zip(jobs, results):
+                    if not segments:
+                        continue
+                    record = {
+                        "video": video,
+                        "formats": sorted(sidecars),
+                        "segments": [segment_to_dict(seg) for seg in segments],
+                    }
+                    writer.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+                    summary["videos"] += 1
+                    summary["segments"] += len(segments)
+    summary["bytes"] = writer.bytes_written
+    log_always(f"📤 Exported {summary['videos']} videos / {summary['segments']} segments to {output_path}")
+    return summary
+
+def iter_export(path):
+    """Yield (video_path, formats, segments) records from an NDJSON export, skipping bad lines"""
+    for number, line in enumerate(iter_lines(path), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            segments = [segment_from_dict(seg, "backup") for seg in record.get("segments", [])]
+            yield record["video"], tuple(record.get("formats") or ("edl",)), segments
+        except (ValueError, KeyError, TypeError) as e:
+            log(f"⚠️ Skipping invalid line {number} of {path}: {e}")
+
+def import_library(path, dry_run=False, batch_size=IMPORT_BATCH_SIZE, max_workers=DEFAULT_WORKERS):
+    """Restore sidecars from an NDJSON export, writing in parallel batches. Returns a summary dict."""
+    summary = {"videos": 0, "written": 0, "failed": 0}
+    batch = []
+
+    def write_batch():
+        if dry_run:
+            return
+        results = bulk_write_segments(batch, max_workers)
+        summary["failed"] += sum(1 for r in results if r["error"])
+        summary["written"] += sum(1 for r in results if not r["error"])
+
+    for video, formats, segments in iter_export(path):
+        summary["videos"] += 1
+        batch.append((video, segments, formats))
+        if len(batch) >= batch_size:
+            write_batch()
+            batch = []
+    if batch:
+        write_batch()
+
+    log_always(f"📥 Restored {summary['written']} of {summary['videos']} videos from {path} ({summary['failed']} failed)")
+    return summary
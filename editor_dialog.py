@@ -3,26 +3,59 @@ import xbmc
 import xbmcaddon
 import time
 import threading
+import functools
 import os
 
-from segment_parser import SegmentItem, seconds_to_hms, hms_to_seconds, save_edl, save_chapters
+from segment_parser import (
+    SegmentItem, ChapterDocument, ms_to_hms, hms_to_ms, seconds_to_ms, safe_file_read,
+    retime_segments, speed_ratio, find_out_of_range, clamp_segments, find_nested_and_overlapping,
+    normalize_segments, get_normalize_rules, merge_segment_lists
+)
+from media_probe import get_video_duration_ms, load_keyframe_index
+from video_identity import snapshot_sidecars_async
+from library import sidecar_kind
+from sidecar_formats import get_save_format, resolve_save_kinds
+from segment_store import write_segments, target_label, propagate_to_season
+from sidecar_sync import detect_concurrent_change, rebase_on_disk, mark_saved, SidecarPoller
+from season_analysis import suggest_for_video
+from subtitle_analysis import suggest_from_subtitles
 from utils import get_addon, log, log_always
 
+# Marks further than this from any keyframe are left where they are
+KEYFRAME_SNAP_MAX_DISTANCE_MS = 10000
+
+# Buttons made visible and enabled the first time the dialog is shown
+BUTTON_IDS = [5002, 5003, 5004, 5005, 5006, 5007, 5009, 5010, 5011, 5012, 5013, 5014, 5015, 5016, 5017, 5018, 5019, 5020, 5021, 5022, 5023, 5024, 5025]
+# Controls whose handles are looked up once, on the first onInit
+CACHED_CONTROL_IDS = [5000, 5001, 5008] + BUTTON_IDS
+
+def edits_segments(handler):
+    """Run a handler that changes self.segments with the live reload held off.
+
+    The reload runs on the time display thread and skips a poll while the lock
+    is held, so a sidecar rewritten during an edit (prompts included) is merged
+    on the next poll instead of replacing the list under the handler.
+    """
+    @functools.wraps(handler)
+    def wrapper(self, *args, **kwargs):
+        with self._sync_lock:
+            return handler(self, *args, **kwargs)
+    return wrapper
+
 class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
+    """The editor window. The service keeps one instance alive and calls reset()
+    before each doModal(), so the skin XML is parsed and the controls are looked
+    up only once per Kodi session."""
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args)
-        self.video_path = kwargs.get("video_path")
-        self.segments = kwargs.get("segments", [])
-        self.current_time = kwargs.get("current_time", 0)
-        self.segments_modified = False
-        self.selected_index = -1
+        self.controls = {}  # Control handles by ID, filled on first use
+        # Last value pushed per (control ID, attribute) / (None, window property); unchanged values aren't re-sent
+        self._pushed = {}
+        self._initialized = False  # Set once the first onInit has set up the controls
+        self._session = 0  # Bumped by reset(); background threads of an earlier session stop
+        self._sync_lock = threading.RLock()  # Serializes live reload with edits and save-time conflict checks
         self.player = xbmc.Player()
-        self._closing = False
-        self.pending_start_time = None
-        self.pending_end_time = None
-        self.is_paused = False
-        self._explicit_click = False  # Flag to track explicit clicks vs focus changes
-        self._previous_focus = None  # Track previous focus to detect navigation source
         
         # Get addon icon path for notifications
         try:
@@ -32,30 +65,114 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         except:
             self.icon_path = None
         
-        log(f"📦 SegmentEditorDialog initialized with {len(self.segments)} segments")
+        self.reset(**kwargs)
+    
+    def reset(self, **kwargs):
+        """Start a new editing session (same keyword arguments as the constructor)"""
+        self._session += 1
+        self.video_path = kwargs.get("video_path")
+        self.segments = kwargs.get("segments", [])
+        # All times in the dialog are integer milliseconds; player floats are converted on entry
+        self.current_ms = seconds_to_ms(kwargs.get("current_time") or 0)
+        self.segments_modified = False
+        self.duration_ms = kwargs.get("duration_ms")  # Probed from the container header in onInit
+        self.keyframe_index = None  # Loaded in the background when keyframe snapping is enabled
+        self.season_suggestions = []  # [(SegmentItem, confidence)] inferred from sibling episodes
+        self.subtitle_suggestions = []  # [(SegmentItem, confidence)] from sidecar subtitles
+        self.chapter_document = kwargs.get("chapter_document")  # Parsed chapter XML, all editions
+        self.sidecars = kwargs.get("sidecars") or {}  # {format: path} found when loading
+        # Edition being edited; the others are written back unchanged
+        self.edition = self.chapter_document.default_edition() if self.chapter_document else None
+        self.sidecar_state = kwargs.get("sidecar_state")  # Load-time stat + segments for concurrent-edit detection
+        self.sidecar_poller = SidecarPoller()  # When the time display thread re-checks the sidecar
+        self.merge_conflicts = []  # Overlapping edits from the last merge, to be reviewed before saving
+        self.selected_index = -1
+        self._closing = False
+        self.pending_start_ms = None
+        self.pending_end_ms = None
+        self.is_paused = False
+        self._explicit_click = False  # Flag to track explicit clicks vs focus changes
+        self._previous_focus = None  # Track previous focus to detect navigation source
+        
+        log(f"📦 SegmentEditorDialog session {self._session} with {len(self.segments)} segments")
+    
+    def get_control(self, control_id):
+        """Return a control handle, looked up through Kodi only the first time (None if missing)"""
+        control = self.controls.get(control_id)
+        if control is None:
+            try:
+                control = self.getControl(control_id)
+            except Exception:
+                return None
+            if control:
+                self.controls[control_id] = control
+        return control
+    
+    def _push(self, control_id, attribute, value, apply):
+        """Call apply(control) unless value is what was last pushed for this control attribute"""
+        key = (control_id, attribute)
+        if self._pushed.get(key) == value:
+            return
+        control = self.get_control(control_id)
+        if control:
+            apply(control)
+            self._pushed[key] = value
+    
+    def set_label(self, control_id, label):
+        self._push(control_id, "label", label, lambda control: control.setLabel(label))
+    
+    def set_visible(self, control_id, visible):
+        self._push(control_id, "visible", visible, lambda control: control.setVisible(visible))
+    
+    def set_enabled(self, control_id, enabled):
+        self._push(control_id, "enabled", enabled, lambda control: control.setEnabled(enabled))
+    
+    def set_top(self, control_id, top):
+        """Move a control vertically, keeping the x position the skin gave it (read once)"""
+        position = self._pushed.get((control_id, "position"))
+        if position is None:
+            control = self.get_control(control_id)
+            if not control:
+                return
+            position = tuple(control.getPosition())
+            self._pushed[(control_id, "position")] = position
+        x, _ = position
+        self._push(control_id, "position", (x, top), lambda control: control.setPosition(x, top))
+    
+    def set_window_property(self, key, value):
+        if self._pushed.get((None, key)) != value:
+            self.setProperty(key, value)
+            self._pushed[(None, key)] = value
+    
+    def _session_active(self, session):
+        """True while the session a background thread was started for is still open"""
+        return session == self._session and not self._closing
     
     def onInit(self):
         """Initialize the dialog"""
         try:
-            log_always("🔍 onInit called")
+            log_always(f"🔍 onInit called ({'reused' if self._initialized else 'first'} window)")
             
             # Check if full-screen overlay should be enabled
             try:
                 addon = get_addon()
                 enable_overlay = addon.getSetting("enable_fullscreen_overlay") == "true"
-                # Control ID for the full-screen overlay is not explicitly set, so we need to find it
-                # The overlay is the first image control in the window
-                # We'll use a property to control visibility via XML, or directly hide it
-                # Since we can't easily reference it by ID, we'll use window property
-                self.setProperty("EnableFullscreenOverlay", "true" if enable_overlay else "false")
                 log(f"🔍 Full-screen overlay setting: {enable_overlay}")
             except Exception as e:
                 log(f"⚠️ Error reading overlay setting: {e}")
                 # Default to disabled
-                self.setProperty("EnableFullscreenOverlay", "false")
+                enable_overlay = False
+            # Control ID for the full-screen overlay is not explicitly set, so we need to find it
+            # The overlay is the first image control in the window
+            # We'll use a property to control visibility via XML, or directly hide it
+            # Since we can't easily reference it by ID, we'll use window property
+            self.set_window_property("EnableFullscreenOverlay", "true" if enable_overlay else "false")
             
             # Set up list control
-            self.list_control = self.getControl(5000)
+            if not self._initialized:
+                for control_id in CACHED_CONTROL_IDS:
+                    self.get_control(control_id)
+            self.list_control = self.get_control(5000)
             if not self.list_control:
                 log_always("❌ List control (5000) not found - this is critical!")
                 # Still try to continue, but log the error
@@ -65,19 +182,6 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                 # Update button positions after list is set up
                 self.update_button_positions()
             
-            # Initialize pause button - detect actual player state
-            try:
-                self.is_paused = self._detect_pause_state()
-                pause_button = self.getControl(5018)
-                if pause_button:
-                    # Set button label: "Pause" when playing (not paused), "Resume" when paused
-                    pause_button.setLabel("Pause" if not self.is_paused else "Resume")
-                    log(f"🔍 Initial pause state detected: {self.is_paused} (button shows: {pause_button.getLabel()})")
-            except Exception as e:
-                log(f"⚠️ Error initializing pause button: {e}")
-                # Default to not paused if detection fails
-                self.is_paused = False
-            
             # Set initial focus to Pause/Resume button
             try:
                 self.setFocusId(5018)
@@ -86,23 +190,50 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                 log_always("⚠️ Could not set initial focus to Pause/Resume button")
             
             # Make sure all buttons are visible and enabled
+            # Only needed once: the window keeps them that way between sessions
+            if not self._initialized:
+                try:
+                    for btn_id in BUTTON_IDS:
+                        try:
+                            self.set_enabled(btn_id, True)
+                            self.set_visible(btn_id, True)
+                        except:
+                            pass
+                    # Update Edit/Delete button positions after all buttons are initialized
+                    self.update_button_positions()
+                except:
+                    pass
+                self._initialized = True
+            
+            # Start time update thread; it also samples the initial pause state,
+            # which takes a moment and would otherwise delay showing the window
+            session = self._session
+            threading.Thread(target=self._update_time_display, args=(session,), daemon=True).start()
+            
+            # Probe the video duration in the background so out-of-range segments can be flagged
+            if self.duration_ms is None and self.video_path:
+                threading.Thread(target=self._probe_duration, args=(session,), daemon=True).start()
+            
+            # Load the container's seek index once so snapping marks is just a bisect
             try:
-                button_ids = [5002, 5003, 5004, 5005, 5006, 5007, 5009, 5010, 5011, 5012, 5013, 5014, 5015, 5016, 5017, 5018, 5019, 5020, 5021, 5022, 5023, 5024, 5025]
-                for btn_id in button_ids:
-                    try:
-                        btn = self.getControl(btn_id)
-                        if btn:
-                            btn.setEnabled(True)
-                            btn.setVisible(True)
-                    except:
-                        pass
-                # Update Edit/Delete button positions after all buttons are initialized
-                self.update_button_positions()
-            except:
-                pass
+                if self.video_path and self.keyframe_index is None and get_addon().getSettingBool("snap_to_keyframes"):
+                    threading.Thread(target=self._load_keyframes, args=(session,), daemon=True).start()
+            except Exception as e:
+                log(f"⚠️ Error reading keyframe snapping setting: {e}")
             
-            # Start time update thread
-            threading.Thread(target=self._update_time_display, daemon=True).start()
+            # Infer missing intro/credits from the rest of the season
+            try:
+                if self.video_path and get_addon().getSettingBool("season_suggestions"):
+                    threading.Thread(target=self._load_season_suggestions, args=(session,), daemon=True).start()
+            except Exception as e:
+                log(f"⚠️ Error reading season suggestions setting: {e}")
+            
+            # Subtitle cues ("Previously on...", ♪ lyrics) are streamed in the background too
+            try:
+                if self.video_path and get_addon().getSettingBool("subtitle_suggestions"):
+                    threading.Thread(target=self._load_subtitle_suggestions, args=(session,), daemon=True).start()
+            except Exception as e:
+                log(f"⚠️ Error reading subtitle suggestions setting: {e}")
             
             log("✅ Dialog onInit completed")
         except Exception as e:
@@ -134,11 +265,99 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             log(f"⚠️ Error detecting pause state: {e}")
             return False  # Default to not paused if detection fails
     
-    def _update_time_display(self):
-        """Update the current time display in real-time"""
+    def _probe_duration(self, session):
+        """Read the video duration from the container header and re-flag segments"""
+        try:
+            duration_ms = get_video_duration_ms(self.video_path)
+            if session != self._session:
+                return
+            self.duration_ms = duration_ms
+            if self.duration_ms and find_out_of_range(self.segments, self.duration_ms) and self._session_active(session):
+                log(f"⚠️ Some segments extend beyond the video duration ({ms_to_hms(self.duration_ms)})")
+                self.refresh_list()
+        except Exception as e:
+            log(f"⚠️ Error probing video duration: {e}")
+    
+    def _load_keyframes(self, session):
+        """Load the keyframe index (MKV Cues / MP4 stss) for snapping marks"""
+        keyframe_index = load_keyframe_index(self.video_path)
+        if session == self._session:
+            self.keyframe_index = keyframe_index
+    
+    def _load_season_suggestions(self, session):
+        """Analyze sibling episodes' sidecars and announce any suggestions"""
+        suggestions = suggest_for_video(self.video_path)
+        if session != self._session:
+            return
+        self.season_suggestions = suggestions
+        if self.season_suggestions and self._session_active(session):
+            log(f"📊 {len(self.season_suggestions)} season suggestions for {self.video_path}")
+            self._announce_suggestions("this season", self.season_suggestions)
+    
+    def _load_subtitle_suggestions(self, session):
+        """Stream the sidecar subtitles and announce any suggestions"""
+        try:
+            duration_ms = self.duration_ms or get_video_duration_ms(self.video_path)
+            suggestions = suggest_from_subtitles(self.video_path, duration_ms)
+            if session != self._session:
+                return
+            self.subtitle_suggestions = suggestions
+            if self.subtitle_suggestions and self._session_active(session):
+                self._announce_suggestions("subtitles", self.subtitle_suggestions)
+        except Exception as e:
+            log(f"⚠️ Error analyzing subtitles: {e}")
+    
+    def _announce_suggestions(self, origin, suggestions):
+        present = {seg.segment_type_label for seg in self.segments}
+        count = sum(1 for seg, _ in suggestions if seg.segment_type_label not in present)
+        if count:
+            xbmcgui.Dialog().notification(
+                "Segment Editor",
+                f"{count} suggestion(s) from {origin} - see Tools",
+                icon=self.icon_path,
+                time=3000
+            )
+    
+    def get_open_suggestions(self):
+        """Suggestions for labels the current segment list doesn't have yet, most confident first"""
+        present = {seg.segment_type_label for seg in self.segments}
+        suggestions = [
+            (seg, conf) for seg, conf in self.season_suggestions + self.subtitle_suggestions
+            if seg.segment_type_label not in present
+        ]
+        suggestions.sort(key=lambda item: (-item[1], item[0].start_ms))
+        return suggestions
+    
+    def snap_to_keyframe(self, ms):
+        """Snap a time to the nearest keyframe if snapping is enabled and the index is loaded"""
+        if not self.keyframe_index:
+            return ms
+        snapped = self.keyframe_index.nearest(ms, KEYFRAME_SNAP_MAX_DISTANCE_MS)
+        if snapped != ms:
+            log(f"🔑 Snapped {ms_to_hms(ms)} to keyframe {ms_to_hms(snapped)}")
+        return snapped
+    
+    def _update_time_display(self, session):
+        """Update the current time display in real-time.
+        
+        Labels go through set_label, so a tick where nothing changed (paused,
+        or not playing) makes no GUI calls.
+        """
+        # Initialize pause button - detect actual player state
+        try:
+            self.is_paused = self._detect_pause_state()
+            if self._session_active(session):
+                # Set button label: "Pause" when playing (not paused), "Resume" when paused
+                self.set_label(5018, "Pause" if not self.is_paused else "Resume")
+                log(f"🔍 Initial pause state detected: {self.is_paused}")
+        except Exception as e:
+            log(f"⚠️ Error initializing pause button: {e}")
+            # Default to not paused if detection fails
+            self.is_paused = False
+        
         last_time = None
         consecutive_stable_samples = 0
-        while not self._closing:
+        while self._session_active(session):
             try:
                 if self.player.isPlayingVideo():
                     current = self.player.getTime()
@@ -159,9 +378,7 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                                     self.is_paused = True
                                     # Update button label
                                     try:
-                                        pause_button = self.getControl(5018)
-                                        if pause_button:
-                                            pause_button.setLabel("Resume")
+                                        self.set_label(5018, "Resume")
                                     except:
                                         pass
                         else:
@@ -172,54 +389,99 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                                 self.is_paused = False
                                 # Update button label
                                 try:
-                                    pause_button = self.getControl(5018)
-                                    if pause_button:
-                                        pause_button.setLabel("Pause")
+                                    self.set_label(5018, "Pause")
                                 except:
                                     pass
                     else:
                         consecutive_stable_samples = 0
                     
                     last_time = current
-                    self.current_time = current
-                    hms = seconds_to_hms(current)
+                    self.current_ms = seconds_to_ms(current)
+                    hms = ms_to_hms(self.current_ms)
                     
                     # Update the time label
                     try:
-                        time_label = self.getControl(5001)
-                        if time_label:
-                            # Show [PAUSED] when actually paused (is_paused = True)
-                            pause_indicator = " [PAUSED]" if self.is_paused else ""
-                            time_label.setLabel(f"Current Time: {hms}{pause_indicator}")
+                        # Show [PAUSED] when actually paused (is_paused = True)
+                        pause_indicator = " [PAUSED]" if self.is_paused else ""
+                        self.set_label(5001, f"Current Time: {hms}{pause_indicator}")
                     except:
                         pass
                     
                     # Show pending start/end markers
                     status_text = ""
-                    if self.pending_start_time is not None:
-                        status_text = f"Start: {seconds_to_hms(self.pending_start_time)}"
-                    if self.pending_end_time is not None:
+                    if self.pending_start_ms is not None:
+                        status_text = f"Start: {ms_to_hms(self.pending_start_ms)}"
+                    if self.pending_end_ms is not None:
                         if status_text:
-                            status_text += f" | End: {seconds_to_hms(self.pending_end_time)}"
+                            status_text += f" | End: {ms_to_hms(self.pending_end_ms)}"
                         else:
-                            status_text = f"End: {seconds_to_hms(self.pending_end_time)}"
+                            status_text = f"End: {ms_to_hms(self.pending_end_ms)}"
                     
                     # Add validation warning if times are invalid
-                    if self.pending_start_time is not None and self.pending_end_time is not None:
-                        if self.pending_end_time <= self.pending_start_time:
+                    if self.pending_start_ms is not None and self.pending_end_ms is not None:
+                        if self.pending_end_ms <= self.pending_start_ms:
                             status_text += " [INVALID: End must be after Start]"
                     
                     try:
-                        status_label = self.getControl(5008)
-                        if status_label:
-                            status_label.setLabel(status_text)
+                        self.set_label(5008, status_text)
                     except:
                         pass
             except:
                 pass
             
+            if self.sidecar_state and self.sidecar_poller.due():
+                self._reload_external_changes()
+            
             time.sleep(0.5)  # Update twice per second
     
+    def _reload_external_changes(self):
+        """Merge a sidecar rewritten by comskip or another client into the open list"""
+        if not self._sync_lock.acquire(blocking=False):
+            return  # An edit or save is in progress; the next poll picks the change up
+        try:
+            theirs = detect_concurrent_change(self.sidecar_state)
+            self.sidecar_poller.checked(theirs is not None)
+            if theirs is None:
+                return
+            if self.segments_modified:
+                # Keep unsaved edits on top of the new version
+                self.segments, conflicts = merge_segment_lists(self.sidecar_state.base, self.segments, theirs)
+            else:
+                self.segments, conflicts = [seg.copy_with() for seg in theirs], []
+            self._adopt_disk_version(theirs)
+            self.refresh_list()
+            log(f"🔄 Reloaded external sidecar changes: {len(self.segments)} segments, {len(conflicts)} conflicts")
+            xbmcgui.Dialog().notification(
+                "Segment Editor",
+                "Segments changed on disk and were reloaded"
+                + (f" - {len(conflicts)} overlapping edit(s) kept from both sides" if conflicts else ""),
+                icon=self.icon_path,
+                time=3000
+            )
+        except Exception as e:
+            log(f"⚠️ Could not reload sidecar changes: {e}")
+        finally:
+            self._sync_lock.release()
+    
+    def _adopt_disk_version(self, theirs):
+        """Make the sidecar on disk the new merge base; a rewritten chapter XML is
+        re-read so its editions, UIDs and languages are the ones saved next"""
+        rebase_on_disk(self.sidecar_state, theirs)
+        path = self.sidecar_state.path
+        if sidecar_kind(path) != "xml":
+            return
+        content = safe_file_read(path)
+        try:
+            self.chapter_document = ChapterDocument.from_string(content, path) if content else None
+        except Exception as e:
+            log(f"⚠️ Could not re-read chapter XML {path}: {e}")
+            self.chapter_document = None
+        if self.chapter_document is None:
+            self.edition = None
+        elif self.edition is None or self.edition >= len(self.chapter_document.editions):
+            self.edition = self.chapter_document.default_edition()
+        self.sidecar_state.edition = self.edition
+    
     def refresh_list(self):
         """Refresh the segments list"""
         try:
@@ -228,41 +490,16 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                 return
             
             items = []
-            # Check for nested segments (fully contained)
-            nested_indices = set()
-            for i, seg in enumerate(self.segments):
-                for j, other_seg in enumerate(self.segments):
-                    if i != j:
-                        # Check if seg is nested inside other_seg
-                        if (other_seg.start_seconds <= seg.start_seconds and 
-                            seg.end_seconds <= other_seg.end_seconds):
-                            nested_indices.add(i)
-                            break
+            # Nested (fully contained) and partially overlapping segments are flagged in the list
+            nested_indices, overlapping_indices = find_nested_and_overlapping(self.segments)
             
-            # Check for overlapping segments (partially overlapping but not fully nested)
-            overlapping_indices = set()
-            for i, seg in enumerate(self.segments):
-                if i in nested_indices:
-                    continue  # Skip if already marked as nested
-                for j, other_seg in enumerate(self.segments):
-                    if i != j and j not in nested_indices:
-                        # Check if segments overlap (but neither is fully nested)
-                        # Two segments overlap if: seg1.start < seg2.end AND seg2.start < seg1.end
-                        if (seg.start_seconds < other_seg.end_seconds and 
-                            other_seg.start_seconds < seg.end_seconds):
-                            # Make sure neither is fully nested
-                            seg_nested_in_other = (other_seg.start_seconds <= seg.start_seconds and 
-                                                   seg.end_seconds <= other_seg.end_seconds)
-                            other_nested_in_seg = (seg.start_seconds <= other_seg.start_seconds and 
-                                                   other_seg.end_seconds <= seg.end_seconds)
-                            if not seg_nested_in_other and not other_nested_in_seg:
-                                overlapping_indices.add(i)
-                            break
+            # Check for segments running past the end of the video (duration from container header)
+            out_of_range_indices = set(find_out_of_range(self.segments, self.duration_ms))
             
             for i, seg in enumerate(self.segments):
                 # Format time display
-                start_hms = seconds_to_hms(seg.start_seconds)
-                end_hms = seconds_to_hms(seg.end_seconds)
+                start_hms = ms_to_hms(seg.start_ms)
+                end_hms = ms_to_hms(seg.end_ms)
                 duration = seg.get_duration()
                 
                 label = f"{seg.raw_label if hasattr(seg, 'raw_label') else seg.segment_type_label}"
@@ -273,6 +510,9 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                 # Format line1 - XML will handle the nested/overlapping indicator
                 line1 = f"Segment {segment_num} - {label} - {start_hms} to {end_hms}"
                 line2 = f"Duration: {duration:.1f}s | Source: {seg.source}"
+                is_out_of_range = i in out_of_range_indices
+                if is_out_of_range:
+                    line2 += f" | Beyond end of video ({ms_to_hms(self.duration_ms)})"
                 
                 item = xbmcgui.ListItem(line1, line2)
                 item.setProperty("index", str(i))
@@ -281,6 +521,7 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                 item.setProperty("label", label)
                 item.setProperty("is_nested", "true" if is_nested else "false")
                 item.setProperty("is_overlapping", "true" if is_overlapping else "false")
+                item.setProperty("is_out_of_range", "true" if is_out_of_range else "false")
                 # Combined property for easier visibility checking: "normal", "nested", or "overlapping"
                 if is_nested:
                     item.setProperty("segment_type", "nested")
@@ -300,14 +541,9 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             # Also set HasSegments property for new buttons visibility
             try:
                 has_segments = len(self.segments) > 0
-                self.setProperty("HasSegments", "true" if has_segments else "false")
-                
-                edit_btn = self.getControl(5021)
-                delete_btn = self.getControl(5022)
-                if edit_btn:
-                    edit_btn.setVisible(has_segments)
-                if delete_btn:
-                    delete_btn.setVisible(has_segments)
+                self.set_window_property("HasSegments", "true" if has_segments else "false")
+                self.set_visible(5021, has_segments)
+                self.set_visible(5022, has_segments)
             except:
                 pass
             
@@ -422,6 +658,7 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         if action_id in [10, 92]:
             log("🔙 ESC/Back pressed")
             if self.check_unsaved_changes():
+                self._closing = True
                 self.close()
             return
         
@@ -443,6 +680,12 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                 self.onClick(focused)
             return  # Don't process other actions when Select is pressed
         
+        # Context menu (C key / Menu button) opens the tools menu
+        if action_id == 117:
+            log("🧰 Context menu pressed - opening tools menu")
+            self.show_tools_menu()
+            return
+        
         # Keyboard shortcuts for quick access - ONLY when list is focused
         # Left/Right arrow keys should NOT seek - user should use seek buttons below
         # We'll let XML handle navigation for Left/Right arrows
@@ -495,9 +738,10 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         # Don't intercept other navigation - let XML handle it
         # The XML onup/ondown properties should handle navigation between list and buttons
     
+    @edits_segments
     def add_at_current_time(self):
         """Add a new segment starting at current playback time"""
-        if not self.current_time or self.current_time <= 0:
+        if not self.current_ms or self.current_ms <= 0:
             xbmcgui.Dialog().ok("Segment Editor", "No current playback time available.")
             return
         
@@ -511,8 +755,8 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             return
         
         try:
-            duration = float(duration_str)
-            start = self.current_time
+            duration = hms_to_ms(duration_str)
+            start = self.current_ms
             end = start + duration
             
             # Get label with predefined options
@@ -522,12 +766,12 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             
             # Determine source type based on existing segments
             source = "edl"
-            if self.segments and self.segments[0].source == "xml":
+            if self.segments and "xml" in self.segments[0].source:
                 source = "xml"
             
-            new_seg = SegmentItem(start, end, label, source=source)
+            new_seg = SegmentItem.from_ms(start, end, label, source=source)
             self.segments.append(new_seg)
-            self.segments.sort(key=lambda s: s.start_seconds)
+            self.segments.sort(key=lambda s: s.start_ms)
             self.segments_modified = True
             self.refresh_list()
             
@@ -535,10 +779,11 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         except ValueError:
             xbmcgui.Dialog().ok("Segment Editor", "Invalid duration value.")
     
+    @edits_segments
     def add_segment(self):
         """Add a new segment"""
         # Check if we have marked times
-        if self.pending_start_time is not None and self.pending_end_time is not None:
+        if self.pending_start_ms is not None and self.pending_end_ms is not None:
             if xbmcgui.Dialog().yesno(
                 "Segment Editor",
                 "You have marked start and end times.\n\n"
@@ -549,10 +794,10 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         
         # Get start time (offer current time or marked time as default)
         default_start = "0"
-        if self.pending_start_time is not None:
-            default_start = seconds_to_hms(self.pending_start_time)
-        elif self.current_time > 0:
-            default_start = seconds_to_hms(self.current_time)
+        if self.pending_start_ms is not None:
+            default_start = ms_to_hms(self.pending_start_ms)
+        elif self.current_ms > 0:
+            default_start = ms_to_hms(self.current_ms)
         
         start_str = xbmcgui.Dialog().input(
             "Start Time (HH:MM:SS.mmm or seconds)",
@@ -563,10 +808,10 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         
         # Get end time (offer marked time or current time + 30s as default)
         default_end = "30"
-        if self.pending_end_time is not None:
-            default_end = seconds_to_hms(self.pending_end_time)
-        elif self.current_time > 0:
-            default_end = seconds_to_hms(self.current_time + 30)
+        if self.pending_end_ms is not None:
+            default_end = ms_to_hms(self.pending_end_ms)
+        elif self.current_ms > 0:
+            default_end = ms_to_hms(self.current_ms + 30000)
         
         end_str = xbmcgui.Dialog().input(
             "End Time (HH:MM:SS.mmm or seconds)",
@@ -581,16 +826,9 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             return  # User cancelled
         
         try:
-            # Parse times
-            if ":" in start_str:
-                start = hms_to_seconds(start_str)
-            else:
-                start = float(start_str)
-            
-            if ":" in end_str:
-                end = hms_to_seconds(end_str)
-            else:
-                end = float(end_str)
+            # Parse times (HH:MM:SS.mmm or plain seconds)
+            start = hms_to_ms(start_str)
+            end = hms_to_ms(end_str)
             
             if end <= start:
                 xbmcgui.Dialog().ok("Segment Editor", "End time must be after start time.")
@@ -598,12 +836,12 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             
             # Determine source type
             source = "edl"
-            if self.segments and self.segments[0].source == "xml":
+            if self.segments and "xml" in self.segments[0].source:
                 source = "xml"
             
-            new_seg = SegmentItem(start, end, label, source=source)
+            new_seg = SegmentItem.from_ms(start, end, label, source=source)
             self.segments.append(new_seg)
-            self.segments.sort(key=lambda s: s.start_seconds)
+            self.segments.sort(key=lambda s: s.start_ms)
             self.segments_modified = True
             self.refresh_list()
             
@@ -611,6 +849,7 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         except (ValueError, Exception) as e:
             xbmcgui.Dialog().ok("Segment Editor", f"Invalid input: {str(e)}")
     
+    @edits_segments
     def edit_segment(self):
         """Edit the selected segment"""
         if self.selected_index < 0 or self.selected_index >= len(self.segments):
@@ -620,18 +859,18 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         seg = self.segments[self.selected_index]
         
         # Check if we have marked times
-        if self.pending_start_time is not None and self.pending_end_time is not None:
+        if self.pending_start_ms is not None and self.pending_end_ms is not None:
             if xbmcgui.Dialog().yesno(
                 "Segment Editor",
                 "You have marked start and end times.\n\n"
                 "Use marked times for this segment?"
             ):
-                if self.pending_end_time > self.pending_start_time:
-                    seg.start_seconds = self.pending_start_time
-                    seg.end_seconds = self.pending_end_time
-                    self.pending_start_time = None
-                    self.pending_end_time = None
-                    self.segments.sort(key=lambda s: s.start_seconds)
+                if self.pending_end_ms > self.pending_start_ms:
+                    seg.start_ms = self.pending_start_ms
+                    seg.end_ms = self.pending_end_ms
+                    self.pending_start_ms = None
+                    self.pending_end_ms = None
+                    self.segments.sort(key=lambda s: s.start_ms)
                     self.segments_modified = True
                     self.refresh_list()
                     log(f"✅ Edited segment with marked times: {seg}")
@@ -641,9 +880,9 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                     return
         
         # Get new start time (offer marked time or current value as default)
-        default_start = seconds_to_hms(seg.start_seconds)
-        if self.pending_start_time is not None:
-            default_start = seconds_to_hms(self.pending_start_time)
+        default_start = ms_to_hms(seg.start_ms)
+        if self.pending_start_ms is not None:
+            default_start = ms_to_hms(self.pending_start_ms)
         
         start_str = xbmcgui.Dialog().input(
             "Start Time (HH:MM:SS.mmm or seconds)",
@@ -653,9 +892,9 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             return
         
         # Get new end time (offer marked time or current value as default)
-        default_end = seconds_to_hms(seg.end_seconds)
-        if self.pending_end_time is not None:
-            default_end = seconds_to_hms(self.pending_end_time)
+        default_end = ms_to_hms(seg.end_ms)
+        if self.pending_end_ms is not None:
+            default_end = ms_to_hms(self.pending_end_ms)
         
         end_str = xbmcgui.Dialog().input(
             "End Time (HH:MM:SS.mmm or seconds)",
@@ -671,27 +910,20 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             return  # User cancelled
         
         try:
-            # Parse times
-            if ":" in start_str:
-                start = hms_to_seconds(start_str)
-            else:
-                start = float(start_str)
-            
-            if ":" in end_str:
-                end = hms_to_seconds(end_str)
-            else:
-                end = float(end_str)
+            # Parse times (HH:MM:SS.mmm or plain seconds)
+            start = hms_to_ms(start_str)
+            end = hms_to_ms(end_str)
             
             if end <= start:
                 xbmcgui.Dialog().ok("Segment Editor", "End time must be after start time.")
                 return
             
             # Update segment
-            seg.start_seconds = start
-            seg.end_seconds = end
+            seg.start_ms = start
+            seg.end_ms = end
             seg.raw_label = label
             seg.segment_type_label = label.lower().strip()
-            self.segments.sort(key=lambda s: s.start_seconds)
+            self.segments.sort(key=lambda s: s.start_ms)
             self.segments_modified = True
             self.refresh_list()
             
@@ -699,6 +931,7 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         except (ValueError, Exception) as e:
             xbmcgui.Dialog().ok("Segment Editor", f"Invalid input: {str(e)}")
     
+    @edits_segments
     def delete_segment(self):
         """Delete the selected segment"""
         if self.selected_index < 0 or self.selected_index >= len(self.segments):
@@ -739,23 +972,15 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             button_top = list_top + (selected * item_height) + 10  # +10 to center vertically in item (item is 50px, button is 30px, so 10px from top centers it)
             
             # Update button positions (only vertical position to align with selected item)
-            # Horizontal positions are handled by XML
+            # Horizontal positions are handled by XML; unchanged values aren't re-sent
             try:
-                edit_btn = self.getControl(5021)
-                delete_btn = self.getControl(5022)
                 has_segments = len(self.segments) > 0
-                if edit_btn:
-                    # Get current x position from XML and only update y position
-                    current_x, _ = edit_btn.getPosition()
-                    edit_btn.setPosition(current_x, button_top)
-                    edit_btn.setVisible(has_segments)
-                    edit_btn.setEnabled(True)
-                if delete_btn:
-                    # Get current x position from XML and only update y position
-                    current_x, _ = delete_btn.getPosition()
-                    delete_btn.setPosition(current_x, button_top)
-                    delete_btn.setVisible(has_segments)
-                    delete_btn.setEnabled(has_segments)
+                self.set_top(5021, button_top)
+                self.set_visible(5021, has_segments)
+                self.set_enabled(5021, True)
+                self.set_top(5022, button_top)
+                self.set_visible(5022, has_segments)
+                self.set_enabled(5022, has_segments)
                 log(f"📍 Updated button vertical positions for segment {selected + 1} (index {selected}) at top={button_top}")
             except Exception as e:
                 log(f"⚠️ Error updating button positions: {e}")
@@ -787,7 +1012,7 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                         import time
                         time.sleep(0.05)  # Small delay to let list selection settle
                         try:
-                            edit_btn = self.getControl(5021)
+                            edit_btn = self.get_control(5021)
                             if edit_btn and edit_btn.isVisible():
                                 self.setFocusId(5021)
                                 log(f"✅ Auto-focused Edit button (previous focus: {self._previous_focus})")
@@ -800,6 +1025,7 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         # Update previous focus for next time
         self._previous_focus = controlId
     
+    @edits_segments
     def check_unsaved_changes(self):
         """Check if there are unsaved changes and prompt user if needed. Returns True if should exit, False if should cancel."""
         if not self.segments_modified:
@@ -862,7 +1088,7 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                 return
             
             current = self.player.getTime()
-            current_hms = seconds_to_hms(current)
+            current_hms = ms_to_hms(seconds_to_ms(current))
             
             time_str = xbmcgui.Dialog().input(
                 "Jump To Time (HH:MM:SS.mmm or seconds)",
@@ -874,20 +1100,17 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             
             # Parse the time input
             try:
-                if ":" in time_str:
-                    target_time = hms_to_seconds(time_str)
-                else:
-                    target_time = float(time_str)
+                target_ms = hms_to_ms(time_str)
                 
-                if target_time < 0:
+                if target_ms < 0:
                     xbmcgui.Dialog().ok("Segment Editor", "Time cannot be negative.")
                     return
                 
-                self.player.seekTime(target_time)
-                log(f"⏩ Jumped to time: {target_time:.2f}s ({seconds_to_hms(target_time)})")
+                self.player.seekTime(target_ms / 1000.0)
+                log(f"⏩ Jumped to time: {ms_to_hms(target_ms)}")
                 xbmcgui.Dialog().notification(
                     "Segment Editor",
-                    f"Jumped to {seconds_to_hms(target_time)}",
+                    f"Jumped to {ms_to_hms(target_ms)}",
                     icon=self.icon_path,
                     time=2000
                 )
@@ -911,11 +1134,9 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                 
                 # Update button label immediately
                 try:
-                    pause_button = self.getControl(5018)
-                    if pause_button:
-                        # When playing (not paused = False), show "Pause"
-                        # When paused (is_paused = True), show "Resume"
-                        pause_button.setLabel("Pause" if not self.is_paused else "Resume")
+                    # When playing (not paused = False), show "Pause"
+                    # When paused (is_paused = True), show "Resume"
+                    self.set_label(5018, "Pause" if not self.is_paused else "Resume")
                 except:
                     pass
                 
@@ -932,9 +1153,9 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         """Mark current playback position as segment start (toggles if already marked)"""
         try:
             # Toggle: if start is already marked, clear it
-            if self.pending_start_time is not None:
+            if self.pending_start_ms is not None:
                 log("📍 Start time already marked - clearing it")
-                self.pending_start_time = None
+                self.pending_start_ms = None
                 xbmcgui.Dialog().notification(
                     "Segment Editor",
                     "Start time cleared",
@@ -944,24 +1165,24 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                 return
             
             if self.player.isPlayingVideo():
-                new_start = self.player.getTime()
+                new_start = self.snap_to_keyframe(seconds_to_ms(self.player.getTime()))
                 
                 # Validate: start must be before end if end is already set
-                if self.pending_end_time is not None and new_start >= self.pending_end_time:
+                if self.pending_end_ms is not None and new_start >= self.pending_end_ms:
                     xbmcgui.Dialog().ok(
                         "Segment Editor",
                         f"Cannot set start time after end time.\n\n"
-                        f"Current end: {seconds_to_hms(self.pending_end_time)}\n"
-                        f"Attempted start: {seconds_to_hms(new_start)}\n\n"
+                        f"Current end: {ms_to_hms(self.pending_end_ms)}\n"
+                        f"Attempted start: {ms_to_hms(new_start)}\n\n"
                         f"Please set start time before end time, or clear end time first."
                     )
                     return
                 
-                self.pending_start_time = new_start
-                log(f"📍 Marked start time: {self.pending_start_time:.2f}")
+                self.pending_start_ms = new_start
+                log(f"📍 Marked start time: {ms_to_hms(self.pending_start_ms)}")
                 xbmcgui.Dialog().notification(
                     "Segment Editor",
-                    f"Start marked: {seconds_to_hms(self.pending_start_time)}",
+                    f"Start marked: {ms_to_hms(self.pending_start_ms)}",
                     icon=self.icon_path,
                     time=2000
                 )
@@ -972,9 +1193,9 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         """Mark current playback position as segment end (toggles if already marked)"""
         try:
             # Toggle: if end is already marked, clear it
-            if self.pending_end_time is not None:
+            if self.pending_end_ms is not None:
                 log("📍 End time already marked - clearing it")
-                self.pending_end_time = None
+                self.pending_end_ms = None
                 xbmcgui.Dialog().notification(
                     "Segment Editor",
                     "End time cleared",
@@ -984,24 +1205,24 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
                 return
             
             if self.player.isPlayingVideo():
-                new_end = self.player.getTime()
+                new_end = self.snap_to_keyframe(seconds_to_ms(self.player.getTime()))
                 
                 # Validate: end must be after start if start is already set
-                if self.pending_start_time is not None and new_end <= self.pending_start_time:
+                if self.pending_start_ms is not None and new_end <= self.pending_start_ms:
                     xbmcgui.Dialog().ok(
                         "Segment Editor",
                         f"Cannot set end time before start time.\n\n"
-                        f"Current start: {seconds_to_hms(self.pending_start_time)}\n"
-                        f"Attempted end: {seconds_to_hms(new_end)}\n\n"
+                        f"Current start: {ms_to_hms(self.pending_start_ms)}\n"
+                        f"Attempted end: {ms_to_hms(new_end)}\n\n"
                         f"Please set end time after start time, or clear start time first."
                     )
                     return
                 
-                self.pending_end_time = new_end
-                log(f"📍 Marked end time: {self.pending_end_time:.2f}")
+                self.pending_end_ms = new_end
+                log(f"📍 Marked end time: {ms_to_hms(self.pending_end_ms)}")
                 xbmcgui.Dialog().notification(
                     "Segment Editor",
-                    f"End marked: {seconds_to_hms(self.pending_end_time)}",
+                    f"End marked: {ms_to_hms(self.pending_end_ms)}",
                     icon=self.icon_path,
                     time=2000
                 )
@@ -1018,8 +1239,8 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         options = []
         for i, seg in enumerate(self.segments):
             label = seg.raw_label if hasattr(seg, 'raw_label') else seg.segment_type_label
-            start_hms = seconds_to_hms(seg.start_seconds)
-            end_hms = seconds_to_hms(seg.end_seconds)
+            start_hms = ms_to_hms(seg.start_ms)
+            end_hms = ms_to_hms(seg.end_ms)
             options.append(f"Segment {i+1}: {label} ({start_hms} → {end_hms})")
         
         selected = xbmcgui.Dialog().select(title, options)
@@ -1038,25 +1259,25 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             return  # User cancelled
         
         selected_seg = self.segments[seg_index]
-        new_start = selected_seg.end_seconds
+        new_start = selected_seg.end_ms
         
         # Validate: start must be before end if end is already set
-        if self.pending_end_time is not None and new_start >= self.pending_end_time:
+        if self.pending_end_ms is not None and new_start >= self.pending_end_ms:
             xbmcgui.Dialog().ok(
                 "Segment Editor",
                 f"Cannot set start time after end time.\n\n"
-                f"Current end: {seconds_to_hms(self.pending_end_time)}\n"
-                f"Selected start: {seconds_to_hms(new_start)}\n\n"
+                f"Current end: {ms_to_hms(self.pending_end_ms)}\n"
+                f"Selected start: {ms_to_hms(new_start)}\n\n"
                 f"Please clear end time first or select a different segment."
             )
             return
         
-        self.pending_start_time = new_start
+        self.pending_start_ms = new_start
         label = selected_seg.raw_label if hasattr(selected_seg, 'raw_label') else selected_seg.segment_type_label
-        log(f"📍 Marked start time at end of segment {seg_index+1} ({label}): {self.pending_start_time:.2f}")
+        log(f"📍 Marked start time at end of segment {seg_index+1} ({label}): {ms_to_hms(self.pending_start_ms)}")
         xbmcgui.Dialog().notification(
             "Segment Editor",
-            f"Start marked: {seconds_to_hms(self.pending_start_time)}",
+            f"Start marked: {ms_to_hms(self.pending_start_ms)}",
             icon=self.icon_path,
             time=2000
         )
@@ -1072,25 +1293,25 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             return  # User cancelled
         
         selected_seg = self.segments[seg_index]
-        new_end = selected_seg.start_seconds
+        new_end = selected_seg.start_ms
         
         # Validate: end must be after start if start is already set
-        if self.pending_start_time is not None and new_end <= self.pending_start_time:
+        if self.pending_start_ms is not None and new_end <= self.pending_start_ms:
             xbmcgui.Dialog().ok(
                 "Segment Editor",
                 f"Cannot set end time before start time.\n\n"
-                f"Current start: {seconds_to_hms(self.pending_start_time)}\n"
-                f"Selected end: {seconds_to_hms(new_end)}\n\n"
+                f"Current start: {ms_to_hms(self.pending_start_ms)}\n"
+                f"Selected end: {ms_to_hms(new_end)}\n\n"
                 f"Please clear start time first or select a different segment."
             )
             return
         
-        self.pending_end_time = new_end
+        self.pending_end_ms = new_end
         label = selected_seg.raw_label if hasattr(selected_seg, 'raw_label') else selected_seg.segment_type_label
-        log(f"📍 Marked end time at start of segment {seg_index+1} ({label}): {self.pending_end_time:.2f}")
+        log(f"📍 Marked end time at start of segment {seg_index+1} ({label}): {ms_to_hms(self.pending_end_ms)}")
         xbmcgui.Dialog().notification(
             "Segment Editor",
-            f"End marked: {seconds_to_hms(self.pending_end_time)}",
+            f"End marked: {ms_to_hms(self.pending_end_ms)}",
             icon=self.icon_path,
             time=2000
         )
@@ -1130,9 +1351,10 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             # User cancelled
             return None
     
+    @edits_segments
     def add_with_marked_times(self):
         """Add a segment using the marked start and end times"""
-        if self.pending_start_time is None or self.pending_end_time is None:
+        if self.pending_start_ms is None or self.pending_end_ms is None:
             xbmcgui.Dialog().ok(
                 "Segment Editor",
                 "Please mark both start and end times first.\n\n"
@@ -1140,7 +1362,7 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             )
             return
         
-        if self.pending_end_time <= self.pending_start_time:
+        if self.pending_end_ms <= self.pending_start_ms:
             xbmcgui.Dialog().ok(
                 "Segment Editor",
                 "End time must be after start time."
@@ -1154,22 +1376,22 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
         
         # Determine source type
         source = "edl"
-        if self.segments and self.segments[0].source == "xml":
+        if self.segments and "xml" in self.segments[0].source:
             source = "xml"
         
-        new_seg = SegmentItem(
-            self.pending_start_time,
-            self.pending_end_time,
+        new_seg = SegmentItem.from_ms(
+            self.pending_start_ms,
+            self.pending_end_ms,
             label,
             source=source
         )
         self.segments.append(new_seg)
-        self.segments.sort(key=lambda s: s.start_seconds)
+        self.segments.sort(key=lambda s: s.start_ms)
         self.segments_modified = True
         
         # Clear markers
-        self.pending_start_time = None
-        self.pending_end_time = None
+        self.pending_start_ms = None
+        self.pending_end_ms = None
         
         self.refresh_list()
         log(f"✅ Added segment with marked times: {new_seg}")
@@ -1181,6 +1403,238 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             time=2000
         )
     
+    def get_tools(self):
+        """Return (label, handler) pairs shown in the tools menu"""
+        tools = [
+            ("Retime segments (offset / frame rate)...", self.retime_timeline),
+            ("Clamp segments to video duration", self.clamp_to_duration),
+            ("Normalize segments (merge / remove duplicates)", self.normalize),
+            ("Propagate segments to season...", self.propagate_segments_to_season),
+            ("Suggested segments (season / subtitles)...", self.apply_suggestion),
+        ]
+        if self.chapter_document and len(self.chapter_document.editions) > 1:
+            tools.append(("Switch chapter edition...", self.switch_edition))
+        return tools
+    
+    @edits_segments
+    def switch_edition(self):
+        """Edit another edition of the chapter XML; its chapters are parsed on first use"""
+        names = self.chapter_document.edition_names()
+        selected = xbmcgui.Dialog().select("Chapter Edition", names, preselect=self.edition or 0)
+        if selected < 0 or selected == self.edition:
+            return
+        if self.segments_modified and not xbmcgui.Dialog().yesno(
+            "Segment Editor",
+            "You have unsaved changes in this edition.\nDiscard them and switch?"
+        ):
+            return
+        self.edition = selected
+        self.segments = self.chapter_document.segments(selected)
+        self.segments_modified = False
+        if self.sidecar_state:
+            self.sidecar_state.edition = selected
+            self.sidecar_state.base = [seg.copy_with() for seg in self.segments]
+        self.selected_index = -1
+        self.refresh_list()
+        log(f"📚 Switched to chapter edition {selected + 1}: {len(self.segments)} segments")
+    
+    def show_tools_menu(self):
+        """Show the tools menu and run the selected tool"""
+        tools = self.get_tools()
+        selected = xbmcgui.Dialog().select("Segment Tools", [label for label, _ in tools])
+        if selected >= 0:
+            tools[selected][1]()
+    
+    @edits_segments
+    def retime_timeline(self):
+        """Apply a frame-rate speed ratio and/or offset to all segments"""
+        if not self.segments:
+            xbmcgui.Dialog().ok("Segment Editor", "No segments to retime.")
+            return
+        
+        presets = [
+            ("Offset only", None, None),
+            ("23.976 → 25 fps (PAL speedup)", "23.976", "25"),
+            ("25 → 23.976 fps (PAL slowdown)", "25", "23.976"),
+            ("24 → 25 fps", "24", "25"),
+            ("25 → 24 fps", "25", "24"),
+        ]
+        selected = xbmcgui.Dialog().select("Retime Segments", [p[0] for p in presets])
+        if selected < 0:
+            return
+        _, source_fps, target_fps = presets[selected]
+        ratio = speed_ratio(source_fps, target_fps) if source_fps else 1
+        
+        offset_str = xbmcgui.Dialog().input(
+            "Offset (seconds or HH:MM:SS.mmm, may be negative)",
+            defaultt="0"
+        )
+        if not offset_str:
+            return
+        
+        try:
+            offset_ms = hms_to_ms(offset_str)
+            self.segments = retime_segments(self.segments, ratio=ratio, offset_ms=offset_ms, fps=target_fps)
+            self.segments.sort(key=lambda s: s.start_ms)
+            self.segments_modified = True
+            self.refresh_list()
+            log(f"⏱️ Retimed {len(self.segments)} segments (ratio={ratio}, offset={offset_ms}ms)")
+        except ValueError as e:
+            xbmcgui.Dialog().ok("Segment Editor", f"Invalid input: {str(e)}")
+    
+    @edits_segments
+    def clamp_to_duration(self):
+        """Clamp segments that run past the end of the video"""
+        if not self.duration_ms:
+            xbmcgui.Dialog().ok("Segment Editor", "Video duration is not known for this file.")
+            return
+        
+        self.segments, clamped, dropped = clamp_segments(self.segments, self.duration_ms)
+        if clamped or dropped:
+            self.segments_modified = True
+            self.refresh_list()
+        log(f"✂️ Clamped {clamped} and dropped {dropped} segments at {ms_to_hms(self.duration_ms)}")
+        xbmcgui.Dialog().notification(
+            "Segment Editor",
+            f"{clamped} clamped, {dropped} removed",
+            icon=self.icon_path,
+            time=2000
+        )
+    
+    @edits_segments
+    def apply_suggestion(self):
+        """Add one of the segments inferred from the rest of the season or from subtitles"""
+        suggestions = self.get_open_suggestions()
+        if not suggestions:
+            xbmcgui.Dialog().ok("Segment Editor", "No suggestions from other episodes or subtitles.")
+            return
+        
+        options = [
+            f"{seg.raw_label}: {ms_to_hms(seg.start_ms)} - {ms_to_hms(seg.end_ms)} ({int(conf * 100)}%, {seg.source})"
+            for seg, conf in suggestions
+        ]
+        selected = xbmcgui.Dialog().select("Suggested Segments", options)
+        if selected < 0:
+            return
+        
+        seg, conf = suggestions[selected]
+        self.segments.append(seg.copy_with())
+        self.segments.sort(key=lambda s: s.start_ms)
+        self.segments_modified = True
+        self.refresh_list()
+        log(f"📊 Added suggestion {options[selected]}")
+    
+    def propagate_segments_to_season(self):
+        """Copy selected segment labels to every other episode in this video's folder"""
+        if not self.video_path or not self.segments:
+            xbmcgui.Dialog().ok("Segment Editor", "No segments to propagate.")
+            return
+        
+        labels = sorted({seg.segment_type_label for seg in self.segments})
+        chosen = xbmcgui.Dialog().multiselect(
+            "Propagate which labels?", labels, preselect=list(range(len(labels)))
+        )
+        if not chosen:
+            return
+        labels = [labels[i] for i in chosen]
+        
+        # Siblings without sidecars get the formats this episode would be saved in
+        default_kinds = resolve_save_kinds(self.segments, get_save_format(), self.sidecars)
+        
+        # Dry run first so the user sees exactly which files will be touched
+        preview = propagate_to_season(self.video_path, self.segments, labels, default_kinds, dry_run=True)
+        changed = [r for r in preview if r["changed"]]
+        if not changed:
+            xbmcgui.Dialog().ok("Segment Editor", "All sibling episodes already have these segments.")
+            return
+        
+        lines = [path for r in changed for path in r["paths"]]
+        xbmcgui.Dialog().textviewer(
+            f"Propagate {', '.join(labels)} to {len(changed)} episode(s)", "\n".join(lines)
+        )
+        if not xbmcgui.Dialog().yesno("Segment Editor", f"Write {len(lines)} file(s) in {len(changed)} episode(s)?"):
+            return
+        
+        results = propagate_to_season(self.video_path, self.segments, labels, default_kinds, dry_run=False)
+        written = sum(1 for r in results if r["written"])
+        failed = sum(1 for r in results if r["error"])
+        xbmcgui.Dialog().notification(
+            "Segment Editor",
+            f"Updated {written} episode(s)" + (f", {failed} failed" if failed else ""),
+            icon=self.icon_path,
+            time=3000
+        )
+    
+    @edits_segments
+    def normalize(self):
+        """Merge overlapping/adjacent same-label segments, drop duplicates and too-short segments"""
+        self.segments, stats = normalize_segments(self.segments, **get_normalize_rules())
+        if any(stats.values()):
+            self.segments_modified = True
+            self.refresh_list()
+        log(f"🧹 Normalized segments: {stats}")
+        xbmcgui.Dialog().notification(
+            "Segment Editor",
+            f"{stats['merged']} merged, {stats['duplicates']} duplicates, {stats['dropped']} too short",
+            icon=self.icon_path,
+            time=2000
+        )
+    
+    @edits_segments
+    def resolve_concurrent_change(self):
+        """Check whether another client changed the sidecar since it was loaded.
+        
+        One stat when nothing changed. Otherwise offers to merge their changes
+        into ours, overwrite them, or cancel. Returns True if saving should go ahead;
+        a merge with conflicts returns False so the result is reviewed first.
+        """
+        self.merge_conflicts = []
+        if not self.sidecar_state:
+            return True
+        try:
+            theirs = detect_concurrent_change(self.sidecar_state)
+        except Exception as e:
+            log(f"⚠️ Could not check sidecar for concurrent changes: {e}")
+            return True
+        if theirs is None:
+            return True
+        
+        choice = xbmcgui.Dialog().select(
+            "Segments were changed by another client",
+            ["Merge their changes with mine", "Overwrite with my version", "Cancel"]
+        )
+        if choice == 0:
+            self.segments, conflicts = merge_segment_lists(self.sidecar_state.base, self.segments, theirs)
+            # Their version is now part of ours; only a further change on disk asks again
+            self._adopt_disk_version(theirs)
+            self.segments_modified = True
+            self.merge_conflicts = conflicts
+            self.refresh_list()
+            log(f"🔀 Merged concurrent changes: {len(self.segments)} segments, {len(conflicts)} conflicts")
+            if conflicts:
+                xbmcgui.Dialog().notification(
+                    "Segment Editor",
+                    f"{len(conflicts)} overlapping edit(s) kept from both sides - review them, then save again",
+                    icon=self.icon_path,
+                    time=4000
+                )
+                return False
+            return True
+        if choice == 1:
+            log("⚠️ Overwriting concurrent changes with this client's version")
+            return True
+        log("❌ Save cancelled because of concurrent changes")
+        return False
+    
+    def review_merge(self):
+        """Reopen the window on the merged segments after it was closed (conflicts to review)"""
+        # Threads of the closed window stop; onInit starts new ones for the same segments
+        self._session += 1
+        self._closing = False
+        self.merge_conflicts = []
+        self.doModal()
+    
+    @edits_segments
     def save_segments(self):
         """Save segments to file without closing the dialog"""
         log(f"💾 save_segments() called with video_path={self.video_path}, segments count={len(self.segments) if self.segments else 0}")
@@ -1191,82 +1645,44 @@ class SegmentEditorDialog(xbmcgui.WindowXMLDialog):
             return
         
         try:
-            addon = get_addon()
-            save_format_raw = addon.getSetting("save_format")
-            log(f"📋 Save format setting (raw): {save_format_raw}")
-            
-            # Map display values to option values for labelenum
-            format_map = {
-                "Auto Detect": "auto",
-                "EDL Only": "edl",
-                "Chapter XML Only": "xml",
-                "Both Formats": "both"
-            }
-            save_format = format_map.get(save_format_raw, save_format_raw.lower() if save_format_raw else "auto")
-            log(f"📋 Save format (mapped): {save_format}")
+            save_format = get_save_format()
+            log(f"📋 Save format: {save_format}")
             
             if not self.segments:
                 log("❌ No segments to save")
                 xbmcgui.Dialog().ok("Segment Editor", "No segments to save.")
                 return
             
-            log(f"📝 Segments to save: {[f'{s.start_seconds:.3f}-{s.end_seconds:.3f} ({s.segment_type_label})' for s in self.segments]}")
+            # Offer to clamp segments that extend beyond the end of the video
+            out_of_range = find_out_of_range(self.segments, self.duration_ms)
+            if out_of_range and xbmcgui.Dialog().yesno(
+                "Segment Editor",
+                f"{len(out_of_range)} segment(s) extend beyond the end of the video ({ms_to_hms(self.duration_ms)}).\n\n"
+                "Clamp them before saving?"
+            ):
+                self.segments, _, _ = clamp_segments(self.segments, self.duration_ms)
+                self.refresh_list()
+            
+            if not self.resolve_concurrent_change():
+                return
             
-            edl_success = False
-            xml_success = False
+            log(f"📝 Segments to save: {[f'{ms_to_hms(s.start_ms)}-{ms_to_hms(s.end_ms)} ({s.segment_type_label})' for s in self.segments]}")
             
-            # Determine what to save based on setting
-            if save_format == "both":
-                # Save to both formats - try both even if one fails
-                edl_success = save_edl(self.video_path, self.segments)
-                xml_success = save_chapters(self.video_path, self.segments)
-                if edl_success and xml_success:
-                    log("💾 Saved to both EDL and XML formats")
-                elif edl_success:
-                    log("💾 Saved to EDL format (XML save failed)")
-                elif xml_success:
-                    log("💾 Saved to XML format (EDL save failed)")
-                else:
-                    log("❌ Both EDL and XML saves failed")
-            elif save_format == "xml":
-                # Save to XML only
-                xml_success = save_chapters(self.video_path, self.segments)
-                if xml_success:
-                    log("💾 Saved to XML format")
-            elif save_format == "edl":
-                # Save to EDL only
-                edl_success = save_edl(self.video_path, self.segments)
-                if edl_success:
-                    log("💾 Saved to EDL format")
-            else:  # auto
-                # Auto-detect: try to save to existing format, or EDL if none
-                # Check if chapters file exists
-                import xbmcvfs
-                base = os.path.splitext(self.video_path)[0]
-                chapters_path = f"{base}-chapters.xml"
-                if not xbmcvfs.exists(chapters_path):
-                    chapters_path = f"{base}_chapters.xml"
-                
-                if xbmcvfs.exists(chapters_path):
-                    xml_success = save_chapters(self.video_path, self.segments)
-                    if xml_success:
-                        log("💾 Auto-saved to XML format (existing file found)")
-                else:
-                    edl_success = save_edl(self.video_path, self.segments)
-                    if edl_success:
-                        log("💾 Auto-saved to EDL format (no existing file)")
+            results = write_segments(
+                self.video_path, self.segments, save_format, self.sidecars, self.edition, self.chapter_document
+            )
+            saved = [target_label(kind) for kind, ok in results.items() if ok]
+            failed = [target_label(kind) for kind, ok in results.items() if not ok]
             
             # Report success if at least one format saved successfully
-            if edl_success or xml_success:
+            if saved:
                 self.segments_modified = False
-                msg = "Segments saved successfully"
-                if save_format == "both":
-                    if edl_success and xml_success:
-                        msg = "Segments saved to both formats"
-                    elif edl_success:
-                        msg = "Segments saved to EDL (XML failed)"
-                    elif xml_success:
-                        msg = "Segments saved to XML (EDL failed)"
+                if self.sidecar_state:
+                    mark_saved(self.sidecar_state, self.segments)
+                snapshot_sidecars_async(self.video_path)
+                msg = f"Segments saved to {' and '.join(saved)}"
+                if failed:
+                    msg += f" ({', '.join(failed)} failed)"
                 xbmcgui.Dialog().notification(
                     "Segment Editor",
                     msg,
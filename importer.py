@@ -0,0 +1,333 @@
+"""
+Bulk import of intro/credits timestamps exported by other media servers
+(Jellyfin intro-skipper style JSON dumps, or any JSON/NDJSON keyed by path).
+
+The dump is streamed entry by entry, so a 100k-entry file is never held in
+memory as one object. Entries are joined against the library through an
+in-memory index of normalized file names (and optionally content
+fingerprints). Matched sidecars are then written on the library thread pool.
+"""
+import codecs
+import json
+import re
+import unicodedata
+
+import xbmcvfs
+
+from segment_parser import SegmentItem, seconds_to_ms
+from library import walk_directories, is_video_file, join_path, parallel_map, DEFAULT_WORKERS
+from segment_store import bulk_write_segments
+from video_identity import get_video_fingerprint
+from utils import log, log_always
+
+READ_CHUNK_SIZE = 256 * 1024
+UNMATCHED_SAMPLES = 20
+
+PATH_KEYS = ("path", "Path", "file", "File", "filename", "FileName", "name", "Name")
+FINGERPRINT_KEYS = ("fingerprint", "Fingerprint", "hash", "Hash")
+
+# Flat "<Prefix>Start"/"<Prefix>End" fields (seconds), as written by intro-skipper
+FLAT_SEGMENT_FIELDS = (
+    ("Recap", "Recap"),
+    ("Intro", "Intro"),
+    ("Introduction", "Intro"),
+    ("Preview", "Preview"),
+    ("Credits", "Credits"),
+    ("Outro", "Credits"),
+)
+
+# Member names that mark an object as a single entry rather than a keyed dump
+ENTRY_KEYS = set(PATH_KEYS) | set(FINGERPRINT_KEYS) | {"segments", "Segments", "Valid", "EpisodeId"} | {
+    prefix + suffix for prefix, _ in FLAT_SEGMENT_FIELDS for suffix in ("", "Start", "End")
+}
+
+_WHITESPACE = re.compile(r"[\s._\-]+")
+
+def normalize_name(path):
+    """Normalize a file path or name to a join key: base name, no extension, casefolded"""
+    name = re.split(r"[\\/]", path)[-1]
+    if "." in name:
+        name = name.rsplit(".", 1)[0]
+    name = unicodedata.normalize("NFKC", name).casefold()
+    return _WHITESPACE.sub(" ", name).strip()
+
+def _folder_names(path):
+    return [part.casefold() for part in re.split(r"[\\/]", path)[:-1] if part]
+
+# ---------------------------------------------------------------------------
+# Streaming JSON reader
+# ---------------------------------------------------------------------------
+
+class _JSONStream:
+    """Incrementally decode values from a VFS file without loading it whole"""
+
+    def __init__(self, path, chunk_size=READ_CHUNK_SIZE):
+        self.file = xbmcvfs.File(path)
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+
+    def close(self):
+        self.file.close()
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.file.readBytes(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop consumed text so the buffer stays around one chunk in size
+        self.buffer = self.buffer[self.pos:] + self.text_decoder.decode(bytes(chunk))
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character (without consuming it), or '' at EOF"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"expected one of {chars!r} in JSON dump, got {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number at the very end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            if not self._fill():
+                self.eof = True
+
+def iter_dump_entries(path):
+    """Yield (key, entry) pairs from a dump.
+
+    Supports a top-level object ({"<key>": {...}}), a top-level array and
+    NDJSON (one entry object per line); key is None for array and NDJSON
+    entries.
+    """
+    stream = _JSONStream(path)
+    try:
+        first = stream.peek()
+        if first == "[":
+            stream.expect("[")
+            if stream.peek() == "]":
+                return
+            while True:
+                yield None, stream.value()
+                if stream.expect(",]") == "]":
+                    return
+        elif first == "{":
+            # Either a keyed dump ({"<key>": entry, ...}) or the first line of NDJSON entries;
+            # the first member decides, so a keyed dump is still streamed member by member
+            stream.expect("{")
+            if stream.peek() == "}":
+                return
+            key = stream.value()
+            stream.expect(":")
+            value = stream.value()
+            if isinstance(value, dict) and key not in ENTRY_KEYS:
+                yield key, value
+                while stream.expect(",}") == ",":
+                    key = stream.value()
+                    stream.expect(":")
+                    yield key, stream.value()
+            else:
+                entry = {key: value}
+                while stream.expect(",}") == ",":
+                    key = stream.value()
+                    stream.expect(":")
+                    entry[key] = stream.value()
+                yield None, entry
+            while stream.peek() == "{":
+                yield None, stream.value()
+    finally:
+        stream.close()
+
+# ---------------------------------------------------------------------------
+# Entry interpretation
+# ---------------------------------------------------------------------------
+
+def _seconds(value):
+    return seconds_to_ms(float(value))
+
+def entry_segments(entry):
+    """Extract SegmentItems from one dump entry (flat, nested or list layouts)"""
+    segments = []
+    for prefix, label in FLAT_SEGMENT_FIELDS:
+        start, end = entry.get(prefix + "Start"), entry.get(prefix + "End")
+        if start is not None and end is not None and entry.get("Valid", True):
+            segments.append((_seconds(start), _seconds(end), label))
+        nested = entry.get(prefix)
+        if isinstance(nested, dict):
+            # Nested objects use Start/End or a prefixed variant such as IntroStart/IntroEnd
+            start = next((v for k, v in nested.items() if k.lower().endswith("start")), None)
+            end = next((v for k, v in nested.items() if k.lower().endswith("end")), None)
+            if start is not None and end is not None and nested.get("Valid", True):
+                segments.append((_seconds(start), _seconds(end), label))
+    for item in entry.get("segments") or entry.get("Segments") or []:
+        if not isinstance(item, dict):
+            continue
+        if "start_ms" in item:
+            start, end = int(item["start_ms"]), int(item["end_ms"])
+        else:
+            start, end = _seconds(item.get("start", item.get("Start"))), _seconds(item.get("end", item.get("End")))
+        label = item.get("label") or item.get("type") or item.get("Type") or "segment"
+        segments.append((start, end, str(label)))
+
+    result = []
+    for start, end, label in segments:
+        # intro-skipper writes 0/0 for "not detected"
+        if end > start:
+            result.append(SegmentItem.from_ms(start, end, label, "import"))
+    result.sort(key=lambda s: (s.start_ms, s.end_ms))
+    return result
+
+def entry_path(key, entry):
+    for field in PATH_KEYS:
+        value = entry.get(field)
+        if isinstance(value, str) and value:
+            return value
+    return key if isinstance(key, str) and (("/" in key) or ("\\" in key) or "." in key) else None
+
+def entry_fingerprint(entry):
+    for field in FINGERPRINT_KEYS:
+        value = entry.get(field)
+        if isinstance(value, str) and value:
+            return value
+    return None
+
+# ---------------------------------------------------------------------------
+# Library join
+# ---------------------------------------------------------------------------
+
+class LibraryIndex:
+    """Hash index of library videos by normalized name (and lazily by fingerprint)"""
+
+    def __init__(self, roots):
+        self.by_name = {}
+        self.videos = []
+        for root in roots:
+            for directory, _, files in walk_directories(root):
+                for name in files:
+                    if is_video_file(name):
+                        path = join_path(directory, name)
+                        self.videos.append(path)
+                        self.by_name.setdefault(normalize_name(name), []).append(path)
+        self._by_fingerprint = None
+
+    def match_name(self, path):
+        """Return (video_path, ambiguous)"""
+        candidates = self.by_name.get(normalize_name(path), [])
+        if len(candidates) == 1:
+            return candidates[0], False
+        if len(candidates) > 1:
+            # Same episode name in several shows: disambiguate by the entry's parent folder
+            # appearing anywhere in the library path (show folder vs. season folder)
+            folders = _folder_names(path)
+            parent = folders[-1] if folders else None
+            narrowed = [c for c in candidates if parent and parent in _folder_names(c)]
+            if len(narrowed) == 1:
+                return narrowed[0], False
+            return None, True
+        return None, False
+
+    def match_fingerprint(self, fingerprint, max_workers=DEFAULT_WORKERS):
+        if self._by_fingerprint is None:
+            fingerprints = parallel_map(get_video_fingerprint, self.videos, max_workers)
+            self._by_fingerprint = {fp: path for fp, path in zip(fingerprints, self.videos) if fp}
+        return self._by_fingerprint.get(fingerprint)
+
+def import_dump(dump_path, roots, formats=("edl",), use_fingerprints=False, dry_run=False,
+                max_workers=DEFAULT_WORKERS, replace=False):
+    """Import a JSON dump of intro/credits timestamps into sidecars under roots.
+
+    Imported segments are merged into each video's existing sidecars: they
+    replace existing segments with the same label (an older intro) and leave
+    the rest (commercial breaks, hand-made chapters) alone. With replace the
+    sidecars hold only the imported segments.
+
+    Returns a report dict with entry/matched/unmatched/ambiguous/empty/invalid/
+    written/failed counts and a few unmatched names for troubleshooting. An
+    entry with malformed times is counted as invalid and skipped.
+    """
+    if isinstance(roots, str):
+        roots = [roots]
+    library = LibraryIndex(roots)
+    log_always(f"📥 Importing {dump_path} against {len(library.videos)} library videos")
+
+    report = {"entries": 0, "matched": 0, "unmatched": 0, "ambiguous": 0, "empty": 0, "invalid": 0,
+              "written": 0, "failed": 0, "unmatched_samples": []}
+    matched = {}
+    pending_fingerprints = []
+    for key, entry in iter_dump_entries(dump_path):
+        report["entries"] += 1
+        if not isinstance(entry, dict):
+            report["unmatched"] += 1
+            continue
+        # Join first: building segments for entries that match nothing is wasted work
+        path = entry_path(key, entry)
+        video, ambiguous = library.match_name(path) if path else (None, False)
+        fingerprint = entry_fingerprint(entry) if use_fingerprints and not video else None
+        if video or fingerprint:
+            try:
+                segments = entry_segments(entry)
+            except (KeyError, TypeError, ValueError) as e:
+                log(f"⚠️ Skipped dump entry {path or key} with invalid times: {e}")
+                report["invalid"] += 1
+                continue
+            if not segments:
+                report["empty"] += 1
+            elif video:
+                matched[video] = segments
+            else:
+                pending_fingerprints.append((fingerprint, segments, path or key, ambiguous))
+            continue
+        report["ambiguous" if ambiguous else "unmatched"] += 1
+        if len(report["unmatched_samples"]) < UNMATCHED_SAMPLES:
+            report["unmatched_samples"].append(path or key)
+
+    # Fingerprinting reads every library file, so only do it for entries names couldn't place
+    for fingerprint, segments, name, ambiguous in pending_fingerprints:
+        video = library.match_fingerprint(fingerprint, max_workers)
+        if video:
+            matched[video] = segments
+        else:
+            report["ambiguous" if ambiguous else "unmatched"] += 1
+            if len(report["unmatched_samples"]) < UNMATCHED_SAMPLES:
+                report["unmatched_samples"].append(name)
+
+    report["matched"] = len(matched)
+    if not dry_run and matched:
+        results = bulk_write_segments(
+            [(video, segments, tuple(formats)) for video, segments in matched.items()], max_workers,
+            merge=not replace
+        )
+        report["failed"] = sum(1 for r in results if r["error"])
+        report["written"] = len(results) - report["failed"]
+
+    log_always(
+        f"📥 Import finished: {report['entries']} entries, {report['matched']} matched, "
+        f"{report['unmatched']} unmatched, {report['ambiguous']} ambiguous, {report['invalid']} invalid, "
+        f"{report['written']} written"
+    )
+    return report
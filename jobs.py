@@ -0,0 +1,209 @@
+"""
+Background job scheduler for library-wide work run inside the service.
+
+Jobs wait in a priority queue and run on a small pool of worker threads.
+While a video is playing, normal-priority jobs are throttled and
+low-priority jobs pause, so indexing or validation never competes with
+playback on low-power boxes. A paused job keeps its worker, so low-priority
+jobs never take the last free worker: normal and high-priority jobs always
+have one. Everything stops when Kodi requests abort.
+
+Long jobs cooperate through Job.checkpoint(); library.parallel_map calls the
+checkpoint of the job running on the submitting thread before each item, so
+the existing batch functions are throttled without changes.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+import xbmc
+
+from library import set_thread_checkpoint
+from utils import log, log_always
+
+PRIORITY_HIGH = 0     # User-initiated; never throttled
+PRIORITY_NORMAL = 10  # Throttled while a video plays
+PRIORITY_LOW = 20     # Paused while a video plays
+
+DEFAULT_WORKERS = 2
+# Delay added at every checkpoint of a throttled job
+THROTTLE_DELAY = 0.2
+# How often paused jobs and idle workers re-check playback / abort
+POLL_INTERVAL = 0.5
+
+class JobCancelled(Exception):
+    """Raised from Job.checkpoint() when the job was cancelled or Kodi is shutting down"""
+
+class Job:
+    QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+    def __init__(self, scheduler, name, func, priority, args, kwargs):
+        self.scheduler = scheduler
+        self.name = name
+        self.func = func
+        self.priority = priority
+        self.args = args
+        self.kwargs = kwargs
+        self.status = Job.QUEUED
+        self.result = None
+        self.error = None
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set() or self.scheduler.aborting()
+
+    def checkpoint(self):
+        """Cancellation point; also where throttling and pausing happen during playback"""
+        if self.cancelled:
+            raise JobCancelled(self.name)
+        if self.priority <= PRIORITY_HIGH:
+            return
+        if self.priority >= PRIORITY_LOW:
+            while self.scheduler.is_playing():
+                if self.scheduler.wait(POLL_INTERVAL) or self.cancelled:
+                    raise JobCancelled(self.name)
+        elif self.scheduler.is_playing():
+            if self.scheduler.wait(THROTTLE_DELAY) or self.cancelled:
+                raise JobCancelled(self.name)
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns its result or raises its error"""
+        self._finished.wait(timeout)
+        if self.status == Job.FAILED:
+            raise self.error
+        if self.status == Job.CANCELLED:
+            raise JobCancelled(self.name)
+        return self.result
+
+    def run(self):
+        self.status = Job.RUNNING
+        set_thread_checkpoint(self.checkpoint)
+        started = time.time()
+        try:
+            self.checkpoint()
+            self.result = self.func(*self.args, **self.kwargs)
+            self.status = Job.DONE
+            log(f"✅ Job '{self.name}' finished in {time.time() - started:.1f}s")
+        except JobCancelled:
+            self.status = Job.CANCELLED
+            log_always(f"🛑 Job '{self.name}' cancelled")
+        except Exception as e:
+            self.status = Job.FAILED
+            self.error = e
+            log_always(f"❌ Job '{self.name}' failed: {e}")
+        finally:
+            set_thread_checkpoint(None)
+            self._finished.set()
+
+class JobScheduler:
+    """Priority queue of jobs served by a bounded pool of daemon worker threads"""
+
+    def __init__(self, monitor, player=None, max_workers=DEFAULT_WORKERS):
+        self.monitor = monitor
+        self.player = player or xbmc.Player()
+        self.max_workers = max_workers
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._workers = []
+        self.running = set()
+
+    def start(self):
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker, name=f"segment-jobs-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        log(f"⚙️ Job scheduler started with {self.max_workers} workers")
+
+    def aborting(self):
+        return self._stopping or self.monitor.abortRequested()
+
+    def is_playing(self):
+        try:
+            return self.player.isPlayingVideo()
+        except Exception:
+            return False
+
+    def wait(self, seconds):
+        """Sleep unless Kodi is shutting down; returns True on abort"""
+        return self.monitor.waitForAbort(seconds) or self._stopping
+
+    def submit(self, func, *args, name=None, priority=PRIORITY_NORMAL, **kwargs):
+        """Queue func(*args, **kwargs) and return its Job"""
+        job = Job(self, name or getattr(func, "__name__", "job"), func, priority, args, kwargs)
+        with self._condition:
+            heapq.heappush(self._queue, (priority, next(self._counter), job))
+            self._condition.notify()
+        log(f"📋 Job '{job.name}' queued (priority {priority}, {len(self._queue)} waiting)")
+        return job
+
+    def pending(self):
+        with self._condition:
+            return [job for _, _, job in sorted(self._queue)]
+
+    def _next_job(self):
+        """Pop the next runnable job, waiting while the queue is empty or only paused jobs remain"""
+        with self._condition:
+            while not self.aborting():
+                if self._queue:
+                    priority, _, job = self._queue[0]
+                    # Low-priority jobs don't even start while a video plays, and leave
+                    # one worker free for normal and high-priority work
+                    if priority < PRIORITY_LOW or (not self.is_playing() and self._low_slot_free()):
+                        heapq.heappop(self._queue)
+                        if job._cancelled.is_set():
+                            job.status = Job.CANCELLED
+                            job._finished.set()
+                            continue
+                        self.running.add(job)
+                        return job
+                self._condition.wait(POLL_INTERVAL)
+        return None
+
+    def _low_slot_free(self):
+        """True if a low-priority job may start (called with the condition held)"""
+        running_low = sum(1 for job in self.running if job.priority >= PRIORITY_LOW)
+        return running_low < max(1, self.max_workers - 1)
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                job.run()
+            finally:
+                with self._condition:
+                    self.running.discard(job)
+                    self._condition.notify()
+
+    def cancel_all(self):
+        with self._condition:
+            for _, _, job in self._queue:
+                job.cancel()
+        with self._condition:
+            running = list(self.running)
+        for job in running:
+            job.cancel()
+
+    def shutdown(self, timeout=5.0):
+        """Cancel everything and wait briefly for workers to reach a checkpoint"""
+        self.cancel_all()
+        with self._condition:
+            self._stopping = True
+            for _, _, job in self._queue:
+                job.status = Job.CANCELLED
+                job._finished.set()
+            self._queue = []
+            self._condition.notify_all()
+        deadline = time.time() + timeout
+        for worker in self._workers:
+            worker.join(max(0, deadline - time.time()))
+        log_always("⚙️ Job scheduler stopped")
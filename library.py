@@ -0,0 +1,586 @@
+"""
+Library-level batch operations over directories of videos and their segment sidecars.
+All network I/O goes through xbmcvfs; per-file work is spread over a small thread pool
+because reads and writes on SMB/NFS shares are latency-bound, not CPU-bound.
+"""
+import difflib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import xbmcvfs
+
+from segment_parser import (
+    safe_file_read, retime_segments, get_action_mapping,
+    find_out_of_range, clamp_segments, ms_to_hms, hms_to_ms, seconds_to_ms, SegmentItem,
+    normalize_segments, get_normalize_rules, read_chapter_document, parse_edl, merge_sources, ChapterDocument
+)
+from sidecar_formats import (
+    get_format, format_names, format_for_path, read_sidecar, is_sidecar_content, file_is_sidecar, is_folder_chapters,
+    FOLDER_CHAPTERS
+)
+from media_probe import get_video_duration_ms
+from segment_index import get_index
+from utils import log, log_always, stat_file
+
+VIDEO_EXTENSIONS = (".mkv", ".mp4", ".m4v", ".avi", ".ts", ".m2ts", ".mov", ".wmv", ".mpg", ".mpeg", ".webm")
+DEFAULT_WORKERS = 4
+
+def path_separator(path):
+    """Return the separator used by a path (URLs and POSIX paths use '/')"""
+    if "://" not in path and "\\" in path:
+        return "\\"
+    return "/"
+
+def join_path(directory, name):
+    """Join a directory and a file name without mangling VFS URLs on Windows"""
+    sep = path_separator(directory)
+    if directory.endswith(sep):
+        return directory + name
+    return directory + sep + name
+
+def sibling_dir(video_path):
+    """Return the directory part of a video path (VFS URLs included)"""
+    sep = path_separator(video_path)
+    return video_path.rsplit(sep, 1)[0] if sep in video_path else ""
+
+def list_directory(directory):
+    """List a directory through the VFS. Returns (dirs, files) or ([], []) on error."""
+    sep = path_separator(directory)
+    # Several VFS implementations (smb://, nfs://) require the trailing separator
+    listing_path = directory if directory.endswith(sep) else directory + sep
+    try:
+        dirs, files = xbmcvfs.listdir(listing_path)
+        return list(dirs), list(files)
+    except Exception as e:
+        log(f"⚠️ Could not list directory {directory}: {e}")
+        return [], []
+
+def is_video_file(filename):
+    """Check if a file name has a known video extension"""
+    return filename.lower().endswith(VIDEO_EXTENSIONS)
+
+def sidecar_kind(filename):
+    """Return the registered format name ("edl", "xml", "comskip", ...) for a sidecar file name, None otherwise"""
+    return format_for_path(filename)
+
+def walk_directories(root):
+    """Yield (directory, dirs, files) for root and every subdirectory, breadth-first"""
+    pending = [root]
+    while pending:
+        directory = pending.pop(0)
+        dirs, files = list_directory(directory)
+        yield directory, dirs, files
+        pending.extend(join_path(directory, name) for name in sorted(dirs))
+
+def video_sidecars(filename, names, directory):
+    """Map format name -> path for one video's sidecars in a directory listing.
+
+    Formats are checked in registry order and a suffix shared by two formats
+    (.edl) goes to the first, so the result is also in preference order.
+    Files of a format with a generic suffix (<video>.txt for Comskip) are only
+    claimed when their head sniffs as that format, which costs one read.
+    """
+    base = filename.rsplit(path_separator(filename), 1)[-1].rsplit(".", 1)[0]
+    claimed = set()
+    sidecars = {}
+    for kind in format_names():
+        fmt = get_format(kind)
+        for suffix in fmt.suffixes:
+            if base + suffix in names and base + suffix not in claimed:
+                path = join_path(directory, base + suffix)
+                if fmt.sniff_required and not file_is_sidecar(path, kind):
+                    continue
+                sidecars[kind] = path
+                claimed.add(base + suffix)
+                break
+    return sidecars
+
+def group_sidecars(directory, files):
+    """Pair each video in a directory listing with its sidecars.
+
+    Returns a list of (video_path, {"edl": path, "xml": path, ...}) from the
+    listing, so no exists() round trips are needed; only a <video>.txt is read
+    to tell Comskip output from other text files.
+    """
+    names = set(files)
+    return [
+        (join_path(directory, name), video_sidecars(name, names, directory))
+        for name in sorted(files) if is_video_file(name)
+    ]
+
+_thread_state = threading.local()
+
+def set_thread_checkpoint(checkpoint):
+    """Install a callable that parallel_map calls before each item on this thread's behalf.
+
+    The job scheduler uses it to throttle and cancel batch work; it may raise
+    to abort the batch.
+    """
+    _thread_state.checkpoint = checkpoint
+
+def checkpoint():
+    """Run this thread's job checkpoint, if any (lets long sequential loops be throttled/cancelled)"""
+    hook = getattr(_thread_state, "checkpoint", None)
+    if hook:
+        hook()
+
+def current_checkpoint():
+    """This thread's job checkpoint as a callable (a no-op if none), for loops run on pool threads"""
+    return getattr(_thread_state, "checkpoint", None) or (lambda: None)
+
+def parallel_map(func, items, max_workers=DEFAULT_WORKERS):
+    """Apply func to every item on a thread pool, preserving order"""
+    items = list(items)
+    checkpoint = getattr(_thread_state, "checkpoint", None)
+    if checkpoint:
+        inner = func
+        def func(item):
+            checkpoint()
+            return inner(item)
+    if len(items) <= 1 or max_workers <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(func, items))
+
+def parse_sidecar_content(kind, content, action_mapping=None):
+    """Parse sidecar text of the given format into SegmentItem objects"""
+    return get_format(kind).parse(content, action_mapping)
+
+def format_sidecar_content(kind, segments, action_mapping=None):
+    """Serialize segments to sidecar text of the given format"""
+    return get_format(kind).format(segments, action_mapping)
+
+def segment_to_dict(seg):
+    """Plain dict form of a segment for JSON APIs and exports"""
+    return {
+        "start_ms": seg.start_ms,
+        "end_ms": seg.end_ms,
+        "label": seg.raw_label,
+        "action_type": seg.action_type,
+        "source": seg.source,
+    }
+
+def segment_from_dict(data, source="json"):
+    """Inverse of segment_to_dict; start/end may also be seconds or HH:MM:SS.mmm strings"""
+    def time_ms(key):
+        if key + "_ms" in data:
+            return int(data[key + "_ms"])
+        value = data[key]
+        return hms_to_ms(value) if isinstance(value, str) else seconds_to_ms(value)
+    return SegmentItem.from_ms(
+        time_ms("start"), time_ms("end"), data.get("label") or "segment", source, data.get("action_type")
+    )
+
+def segments_to_json(segments):
+    """Compact JSON form of segments for the index cache"""
+    return json.dumps([
+        [seg.start_ms, seg.end_ms, seg.raw_label, seg.action_type, seg.source] for seg in segments
+    ], separators=(",", ":"))
+
+def segments_from_json(data):
+    """Rebuild SegmentItem objects from segments_to_json output"""
+    return [SegmentItem.from_ms(start, end, label, source, action) for start, end, label, action, source in json.loads(data)]
+
+def read_sidecar_segments(path, kind=None, action_mapping=None):
+    """Parse a sidecar, served from the segment index while its size/mtime are unchanged.
+
+    A warm lookup costs one stat and no read, which is what makes scanning
+    whole shows over a network share fast.
+    """
+    kind = kind or sidecar_kind(path)
+    stat = stat_file(path)
+    index = get_index()
+    if stat and index:
+        cached = index.get_sidecar_segments(path, *stat)
+        if cached is not None:
+            try:
+                return segments_from_json(cached)
+            except (ValueError, TypeError) as e:
+                log(f"⚠️ Ignoring corrupt cached segments for {path}: {e}")
+
+    found, segments = read_sidecar(path, action_mapping, kind)
+    if stat and index and found:
+        index.set_sidecar_segments(path, *stat, segments_to_json(segments))
+    return segments
+
+def read_video_segments(sidecars, action_mapping=None):
+    """Return a video's segments from its first non-empty sidecar in format preference order"""
+    for kind in format_names():
+        if kind in sidecars:
+            segments = read_sidecar_segments(sidecars[kind], kind, action_mapping)
+            if segments:
+                return segments
+    return []
+
+def load_video_segments(video_path):
+    """Load every sidecar of a video concurrently and merge them into one timeline.
+
+    The directory is listed once to find the video's sidecars in any
+    registered format, then they are read (usually one small read each) and
+    parsed side by side, since each read is latency-bound on network shares.
+    Identical ranges found in several files appear once with joined sources
+    (e.g. "xml+edl"). Only the default chapter edition is materialized.
+    Returns (segments, chapter_document or None, {format: path}).
+
+    A folder-wide chapters.xml is read when the video has no chapter XML of
+    its own but is left out of {format: path}: it is shared by the whole
+    folder, so saves write the video's own chapter XML and deletes skip it.
+    """
+    directory = sibling_dir(video_path)
+    names = set(list_directory(directory)[1]) if directory else set()
+    if not names:
+        # Some VFS sources can't be listed - probe the chapter XML and EDL names directly
+        document, edl = parallel_map(lambda load: load(video_path), (read_chapter_document, parse_edl), 2)
+        sidecars = {"xml": document.path} if document and not is_folder_chapters(document.path) else {}
+        if edl:
+            sidecars["edl"] = default_sidecar_path(video_path, "edl")
+        return merge_sources(document.segments() if document else [], edl), document, sidecars
+
+    sidecars = video_sidecars(video_path, names, directory)
+    sources = dict(sidecars)
+    if "xml" not in sidecars and FOLDER_CHAPTERS in names:
+        # Read-only: shown in the timeline, never saved over or deleted
+        sources = dict(xml=join_path(directory, FOLDER_CHAPTERS), **sidecars)
+    action_mapping = get_action_mapping()
+
+    def load(item):
+        kind, path = item
+        if kind != "xml":
+            return None, read_sidecar(path, action_mapping, kind)[1]
+        content = safe_file_read(path)
+        try:
+            document = ChapterDocument.from_string(content, path) if content else None
+        except Exception as e:
+            log(f"❌ XML parse failed for {path}: {e}")
+            document = None
+        return document, document.segments() if document else []
+
+    loaded = parallel_map(load, list(sources.items()), DEFAULT_WORKERS)
+    document = next((doc for doc, _ in loaded if doc), None)
+    segments = merge_sources(*(segs for _, segs in loaded))
+    if len(sources) > 1:
+        log(f"🔗 Merged {', '.join(sources)} sidecars into {len(segments)} segments")
+    return segments, document, sidecars
+
+def default_sidecar_path(video_path, kind):
+    """Path of a new sidecar of the given format next to a video"""
+    return get_format(kind).default_path(video_path)
+
+def merge_labelled_segments(existing, added, labels=None):
+    """Existing segments plus copies of added ones; existing segments carrying one of
+    labels (default: the added segments' labels) are replaced"""
+    if labels is None:
+        labels = {seg.segment_type_label for seg in added}
+    kept = [seg for seg in existing if seg.segment_type_label not in labels]
+    return sorted(kept + [seg.copy_with() for seg in added], key=lambda s: (s.start_ms, s.end_ms))
+
+def write_video_segments(video_path, segments, kinds=("edl",), sidecars=None, action_mapping=None, merge=False):
+    """Write a video's segments to the given sidecar kinds, reusing existing sidecar names.
+
+    sidecars is the {"edl": path, "xml": path} mapping from group_sidecars, so
+    callers that already listed the directory don't pay for exists() checks.
+    With merge, segments are added to each sidecar's existing ones instead of
+    replacing them (see merge_labelled_segments).
+    """
+    sidecars = sidecars or {}
+    result = {"video": video_path, "written": [], "error": None}
+    try:
+        for kind in kinds:
+            path = sidecars.get(kind) or default_sidecar_path(video_path, kind)
+            kind_segments = segments
+            if merge and kind in sidecars:
+                kind_segments = merge_labelled_segments(read_sidecar_segments(path, kind, action_mapping), segments)
+            if get_format(kind).save(video_path, kind_segments, path=path, action_mapping=action_mapping):
+                result["written"].append(path)
+            else:
+                result["error"] = f"write failed: {path}"
+    except Exception as e:
+        result["error"] = str(e)
+        log(f"❌ Failed to write segments for {video_path}: {e}")
+    return result
+
+def bulk_write_segments(items, max_workers=DEFAULT_WORKERS, merge=False):
+    """Write many videos' segments at once.
+
+    items is a list of (video_path, segments, kinds). Each directory is listed
+    once to find existing sidecar names, then the writes run in parallel.
+    merge keeps what the sidecars already hold (see write_video_segments).
+    Results are returned in input order.
+    """
+    listings = {}
+    for video_path, _, _ in items:
+        directory = sibling_dir(video_path)
+        if directory not in listings:
+            listings[directory] = dict(group_sidecars(directory, list_directory(directory)[1]))
+
+    action_mapping = get_action_mapping()
+    results = parallel_map(
+        lambda item: write_video_segments(
+            item[0], item[1], item[2], listings[sibling_dir(item[0])].get(item[0]), action_mapping, merge
+        ),
+        items,
+        max_workers
+    )
+    log_always(f"💾 Bulk write: {sum(1 for r in results if not r['error'])} of {len(results)} videos written")
+    return results
+
+def read_sidecar_editions(kind, content, path=None, action_mapping=None):
+    """Parse sidecar text for a rewrite. Returns (document, {edition: segments}).
+
+    Chapter XML is kept as a ChapterDocument with every edition, so a rewrite
+    patches atoms in place (UIDs, languages, flags and the other editions
+    survive); other formats have a single None edition.
+    """
+    if kind == "xml":
+        document = ChapterDocument.from_string(content, path)
+        return document, {index: document.segments(index) for index in range(len(document.editions))}
+    return None, {None: parse_sidecar_content(kind, content, action_mapping)}
+
+def format_sidecar_editions(kind, document, editions, action_mapping=None):
+    """Text of a rewritten sidecar; for chapter XML the given editions are patched into the document"""
+    if document is None:
+        return format_sidecar_content(kind, editions[None], action_mapping)
+    for edition, segments in editions.items():
+        document.replace_edition(edition, segments, action_mapping)
+    return document.to_string()
+
+def save_sidecar_editions(video_path, path, kind, document, editions, action_mapping=None):
+    """Write a rewritten sidecar through its format's save path"""
+    edition = document.default_edition() if document is not None else None
+    return get_format(kind).save(
+        video_path, editions[edition], path=path, action_mapping=action_mapping, edition=edition, document=document
+    )
+
+def rewrite_sidecar(path, transform, dry_run=True, action_mapping=None, kind=None):
+    """Apply transform(segments) -> segments to one sidecar. Returns a result dict with a unified diff.
+
+    Files whose content doesn't sniff as their format are skipped untouched.
+    In chapter XML every edition is transformed (a retime applies to all cuts)
+    and patched in place.
+    """
+    result = {"path": path, "changed": False, "written": False, "skipped": False, "diff": [], "error": None}
+    kind = kind or sidecar_kind(path)
+    try:
+        content = safe_file_read(path)
+        if not content:
+            result["error"] = "empty or unreadable"
+            return result
+        if not is_sidecar_content(content, path, kind):
+            log(f"⏭️ Skipping {path}: not a {get_format(kind).label} file")
+            result["skipped"] = True
+            return result
+
+        document, editions = read_sidecar_editions(kind, content, path, action_mapping)
+        # Diff against the document as it serializes unchanged, so only patched atoms show
+        original = document.to_string() if document is not None else content
+        editions = {edition: transform(segments) for edition, segments in editions.items()}
+        new_content = format_sidecar_editions(kind, document, editions, action_mapping)
+
+        result["diff"] = list(difflib.unified_diff(
+            original.splitlines(), new_content.splitlines(),
+            fromfile=path, tofile=path, lineterm=""
+        ))
+        result["changed"] = bool(result["diff"])
+
+        if result["changed"] and not dry_run:
+            success = save_sidecar_editions(path, path, kind, document, editions, action_mapping)
+            result["written"] = success
+            if not success:
+                result["error"] = "write failed"
+    except Exception as e:
+        result["error"] = str(e)
+        log(f"❌ Failed to rewrite {path}: {e}")
+    return result
+
+def directory_sidecars(directory, files):
+    """{path: format} of the sidecars belonging to a video in a directory listing, plus chapters.xml"""
+    sidecars = {
+        path: kind
+        for _, found in group_sidecars(directory, files)
+        for kind, path in found.items()
+    }
+    if FOLDER_CHAPTERS in files:
+        sidecars[join_path(directory, FOLDER_CHAPTERS)] = "xml"
+    return sidecars
+
+def rewrite_directory(directory, transform, dry_run=True, max_workers=DEFAULT_WORKERS):
+    """Apply transform to every segment sidecar in a directory in parallel.
+
+    Only files named after a video (or the folder's chapters.xml) are
+    considered, and each must sniff as its format, so unrelated .txt files
+    are never rewritten.
+    """
+    _, files = list_directory(directory)
+    sidecars = sorted(directory_sidecars(directory, files).items())
+
+    # Read the mapping once instead of once per file
+    action_mapping = get_action_mapping()
+    results = parallel_map(
+        lambda item: rewrite_sidecar(item[0], transform, dry_run, action_mapping, item[1]),
+        sidecars,
+        max_workers
+    )
+
+    changed = sum(1 for r in results if r["changed"])
+    failed = sum(1 for r in results if r["error"])
+    skipped = sum(1 for r in results if r["skipped"])
+    log_always(
+        f"✅ Rewrite of {directory} finished: {changed} changed, {failed} failed, {skipped} skipped, "
+        f"{len(results) - changed - failed - skipped} unchanged"
+    )
+    return results
+
+def retime_sidecar(path, ratio=1, offset_ms=0, fps=None, dry_run=True, action_mapping=None):
+    """Retime a single sidecar file. Returns a result dict with a unified diff."""
+    return rewrite_sidecar(
+        path, lambda segments: retime_segments(segments, ratio=ratio, offset_ms=offset_ms, fps=fps),
+        dry_run, action_mapping
+    )
+
+def retime_directory(directory, ratio=1, offset_ms=0, fps=None, dry_run=True, max_workers=DEFAULT_WORKERS):
+    """Retime every segment sidecar in a directory in parallel.
+
+    With dry_run=True (the default) nothing is written; the returned result
+    dicts carry unified diffs of what would change.
+    """
+    log_always(f"⏱️ Retiming sidecars in {directory} (ratio={ratio}, offset={offset_ms}ms, dry_run={dry_run})")
+    return rewrite_directory(
+        directory, lambda segments: retime_segments(segments, ratio=ratio, offset_ms=offset_ms, fps=fps),
+        dry_run, max_workers
+    )
+
+def normalize_directory(directory, rules=None, dry_run=True, max_workers=DEFAULT_WORKERS):
+    """Normalize (merge / dedupe / drop short) every segment sidecar in a directory.
+
+    rules are normalize_segments keyword arguments, read from settings by
+    default. With dry_run=True the results carry diffs of what would change.
+    """
+    rules = rules if rules is not None else get_normalize_rules()
+    log_always(f"🧹 Normalizing sidecars in {directory} ({rules}, dry_run={dry_run})")
+    return rewrite_directory(directory, lambda segments: normalize_segments(segments, **rules)[0], dry_run, max_workers)
+
+def check_video_duration(video_path, sidecars, clamp=False, action_mapping=None):
+    """Check one video's sidecars against its container duration, optionally clamping them"""
+    result = {"video": video_path, "duration_ms": None, "issues": [], "clamped": [], "error": None}
+    try:
+        duration_ms = get_video_duration_ms(video_path)
+        result["duration_ms"] = duration_ms
+        if not duration_ms:
+            return result
+        for kind, path in sorted(sidecars.items()):
+            content = safe_file_read(path)
+            if not content or not is_sidecar_content(content, path, kind):
+                continue
+            document, editions = read_sidecar_editions(kind, content, path, action_mapping)
+            clamped = {}
+            for edition, segments in editions.items():
+                where = f"{path} (edition {edition + 1})" if len(editions) > 1 else path
+                bad = find_out_of_range(segments, duration_ms)
+                for i in bad:
+                    seg = segments[i]
+                    result["issues"].append(
+                        f"{where}: segment {i + 1} ({ms_to_hms(seg.start_ms)}-{ms_to_hms(seg.end_ms)}) "
+                        f"extends beyond {ms_to_hms(duration_ms)}"
+                    )
+                if bad:
+                    clamped[edition] = clamp_segments(segments, duration_ms)[0]
+            if clamped and clamp:
+                editions.update(clamped)
+                format_sidecar_editions(kind, document, clamped, action_mapping)
+                if save_sidecar_editions(video_path, path, kind, document, editions, action_mapping):
+                    result["clamped"].append(path)
+    except Exception as e:
+        result["error"] = str(e)
+        log(f"❌ Duration check failed for {video_path}: {e}")
+    return result
+
+def validate_durations(roots, clamp=False, recursive=True, max_workers=DEFAULT_WORKERS):
+    """Flag (or clamp) segments beyond the video duration for every video under roots.
+
+    Durations come from container headers via the segment index cache, so
+    the player is never opened and repeat runs don't re-probe unchanged files.
+    Only videos with at least one sidecar are probed. Returns results that
+    have issues or errors.
+    """
+    if isinstance(roots, str):
+        roots = [roots]
+    action_mapping = get_action_mapping()
+    jobs = []
+    for root in roots:
+        walker = walk_directories(root) if recursive else [(root,) + list_directory(root)]
+        for directory, _, files in walker:
+            jobs.extend((video, sidecars) for video, sidecars in group_sidecars(directory, files) if sidecars)
+
+    log_always(f"⏱️ Checking {len(jobs)} videos with sidecars against their durations (clamp={clamp})")
+    results = parallel_map(
+        lambda job: check_video_duration(job[0], job[1], clamp, action_mapping),
+        jobs,
+        max_workers
+    )
+    flagged = [r for r in results if r["issues"] or r["error"]]
+    log_always(f"✅ Duration check finished: {len(flagged)} of {len(results)} videos need attention")
+    return flagged
+
+def propagate_to_sibling(video_path, sidecars, segments, labels, default_kinds, dry_run=True, action_mapping=None):
+    """Write the propagated segments into one sibling episode's sidecars"""
+    result = {"video": video_path, "paths": [], "changed": False, "written": False, "error": None}
+    targets = dict(sidecars) or {kind: default_sidecar_path(video_path, kind) for kind in default_kinds}
+    try:
+        for kind, path in sorted(targets.items()):
+            content = safe_file_read(path) if kind in sidecars else ""
+            if content and not is_sidecar_content(content, path, kind):
+                # Named like a sidecar but something else (e.g. a .txt note); never overwrite it
+                continue
+            document, editions = read_sidecar_editions(kind, content, path, action_mapping) if content else (None, {None: []})
+            original = document.to_string() if document is not None else content
+            # Only the default chapter edition receives the propagated segments
+            edition = document.default_edition() if document is not None else None
+            editions[edition] = merge_labelled_segments(editions[edition], segments, labels)
+            new_content = format_sidecar_editions(kind, document, {edition: editions[edition]}, action_mapping)
+            if new_content == original:
+                continue
+            result["paths"].append(path)
+            result["changed"] = True
+            if not dry_run:
+                if not save_sidecar_editions(video_path, path, kind, document, editions, action_mapping):
+                    result["error"] = f"write failed: {path}"
+        result["written"] = result["changed"] and not dry_run and not result["error"]
+    except Exception as e:
+        result["error"] = str(e)
+        log(f"❌ Failed to propagate segments to {video_path}: {e}")
+    return result
+
+def propagate_to_season(video_path, segments, labels=None, default_kinds=("edl",), dry_run=True,
+                        max_workers=DEFAULT_WORKERS, propagate=propagate_to_sibling):
+    """Copy a video's segments to every sibling episode in the same directory.
+
+    Only segments whose normalized label is in labels are propagated (all if
+    labels is None); on each sibling, existing segments with those labels are
+    replaced and everything else is kept. Siblings without sidecars get new
+    ones of default_kinds. Uses a single directory listing and writes on a
+    thread pool. With dry_run=True the results are a preview of which files
+    would change. propagate writes one sibling (propagate_to_sibling's
+    signature); the segment store passes its own.
+    """
+    if labels is not None:
+        labels = {label.strip().lower() for label in labels}
+        segments = [seg for seg in segments if seg.segment_type_label in labels]
+    else:
+        labels = {seg.segment_type_label for seg in segments}
+    if not segments:
+        return []
+
+    directory = sibling_dir(video_path)
+    _, files = list_directory(directory)
+    siblings = [(video, sidecars) for video, sidecars in group_sidecars(directory, files) if video != video_path]
+    log_always(f"📺 Propagating {len(segments)} segments to {len(siblings)} siblings of {video_path} (dry_run={dry_run})")
+
+    action_mapping = get_action_mapping()
+    results = parallel_map(
+        lambda job: propagate(job[0], job[1], segments, labels, default_kinds, dry_run, action_mapping),
+        siblings,
+        max_workers
+    )
+    log_always(f"✅ Propagation finished: {sum(1 for r in results if r['changed'])} of {len(results)} episodes changed")
+    return results
@@ -0,0 +1,646 @@
+"""
+Minimal container readers that pull metadata out of video files with a handful of
+ranged reads through xbmcvfs.File.seek(), so they stay cheap on SMB/NFS shares.
+Nothing here ever reads the media payload itself.
+"""
+import bisect
+import struct
+import threading
+from collections import OrderedDict
+
+import xbmcvfs
+
+from segment_parser import SegmentItem
+from segment_index import get_index
+from utils import log, stat_file
+
+MKV_EXTENSIONS = (".mkv", ".mk3d", ".webm")
+MP4_EXTENSIONS = (".mp4", ".m4v", ".mov")
+
+# EBML / Matroska element IDs (with length marker bits, as stored on disk)
+EBML_HEADER = 0x1A45DFA3
+MKV_SEGMENT = 0x18538067
+MKV_SEEK_HEAD = 0x114D9B74
+MKV_SEEK = 0x4DBB
+MKV_SEEK_ID = 0x53AB
+MKV_SEEK_POSITION = 0x53AC
+MKV_INFO = 0x1549A966
+MKV_TIMESTAMP_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_CLUSTER = 0x1F43B675
+MKV_CHAPTERS = 0x1043A770
+MKV_EDITION_ENTRY = 0x45B9
+MKV_EDITION_FLAG_DEFAULT = 0x45DB
+MKV_CHAPTER_ATOM = 0xB6
+MKV_CHAPTER_TIME_START = 0x91
+MKV_CHAPTER_TIME_END = 0x92
+MKV_CHAPTER_FLAG_ENABLED = 0x4598
+MKV_CHAPTER_DISPLAY = 0x80
+MKV_CHAP_STRING = 0x85
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_TRACK_NUMBER = 0xD7
+MKV_TRACK_TYPE = 0x83
+MKV_CUES = 0x1C53BB6B
+MKV_CUE_POINT = 0xBB
+MKV_CUE_TIME = 0xB3
+MKV_CUE_TRACK_POSITIONS = 0xB7
+MKV_CUE_TRACK = 0xF7
+MKV_TRACK_TYPE_VIDEO = 1
+
+# Maximum number of sibling boxes/elements to walk before giving up
+MAX_BOX_SCAN = 64
+
+# Upper bound for a single element body we are willing to load (chapters, seek heads)
+MAX_ELEMENT_READ = 1024 * 1024
+# Seek indexes (Cues, stss) of long videos are larger; still only a few hundred KB in practice
+MAX_INDEX_READ = 16 * 1024 * 1024
+# Number of top-level element headers to walk when a file has no usable SeekHead
+MAX_TOP_LEVEL_SCAN = 32
+
+class RangeReader:
+    """Ranged reads over an xbmcvfs.File, served from a small LRU block cache.
+
+    Header parsing does many tiny reads close to each other; fetching aligned
+    blocks turns those into one network round trip per block.
+    """
+
+    BLOCK_SIZE = 16 * 1024
+    MAX_BLOCKS = 64
+
+    def __init__(self, path):
+        self.path = path
+        self._file = xbmcvfs.File(path)
+        self.size = self._file.size()
+        self._blocks = OrderedDict()
+        self.bytes_read = 0
+
+    def _block(self, index):
+        data = self._blocks.get(index)
+        if data is not None:
+            self._blocks.move_to_end(index)
+            return data
+        self._file.seek(index * self.BLOCK_SIZE, 0)
+        data = bytes(self._file.readBytes(self.BLOCK_SIZE))
+        self.bytes_read += len(data)
+        self._blocks[index] = data
+        if len(self._blocks) > self.MAX_BLOCKS:
+            self._blocks.popitem(last=False)
+        return data
+
+    def read(self, offset, length):
+        """Read up to length bytes at offset (short at end of file)"""
+        if offset < 0 or length <= 0 or offset >= self.size:
+            return b""
+        length = min(length, self.size - offset)
+        if length > self.BLOCK_SIZE * 4:
+            # Large bodies bypass the cache
+            self._file.seek(offset, 0)
+            data = bytes(self._file.readBytes(length))
+            self.bytes_read += len(data)
+            return data
+        first = offset // self.BLOCK_SIZE
+        last = (offset + length - 1) // self.BLOCK_SIZE
+        chunks = [self._block(i) for i in range(first, last + 1)]
+        start = offset - first * self.BLOCK_SIZE
+        return b"".join(chunks)[start:start + length]
+
+    def close(self):
+        try:
+            self._file.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ---------------------------------------------------------------------------
+# EBML primitives
+# ---------------------------------------------------------------------------
+
+def read_vint(data, pos, keep_marker=False):
+    """Decode an EBML variable-length integer. Returns (value, length) or (None, 0).
+
+    Element IDs keep their marker bit (keep_marker=True); sizes strip it. An
+    all-ones size means "unknown" and is returned as -1.
+    """
+    if pos >= len(data):
+        return None, 0
+    first = data[pos]
+    mask = 0x80
+    length = 1
+    while length <= 8 and not (first & mask):
+        mask >>= 1
+        length += 1
+    if length > 8 or pos + length > len(data):
+        return None, 0
+    value = first if keep_marker else first & (mask - 1)
+    for b in data[pos + 1:pos + length]:
+        value = (value << 8) | b
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return -1, length
+    return value, length
+
+def read_uint(data):
+    """Decode a big-endian unsigned integer element body"""
+    value = 0
+    for b in data:
+        value = (value << 8) | b
+    return value
+
+def read_float(data):
+    """Decode an EBML float element body (4 or 8 bytes)"""
+    if len(data) == 4:
+        return struct.unpack(">f", data)[0]
+    if len(data) == 8:
+        return struct.unpack(">d", data)[0]
+    return 0.0
+
+def iter_elements(data, start=0, end=None):
+    """Yield (element_id, body_start, body_size) for the children in data[start:end]"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos < end:
+        element_id, id_len = read_vint(data, pos, keep_marker=True)
+        if element_id is None:
+            return
+        size, size_len = read_vint(data, pos + id_len)
+        if size is None:
+            return
+        body = pos + id_len + size_len
+        if size < 0:
+            size = end - body
+        yield element_id, body, size
+        pos = body + size
+
+def read_element_header(reader, offset):
+    """Read an element header at an absolute file offset. Returns (id, body_offset, size) or None."""
+    head = reader.read(offset, 12)
+    element_id, id_len = read_vint(head, 0, keep_marker=True)
+    if element_id is None:
+        return None
+    size, size_len = read_vint(head, id_len)
+    if size is None:
+        return None
+    return element_id, offset + id_len + size_len, size
+
+def read_element_body(reader, offset, expected_id, max_size=MAX_ELEMENT_READ):
+    """Read a whole element body at offset if its ID matches. Returns bytes or None."""
+    header = read_element_header(reader, offset)
+    if not header or header[0] != expected_id:
+        return None
+    _, body_offset, size = header
+    if size < 0 or size > max_size:
+        log(f"⚠️ Element 0x{expected_id:X} too large to read ({size} bytes)")
+        return None
+    return reader.read(body_offset, size)
+
+# ---------------------------------------------------------------------------
+# Matroska structure
+# ---------------------------------------------------------------------------
+
+class MatroskaLayout:
+    """Locations of the top-level Matroska elements, resolved via the SeekHead"""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.segment_start = None
+        self.positions = {}  # element id -> absolute offset
+        self._resolve()
+
+    def _resolve(self):
+        header = read_element_header(self.reader, 0)
+        if not header or header[0] != EBML_HEADER:
+            raise ValueError("not an EBML file")
+        segment = read_element_header(self.reader, header[1] + header[2])
+        if not segment or segment[0] != MKV_SEGMENT:
+            raise ValueError("no Matroska Segment element")
+        self.segment_start = segment[1]
+
+        # Walk top-level headers until the first Cluster; SeekHead is almost always first
+        offset = self.segment_start
+        for _ in range(MAX_TOP_LEVEL_SCAN):
+            child = read_element_header(self.reader, offset)
+            if not child or child[2] < 0:
+                break
+            element_id, body_offset, size = child
+            if element_id == MKV_CLUSTER:
+                break
+            self.positions.setdefault(element_id, offset)
+            if element_id == MKV_SEEK_HEAD:
+                self._read_seek_head(offset)
+            offset = body_offset + size
+
+    def _read_seek_head(self, offset, depth=0):
+        body = read_element_body(self.reader, offset, MKV_SEEK_HEAD)
+        if not body:
+            return
+        for element_id, start, size in iter_elements(body):
+            if element_id != MKV_SEEK:
+                continue
+            target_id = None
+            target_pos = None
+            for child_id, child_start, child_size in iter_elements(body, start, start + size):
+                if child_id == MKV_SEEK_ID:
+                    target_id = read_uint(body[child_start:child_start + child_size])
+                elif child_id == MKV_SEEK_POSITION:
+                    target_pos = read_uint(body[child_start:child_start + child_size])
+            if target_id is None or target_pos is None:
+                continue
+            absolute = self.segment_start + target_pos
+            if target_id == MKV_SEEK_HEAD:
+                # A second SeekHead (usually at the end of the file) - follow it once
+                if depth == 0 and absolute != offset:
+                    self._read_seek_head(absolute, depth + 1)
+                continue
+            self.positions.setdefault(target_id, absolute)
+
+    def read_body(self, element_id, max_size=MAX_ELEMENT_READ):
+        """Read the body of a top-level element, or None if it isn't present"""
+        offset = self.positions.get(element_id)
+        if offset is None:
+            return None
+        return read_element_body(self.reader, offset, element_id, max_size)
+
+def read_mkv_info(layout):
+    """Return (timestamp_scale_ns, duration_ms or None) from the Segment Info element"""
+    body = layout.read_body(MKV_INFO)
+    scale = 1000000
+    duration = None
+    if body:
+        for element_id, start, size in iter_elements(body):
+            if element_id == MKV_TIMESTAMP_SCALE:
+                scale = read_uint(body[start:start + size]) or scale
+            elif element_id == MKV_DURATION:
+                duration = read_float(body[start:start + size])
+    duration_ms = int(round(duration * scale / 1000000)) if duration else None
+    return scale, duration_ms
+
+def _parse_chapter_atom(body, start, end):
+    """Return (start_ns, end_ns or None, label, enabled) for one ChapterAtom"""
+    start_ns = None
+    end_ns = None
+    label = ""
+    enabled = True
+    for element_id, child_start, size in iter_elements(body, start, end):
+        value = body[child_start:child_start + size]
+        if element_id == MKV_CHAPTER_TIME_START:
+            start_ns = read_uint(value)
+        elif element_id == MKV_CHAPTER_TIME_END:
+            end_ns = read_uint(value)
+        elif element_id == MKV_CHAPTER_FLAG_ENABLED:
+            enabled = read_uint(value) != 0
+        elif element_id == MKV_CHAPTER_DISPLAY and not label:
+            for display_id, display_start, display_size in iter_elements(body, child_start, child_start + size):
+                if display_id == MKV_CHAP_STRING:
+                    label = body[display_start:display_start + display_size].decode("utf-8", errors="replace").strip()
+                    break
+    return start_ns, end_ns, label, enabled
+
+def parse_mkv_chapters_body(body):
+    """Parse a Chapters element body into editions: list of (is_default, [(start_ns, end_ns, label)])"""
+    editions = []
+    for element_id, start, size in iter_elements(body):
+        if element_id != MKV_EDITION_ENTRY:
+            continue
+        is_default = False
+        atoms = []
+        for child_id, child_start, child_size in iter_elements(body, start, start + size):
+            if child_id == MKV_EDITION_FLAG_DEFAULT:
+                is_default = read_uint(body[child_start:child_start + child_size]) != 0
+            elif child_id == MKV_CHAPTER_ATOM:
+                start_ns, end_ns, label, enabled = _parse_chapter_atom(body, child_start, child_start + child_size)
+                if start_ns is not None and enabled:
+                    atoms.append((start_ns, end_ns, label))
+        editions.append((is_default, atoms))
+    return editions
+
+def _ns_to_ms(ns):
+    return (ns + 500000) // 1000000
+
+def read_mkv_chapters(video_path):
+    """Read embedded Matroska chapters as SegmentItem objects (source="mkv").
+
+    Uses the SeekHead to jump straight to the Chapters element, so only a few
+    KB are read regardless of file size. Chapters without an explicit end run
+    to the next chapter (or to the end of the video for the last one).
+    Returns a list (empty if the file has no chapters or can't be parsed).
+    """
+    if not video_path.lower().endswith(MKV_EXTENSIONS):
+        return []
+    try:
+        with RangeReader(video_path) as reader:
+            layout = MatroskaLayout(reader)
+            body = layout.read_body(MKV_CHAPTERS)
+            if not body:
+                log(f"🚫 No embedded chapters in {video_path}")
+                return []
+            editions = parse_mkv_chapters_body(body)
+            if not editions:
+                return []
+            # Use the default edition, falling back to the first one
+            atoms = next((atoms for is_default, atoms in editions if is_default), editions[0][1])
+            atoms = sorted(atoms, key=lambda atom: atom[0])
+
+            duration_ms = None
+            if any(end_ns is None for _, end_ns, _ in atoms):
+                _, duration_ms = read_mkv_info(layout)
+
+            segments = []
+            for i, (start_ns, end_ns, label) in enumerate(atoms):
+                start_ms = _ns_to_ms(start_ns)
+                if end_ns is not None:
+                    end_ms = _ns_to_ms(end_ns)
+                elif i + 1 < len(atoms):
+                    end_ms = _ns_to_ms(atoms[i + 1][0])
+                else:
+                    end_ms = duration_ms
+                if end_ms is None or end_ms < start_ms:
+                    continue
+                segments.append(SegmentItem.from_ms(start_ms, end_ms, label or f"Chapter {i + 1}", source="mkv"))
+
+            log(f"✅ Read {len(segments)} embedded chapters from {video_path} ({reader.bytes_read} bytes read)")
+            return segments
+    except Exception as e:
+        log(f"⚠️ Could not read embedded chapters from {video_path}: {e}")
+        return []
+
+# ---------------------------------------------------------------------------
+# MP4 / ISO-BMFF
+# ---------------------------------------------------------------------------
+
+def iter_mp4_boxes(reader, start, end):
+    """Yield (box_type, body_offset, body_size) for boxes between start and end.
+
+    Only box headers are read, so walking past a multi-GB mdat costs one
+    small read.
+    """
+    offset = start
+    for _ in range(MAX_BOX_SCAN):
+        if offset + 8 > end:
+            return
+        head = reader.read(offset, 16)
+        if len(head) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", head[:8])
+        header_size = 8
+        if size == 1:
+            if len(head) < 16:
+                return
+            size = struct.unpack(">Q", head[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield box_type, offset + header_size, size - header_size
+        offset += size
+
+def find_mp4_box(reader, path, start=0, end=None):
+    """Follow a box path like (b"moov", b"mvhd") and return (body_offset, body_size) or None"""
+    end = reader.size if end is None else end
+    for i, wanted in enumerate(path):
+        for box_type, body_offset, body_size in iter_mp4_boxes(reader, start, end):
+            if box_type == wanted:
+                if i == len(path) - 1:
+                    return body_offset, body_size
+                start, end = body_offset, body_offset + body_size
+                break
+        else:
+            return None
+    return None
+
+def parse_mvhd_duration(body):
+    """Return duration in ms from an mvhd/mdhd box body (version 0 or 1)"""
+    version = body[0]
+    if version == 1:
+        timescale, duration = struct.unpack(">IQ", body[20:32])
+    else:
+        timescale, duration = struct.unpack(">II", body[12:20])
+    if not timescale:
+        return None
+    return duration * 1000 // timescale
+
+def read_mp4_duration(reader):
+    """Read the movie duration from moov/mvhd. Returns ms or None."""
+    found = find_mp4_box(reader, (b"moov", b"mvhd"))
+    if not found:
+        return None
+    body_offset, body_size = found
+    return parse_mvhd_duration(reader.read(body_offset, min(body_size, 32)))
+
+# ---------------------------------------------------------------------------
+# Duration probe
+# ---------------------------------------------------------------------------
+
+def container_type(reader):
+    """Sniff the container from the first bytes: "mkv", "mp4" or None"""
+    head = reader.read(0, 12)
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "mkv"
+    if head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+        return "mp4"
+    return None
+
+def probe_duration_ms(video_path):
+    """Read the duration from the container header without opening the player.
+
+    Supports Matroska (Segment Info/Duration) and MP4/MOV (mvhd). Returns
+    milliseconds or None when the container isn't supported.
+    """
+    try:
+        with RangeReader(video_path) as reader:
+            kind = container_type(reader)
+            if kind == "mkv":
+                _, duration_ms = read_mkv_info(MatroskaLayout(reader))
+            elif kind == "mp4":
+                duration_ms = read_mp4_duration(reader)
+            else:
+                return None
+            log(f"⏱️ Probed duration of {video_path}: {duration_ms} ms ({reader.bytes_read} bytes read)")
+            return duration_ms
+    except Exception as e:
+        log(f"⚠️ Could not probe duration of {video_path}: {e}")
+        return None
+
+def get_video_duration_ms(video_path):
+    """Return the video duration in ms, cached in the segment index by size/mtime"""
+    stat = stat_file(video_path)
+    index = get_index()
+    if stat and index:
+        row = index.get_fresh_video(video_path, *stat)
+        if row and row["duration_ms"] is not None:
+            return row["duration_ms"]
+
+    duration_ms = probe_duration_ms(video_path)
+    if stat and index and duration_ms is not None:
+        index.update_video(video_path, *stat, duration_ms=duration_ms)
+    return duration_ms
+
+# ---------------------------------------------------------------------------
+# Keyframe index
+# ---------------------------------------------------------------------------
+
+class KeyframeIndex:
+    """Sorted keyframe times (ms) of one video; snapping is a bisect, not a file read"""
+
+    def __init__(self, times_ms):
+        self.times_ms = sorted(set(times_ms))
+
+    def __len__(self):
+        return len(self.times_ms)
+
+    def nearest(self, ms, max_distance_ms=None):
+        """Return the keyframe time closest to ms, or ms itself if none is within max_distance_ms"""
+        times = self.times_ms
+        if not times:
+            return ms
+        i = bisect.bisect_left(times, ms)
+        candidates = times[max(0, i - 1):i + 1]
+        best = min(candidates, key=lambda t: abs(t - ms))
+        if max_distance_ms is not None and abs(best - ms) > max_distance_ms:
+            return ms
+        return best
+
+def _mkv_video_tracks(layout):
+    """Return the set of video track numbers from the Tracks element"""
+    body = layout.read_body(MKV_TRACKS)
+    tracks = set()
+    if not body:
+        return tracks
+    for element_id, start, size in iter_elements(body):
+        if element_id != MKV_TRACK_ENTRY:
+            continue
+        number = track_type = None
+        for child_id, child_start, child_size in iter_elements(body, start, start + size):
+            if child_id == MKV_TRACK_NUMBER:
+                number = read_uint(body[child_start:child_start + child_size])
+            elif child_id == MKV_TRACK_TYPE:
+                track_type = read_uint(body[child_start:child_start + child_size])
+        if number is not None and track_type == MKV_TRACK_TYPE_VIDEO:
+            tracks.add(number)
+    return tracks
+
+def read_mkv_keyframes(reader):
+    """Read keyframe times (ms) for the video track from the Matroska Cues element"""
+    layout = MatroskaLayout(reader)
+    body = layout.read_body(MKV_CUES, MAX_INDEX_READ)
+    if not body:
+        return []
+    scale, _ = read_mkv_info(layout)
+    video_tracks = _mkv_video_tracks(layout)
+
+    times = []
+    for element_id, start, size in iter_elements(body):
+        if element_id != MKV_CUE_POINT:
+            continue
+        cue_time = None
+        cue_tracks = set()
+        for child_id, child_start, child_size in iter_elements(body, start, start + size):
+            if child_id == MKV_CUE_TIME:
+                cue_time = read_uint(body[child_start:child_start + child_size])
+            elif child_id == MKV_CUE_TRACK_POSITIONS:
+                for pos_id, pos_start, pos_size in iter_elements(body, child_start, child_start + child_size):
+                    if pos_id == MKV_CUE_TRACK:
+                        cue_tracks.add(read_uint(body[pos_start:pos_start + pos_size]))
+        # Cue points for audio/subtitle tracks are not keyframes of the picture
+        if cue_time is not None and (not video_tracks or cue_tracks & video_tracks or not cue_tracks):
+            times.append(cue_time * scale // 1000000)
+    return times
+
+def _read_box(reader, found, max_size=MAX_INDEX_READ):
+    if not found or found[1] > max_size:
+        return None
+    return reader.read(found[0], found[1])
+
+def read_mp4_keyframes(reader):
+    """Read keyframe times (ms) of the first video track from stss + stts.
+
+    Sync sample numbers come from stss and are converted to decode times
+    with stts and the mdhd timescale. Without an stss every sample is a
+    sync sample, so there is nothing to snap to and an empty list is returned.
+    """
+    moov = find_mp4_box(reader, (b"moov",))
+    if not moov:
+        return []
+    moov_end = moov[0] + moov[1]
+    for box_type, trak_offset, trak_size in iter_mp4_boxes(reader, moov[0], moov_end):
+        if box_type != b"trak":
+            continue
+        trak_end = trak_offset + trak_size
+        mdia = find_mp4_box(reader, (b"mdia",), trak_offset, trak_end)
+        if not mdia:
+            continue
+        mdia_end = mdia[0] + mdia[1]
+        hdlr = _read_box(reader, find_mp4_box(reader, (b"hdlr",), mdia[0], mdia_end), 256)
+        if not hdlr or hdlr[8:12] != b"vide":
+            continue
+
+        mdhd = _read_box(reader, find_mp4_box(reader, (b"mdhd",), mdia[0], mdia_end), 64)
+        stbl = find_mp4_box(reader, (b"minf", b"stbl"), mdia[0], mdia_end)
+        if not mdhd or not stbl:
+            return []
+        timescale = struct.unpack(">I", mdhd[20:24] if mdhd[0] == 1 else mdhd[12:16])[0]
+        stbl_end = stbl[0] + stbl[1]
+        stss = _read_box(reader, find_mp4_box(reader, (b"stss",), stbl[0], stbl_end))
+        stts = _read_box(reader, find_mp4_box(reader, (b"stts",), stbl[0], stbl_end))
+        if not stss or not stts or not timescale:
+            return []
+
+        sync_count = struct.unpack(">I", stss[4:8])[0]
+        sync_samples = struct.unpack(f">{sync_count}I", stss[8:8 + 4 * sync_count])
+        run_count = struct.unpack(">I", stts[4:8])[0]
+        runs = struct.unpack(f">{2 * run_count}I", stts[8:8 + 8 * run_count])
+
+        # Sweep sync samples (ascending) through the time-to-sample runs
+        times = []
+        run = 0
+        run_first_sample = 1
+        run_start_time = 0
+        for sample in sync_samples:
+            while run < run_count and sample >= run_first_sample + runs[2 * run]:
+                run_first_sample += runs[2 * run]
+                run_start_time += runs[2 * run] * runs[2 * run + 1]
+                run += 1
+            if run >= run_count:
+                break
+            decode_time = run_start_time + (sample - run_first_sample) * runs[2 * run + 1]
+            times.append(decode_time * 1000 // timescale)
+        return times
+    return []
+
+_keyframe_cache = OrderedDict()
+_keyframe_lock = threading.Lock()
+KEYFRAME_CACHE_SIZE = 8
+
+def load_keyframe_index(video_path):
+    """Build (or fetch from memory) the KeyframeIndex for a video. Returns None if unavailable."""
+    with _keyframe_lock:
+        if video_path in _keyframe_cache:
+            _keyframe_cache.move_to_end(video_path)
+            return _keyframe_cache[video_path]
+
+    index = None
+    try:
+        with RangeReader(video_path) as reader:
+            kind = container_type(reader)
+            if kind == "mkv":
+                times = read_mkv_keyframes(reader)
+            elif kind == "mp4":
+                times = read_mp4_keyframes(reader)
+            else:
+                times = []
+            if times:
+                index = KeyframeIndex(times)
+            log(f"🔑 Keyframe index for {video_path}: {len(times)} keyframes ({reader.bytes_read} bytes read)")
+    except Exception as e:
+        log(f"⚠️ Could not read keyframe index of {video_path}: {e}")
+
+    with _keyframe_lock:
+        _keyframe_cache[video_path] = index
+        if len(_keyframe_cache) > KEYFRAME_CACHE_SIZE:
+            _keyframe_cache.popitem(last=False)
+    return index
@@ -0,0 +1,173 @@
+"""
+Season-level inference of recurring segments (intros, recaps, credits).
+
+Episodes of a season usually share intro and credits timing. Segments that
+already exist in some episodes' sidecars are clustered per label, either by
+start time (intros, recaps) or by distance from the end of the video
+(credits), and the dominant cluster is proposed for the episodes that lack
+that label, together with a confidence score.
+"""
+from statistics import median
+
+from segment_parser import SegmentItem, get_action_mapping
+from library import (
+    list_directory, group_sidecars, walk_directories, parallel_map, read_video_segments,
+    sibling_dir, DEFAULT_WORKERS
+)
+from sidecar_formats import all_suffixes
+from media_probe import get_video_duration_ms
+from utils import log, log_always
+
+# Starts closer than this to their neighbour belong to the same cluster
+CLUSTER_TOLERANCE_MS = 5000
+# A label needs this many agreeing episodes before anything is proposed
+MIN_SUPPORT = 2
+MIN_CONFIDENCE = 0.3
+
+def load_episode(video_path, sidecars, action_mapping=None):
+    """Read one episode's segments and duration (both served from the index when warm)"""
+    segments = read_video_segments(sidecars, action_mapping) if sidecars else []
+    duration_ms = get_video_duration_ms(video_path) if segments else None
+    return {"video": video_path, "segments": segments, "duration_ms": duration_ms}
+
+def collect_episodes(directories, max_workers=DEFAULT_WORKERS):
+    """Load every episode of the given {directory: files} listings in one parallel pass.
+
+    Returns {directory: [episode, ...]}.
+    """
+    jobs = [
+        (directory, video, sidecars)
+        for directory, files in directories.items()
+        for video, sidecars in group_sidecars(directory, files)
+    ]
+    action_mapping = get_action_mapping()
+    episodes = parallel_map(lambda job: load_episode(job[1], job[2], action_mapping), jobs, max_workers)
+    result = {directory: [] for directory in directories}
+    for (directory, _, _), episode in zip(jobs, episodes):
+        result[directory].append(episode)
+    return result
+
+def largest_cluster(values, tolerance_ms=CLUSTER_TOLERANCE_MS):
+    """Return the largest run of sorted values whose neighbours are within tolerance_ms"""
+    best, current = [], []
+    for value in sorted(values):
+        if current and value - current[-1] > tolerance_ms:
+            current = []
+        current.append(value)
+        if len(current) > len(best):
+            best = list(current)
+    return best
+
+def _spread(values):
+    """Median absolute deviation"""
+    center = median(values)
+    return median(abs(v - center) for v in values)
+
+def build_label_model(samples, tolerance_ms=CLUSTER_TOLERANCE_MS):
+    """Fit one label's timing from (start_ms, duration_ms, video_duration_ms) samples.
+
+    Tries anchoring on the start of the video and on the end of the video and
+    keeps whichever gives the larger, tighter cluster. Returns None when no
+    cluster reaches MIN_SUPPORT.
+    """
+    anchors = {"start": [(start, length) for start, length, _ in samples]}
+    with_duration = [(total - start, length) for start, length, total in samples if total]
+    if with_duration:
+        anchors["end"] = with_duration
+
+    best = None
+    for anchor, points in anchors.items():
+        cluster = largest_cluster([offset for offset, _ in points], tolerance_ms)
+        if len(cluster) < MIN_SUPPORT:
+            continue
+        lo, hi = cluster[0], cluster[-1]
+        members = [(offset, length) for offset, length in points if lo <= offset <= hi]
+        spread = _spread([offset for offset, _ in members])
+        agreement = len(members) / len(samples)
+        support = len(members) / (len(members) + 1)
+        tightness = max(0.0, 1 - spread / tolerance_ms)
+        model = {
+            "anchor": anchor,
+            "offset_ms": int(median(offset for offset, _ in members)),
+            "length_ms": int(median(length for _, length in members)),
+            "support": len(members),
+            "confidence": round(agreement * support * tightness, 2),
+        }
+        if best is None or (model["support"], model["confidence"]) > (best["support"], best["confidence"]):
+            best = model
+    return best
+
+def analyze_season(episodes, labels=None, tolerance_ms=CLUSTER_TOLERANCE_MS):
+    """Propose segments for episodes missing a label the rest of the season has.
+
+    Returns {video_path: [(SegmentItem, confidence), ...]} for episodes that
+    get at least one suggestion.
+    """
+    samples = {}
+    display = {}
+    action_types = {}
+    for episode in episodes:
+        seen = set()
+        for seg in episode["segments"]:
+            label = seg.segment_type_label
+            if label in seen or (labels is not None and label not in labels):
+                continue
+            seen.add(label)
+            samples.setdefault(label, []).append((seg.start_ms, seg.end_ms - seg.start_ms, episode["duration_ms"]))
+            display.setdefault(label, seg.raw_label)
+            action_types.setdefault(label, seg.action_type)
+
+    suggestions = {}
+    for label, label_samples in samples.items():
+        model = build_label_model(label_samples, tolerance_ms)
+        if not model or model["confidence"] < MIN_CONFIDENCE:
+            continue
+        for episode in episodes:
+            if any(seg.segment_type_label == label for seg in episode["segments"]):
+                continue
+            duration_ms = episode["duration_ms"]
+            if model["anchor"] == "end":
+                if not duration_ms:
+                    # Unprobed episodes with no sidecars at all: the only place to get an end anchor
+                    duration_ms = get_video_duration_ms(episode["video"])
+                    if not duration_ms:
+                        continue
+                start_ms = duration_ms - model["offset_ms"]
+            else:
+                start_ms = model["offset_ms"]
+            end_ms = start_ms + model["length_ms"]
+            if duration_ms:
+                end_ms = min(end_ms, duration_ms)
+            if start_ms < 0 or end_ms <= start_ms:
+                continue
+            seg = SegmentItem.from_ms(start_ms, end_ms, display[label], "season", action_types[label])
+            suggestions.setdefault(episode["video"], []).append((seg, model["confidence"]))
+
+    for items in suggestions.values():
+        items.sort(key=lambda item: item[0].start_ms)
+    return suggestions
+
+def suggest_for_video(video_path, labels=None, max_workers=DEFAULT_WORKERS):
+    """Return [(SegmentItem, confidence), ...] inferred from the video's season directory"""
+    try:
+        directory = sibling_dir(video_path)
+        _, files = list_directory(directory)
+        episodes = collect_episodes({directory: files}, max_workers)[directory]
+        return analyze_season(episodes, labels).get(video_path, [])
+    except Exception as e:
+        log(f"❌ Season analysis failed for {video_path}: {e}")
+        return []
+
+def analyze_show(root, labels=None, max_workers=DEFAULT_WORKERS):
+    """Analyze every season directory under root. Returns {video_path: suggestions}."""
+    suffixes = all_suffixes()
+    directories = {
+        directory: files for directory, _, files in walk_directories(root)
+        if any(name.lower().endswith(suffixes) for name in files)
+    }
+    episodes = collect_episodes(directories, max_workers)
+    suggestions = {}
+    for season in episodes.values():
+        suggestions.update(analyze_season(season, labels))
+    log_always(f"📊 Season analysis of {root}: {len(directories)} directories, {len(suggestions)} episodes with suggestions")
+    return suggestions
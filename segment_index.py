@@ -0,0 +1,213 @@
+"""
+Persistent metadata index (SQLite in the addon profile directory).
+Caches facts that are expensive to get over the network - container duration,
+content fingerprints, sidecar snapshots, parsed sidecars, validation results
+and directory scan state - invalidated by the size/mtime of the file they
+describe.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from utils import log, get_profile_path
+
+INDEX_FILENAME = "segment_index.db"
+
+class SegmentIndex:
+    """Thread-safe wrapper around the index database"""
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS videos (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime INTEGER,
+            duration_ms INTEGER
+        )""",
+        """CREATE TABLE IF NOT EXISTS fingerprint_sidecars (
+            fingerprint TEXT NOT NULL,
+            suffix TEXT NOT NULL,
+            content TEXT NOT NULL,
+            video_path TEXT,
+            updated INTEGER,
+            PRIMARY KEY (fingerprint, suffix)
+        )""",
+        """CREATE TABLE IF NOT EXISTS sidecars (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime INTEGER,
+            segments_json TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS validation (
+            sidecar_path TEXT PRIMARY KEY,
+            sidecar_size INTEGER,
+            sidecar_mtime INTEGER,
+            video_size INTEGER,
+            video_mtime INTEGER,
+            issues_json TEXT NOT NULL,
+            checked INTEGER
+        )""",
+        """CREATE TABLE IF NOT EXISTS directories (
+            path TEXT PRIMARY KEY,
+            mtime INTEGER,
+            subdirs_json TEXT NOT NULL,
+            scanned INTEGER
+        )""",
+    ]
+
+    # Columns added after a table was first shipped: (table, column, type)
+    COLUMNS = [
+        ("videos", "fingerprint", "TEXT"),
+    ]
+
+    INDEXES = [
+        "CREATE INDEX IF NOT EXISTS videos_fingerprint ON videos (fingerprint)",
+    ]
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        try:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.DatabaseError as e:
+            log(f"⚠️ Could not enable WAL for segment index: {e}")
+        with self._lock, self._conn:
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+            for table, column, column_type in self.COLUMNS:
+                existing = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            for statement in self.INDEXES:
+                self._conn.execute(statement)
+
+    def get_video(self, path):
+        """Return the index row for a video as a dict, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM videos WHERE path = ?", (path,)).fetchone()
+        return dict(row) if row else None
+
+    def get_fresh_video(self, path, size, mtime):
+        """Return the index row only if it was recorded for the same size/mtime"""
+        row = self.get_video(path)
+        if row and row["size"] == size and row["mtime"] == mtime:
+            return row
+        return None
+
+    def update_video(self, path, size, mtime, **fields):
+        """Insert or update a video row; stale cached fields are cleared when size/mtime change"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT size, mtime FROM videos WHERE path = ?", (path,)).fetchone()
+            if row is None or row["size"] != size or row["mtime"] != mtime:
+                self._conn.execute("DELETE FROM videos WHERE path = ?", (path,))
+                self._conn.execute(
+                    "INSERT INTO videos (path, size, mtime) VALUES (?, ?, ?)", (path, size, mtime)
+                )
+            if fields:
+                columns = ", ".join(f"{name} = ?" for name in fields)
+                self._conn.execute(
+                    f"UPDATE videos SET {columns} WHERE path = ?", (*fields.values(), path)
+                )
+
+    def get_fingerprint_sidecars(self, fingerprint):
+        """Return {suffix: content} and the video path the sidecars were last seen with"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT suffix, content, video_path FROM fingerprint_sidecars WHERE fingerprint = ?",
+                (fingerprint,)
+            ).fetchall()
+        sidecars = {row["suffix"]: row["content"] for row in rows}
+        video_path = rows[0]["video_path"] if rows else None
+        return sidecars, video_path
+
+    def set_fingerprint_sidecars(self, fingerprint, video_path, sidecars):
+        """Replace the stored sidecar snapshot for a fingerprint"""
+        now = int(time.time())
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM fingerprint_sidecars WHERE fingerprint = ?", (fingerprint,))
+            self._conn.executemany(
+                "INSERT INTO fingerprint_sidecars (fingerprint, suffix, content, video_path, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(fingerprint, suffix, content, video_path, now) for suffix, content in sidecars.items()]
+            )
+
+    def get_sidecar_segments(self, path, size, mtime):
+        """Return the cached parsed segments JSON for a sidecar if size/mtime still match"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT segments_json FROM sidecars WHERE path = ? AND size = ? AND mtime = ?",
+                (path, size, mtime)
+            ).fetchone()
+        return row["segments_json"] if row else None
+
+    def set_sidecar_segments(self, path, size, mtime, segments_json):
+        """Cache the parsed segments of a sidecar"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sidecars (path, size, mtime, segments_json) VALUES (?, ?, ?, ?)",
+                (path, size, mtime, segments_json)
+            )
+
+    def get_validation(self, sidecar_path, sidecar_stat, video_stat):
+        """Return the stored issues JSON if neither the sidecar nor its video changed since the check"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT issues_json FROM validation WHERE sidecar_path = ? AND sidecar_size = ? "
+                "AND sidecar_mtime = ? AND video_size IS ? AND video_mtime IS ?",
+                (sidecar_path, *sidecar_stat, *(video_stat or (None, None)))
+            ).fetchone()
+        return row["issues_json"] if row else None
+
+    def set_validations(self, rows):
+        """Store validation results: (sidecar_path, sidecar_stat, video_stat, issues_json) tuples"""
+        now = int(time.time())
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO validation (sidecar_path, sidecar_size, sidecar_mtime, "
+                "video_size, video_mtime, issues_json, checked) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(path, *sidecar_stat, *(video_stat or (None, None)), issues_json, now)
+                 for path, sidecar_stat, video_stat, issues_json in rows]
+            )
+
+    def get_directory(self, path):
+        """Return (mtime, subdirectory names) recorded by the last scan of a directory, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT mtime, subdirs_json FROM directories WHERE path = ?", (path,)).fetchone()
+        return (row["mtime"], json.loads(row["subdirs_json"])) if row else None
+
+    def set_directory(self, path, mtime, subdirs):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO directories (path, mtime, subdirs_json, scanned) VALUES (?, ?, ?, ?)",
+                (path, mtime, json.dumps(subdirs), int(time.time()))
+            )
+
+    def delete_directory(self, path, child_prefix):
+        """Forget a directory and every directory whose path starts with child_prefix"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM directories WHERE path = ? OR substr(path, 1, ?) = ?",
+                (path, len(child_prefix), child_prefix)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """Return the shared SegmentIndex, opening it on first use (None if unavailable)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = SegmentIndex(get_profile_path(INDEX_FILENAME))
+            except Exception as e:
+                log(f"❌ Could not open segment index: {e}")
+                return None
+        return _index
@@ -1,9 +1,12 @@
 import os
+import re
 import time
 import xml.etree.ElementTree as ET
 import xbmcvfs
 import xbmcaddon
 import unicodedata
+from fractions import Fraction
+from functools import lru_cache
 
 from utils import get_addon, log
 
@@ -196,24 +199,69 @@ def normalize_label(text):
     """Normalize and lowercase labels for consistent matching"""
     return unicodedata.normalize("NFKC", text or "").strip().lower()
 
+def hms_to_ms(hms):
+    """Convert HH:MM:SS.mmm, MM:SS.mmm or plain seconds to integer milliseconds.
+    
+    Parses the fractional part as digits instead of going through float, so
+    values round-trip exactly. Sub-millisecond digits (chapter XML allows
+    nanoseconds) are rounded to the nearest millisecond.
+    """
+    text = hms.strip()
+    if not text:
+        raise ValueError("empty time value")
+    negative = text.startswith("-")
+    if negative:
+        text = text[1:]
+    
+    whole, _, frac = text.partition(".")
+    ms = 0
+    try:
+        for part in whole.split(":"):
+            ms = ms * 60 + int(part or 0)
+    except ValueError:
+        if ":" in whole:
+            raise
+        return int(round(float(hms) * 1000))
+    ms *= 1000
+    
+    if frac:
+        if not frac.isdigit():
+            # Exponents and other exotic float spellings - let float() deal with it
+            return int(round(float(hms) * 1000))
+        if len(frac) > 3:
+            ms += int(frac[:3]) + (1 if frac[3] >= "5" else 0)
+        else:
+            ms += int(frac.ljust(3, "0"))
+    
+    return -ms if negative else ms
+
+@lru_cache(maxsize=4096)
+def ms_to_hms(ms):
+    """Convert integer milliseconds to HH:MM:SS.mmm format (cached)"""
+    if ms < 0:
+        ms = 0
+    s, frac = divmod(ms, 1000)
+    m, s = divmod(s, 60)
+    h, m = divmod(m, 60)
+    return "%02d:%02d:%02d.%03d" % (h, m, s, frac)
+
+def ms_to_decimal(ms):
+    """Convert integer milliseconds to a seconds string with 3 decimals (EDL style)"""
+    if ms < 0:
+        return "-%d.%03d" % divmod(-ms, 1000)
+    return "%d.%03d" % divmod(ms, 1000)
+
+def seconds_to_ms(seconds):
+    """Convert float seconds (e.g. from player.getTime()) to integer milliseconds"""
+    return int(round(seconds * 1000))
+
 def hms_to_seconds(hms):
     """Convert HH:MM:SS.mmm format to seconds"""
-    parts = hms.strip().split(":")
-    if len(parts) == 3:
-        h, m, s = parts
-        return int(h) * 3600 + int(m) * 60 + float(s)
-    elif len(parts) == 2:
-        m, s = parts
-        return int(m) * 60 + float(s)
-    else:
-        return float(parts[0])
+    return hms_to_ms(hms) / 1000.0
 
 def seconds_to_hms(seconds):
     """Convert seconds to HH:MM:SS.mmm format"""
-    h = int(seconds // 3600)
-    m = int((seconds % 3600) // 60)
-    s = seconds % 60
-    return f"{h:02d}:{m:02d}:{s:06.3f}"
+    return ms_to_hms(seconds_to_ms(seconds))
 
 def indent_xml(elem, level=0, indent="  "):
     """Manually indent XML element tree (Python 3.8 compatible)"""
@@ -232,27 +280,353 @@ def indent_xml(elem, level=0, indent="  "):
             elem.tail = i
 
 class SegmentItem:
+    """A single segment. Times are held as integer milliseconds (start_ms/end_ms);
+    start_seconds/end_seconds are float views kept for convenience."""
+    
+    __slots__ = ("start_ms", "end_ms", "source", "segment_type_label", "action_type", "raw_label", "atom")
+    
     def __init__(self, start_seconds, end_seconds, label="segment", source="edl", action_type=None):
-        if end_seconds < start_seconds:
-            raise ValueError(f"Segment end time ({end_seconds}) must be after start time ({start_seconds})")
+        self._init_ms(seconds_to_ms(start_seconds), seconds_to_ms(end_seconds), label, source, action_type)
+    
+    def _init_ms(self, start_ms, end_ms, label, source, action_type):
+        if end_ms < start_ms:
+            raise ValueError(f"Segment end time ({ms_to_hms(end_ms)}) must be after start time ({ms_to_hms(start_ms)})")
         
-        self.start_seconds = start_seconds
-        self.end_seconds = end_seconds
+        self.start_ms = start_ms
+        self.end_ms = end_ms
         self.source = source
         self.segment_type_label = normalize_label(label)
         self.action_type = action_type
         self.raw_label = label  # Keep original label for display
+        self.atom = None  # ChapterAtom element this was parsed from, so saving can patch it in place
+    
+    @classmethod
+    def from_ms(cls, start_ms, end_ms, label="segment", source="edl", action_type=None):
+        """Create a segment directly from integer millisecond times"""
+        seg = cls.__new__(cls)
+        seg._init_ms(start_ms, end_ms, label, source, action_type)
+        return seg
+    
+    @property
+    def start_seconds(self):
+        return self.start_ms / 1000.0
+    
+    @start_seconds.setter
+    def start_seconds(self, value):
+        self.start_ms = seconds_to_ms(value)
+    
+    @property
+    def end_seconds(self):
+        return self.end_ms / 1000.0
+    
+    @end_seconds.setter
+    def end_seconds(self, value):
+        self.end_ms = seconds_to_ms(value)
     
     def is_active(self, current_time):
-        """Check if current time falls within segment bounds"""
-        return self.start_seconds <= current_time <= self.end_seconds
+        """Check if current time (seconds) falls within segment bounds"""
+        current_ms = seconds_to_ms(current_time)
+        return self.start_ms <= current_ms <= self.end_ms
     
     def get_duration(self):
-        """Return duration of the segment"""
-        return self.end_seconds - self.start_seconds
+        """Return duration of the segment in seconds"""
+        return (self.end_ms - self.start_ms) / 1000.0
+    
+    def get_duration_ms(self):
+        """Return duration of the segment in milliseconds"""
+        return self.end_ms - self.start_ms
+    
+    def copy_with(self, start_ms=None, end_ms=None):
+        """Return a copy of this segment, optionally with new times (still tied to the same chapter atom)"""
+        seg = SegmentItem.from_ms(
+            self.start_ms if start_ms is None else start_ms,
+            self.end_ms if end_ms is None else end_ms,
+            self.raw_label, source=self.source, action_type=self.action_type
+        )
+        seg.atom = self.atom
+        return seg
     
     def __str__(self):
-        return f"{self.raw_label} [{self.start_seconds:.2f}-{self.end_seconds:.2f}]"
+        return f"{self.raw_label} [{ms_to_hms(self.start_ms)}-{ms_to_hms(self.end_ms)}]"
+
+# Common frame rates; NTSC rates are stored as exact rationals so retiming doesn't drift
+FRAME_RATES = {
+    "23.976": Fraction(24000, 1001),
+    "24": Fraction(24),
+    "25": Fraction(25),
+    "29.97": Fraction(30000, 1001),
+    "30": Fraction(30),
+    "50": Fraction(50),
+    "59.94": Fraction(60000, 1001),
+    "60": Fraction(60),
+}
+
+def parse_frame_rate(value):
+    """Parse a frame rate ("23.976", "24000/1001", 25, ...) into an exact Fraction"""
+    if isinstance(value, Fraction):
+        return value
+    text = str(value).strip()
+    if text in FRAME_RATES:
+        return FRAME_RATES[text]
+    if "/" in text:
+        num, den = text.split("/", 1)
+        return Fraction(int(num), int(den))
+    rate = Fraction(text)
+    # Snap decimal approximations of NTSC rates (23.98, 29.970, ...) to the exact rational
+    for exact in FRAME_RATES.values():
+        if abs(rate - exact) < Fraction(1, 100):
+            return exact
+    return rate
+
+def ms_to_frames(ms, fps):
+    """Convert milliseconds to the nearest frame number at the given frame rate"""
+    return int(round(Fraction(ms, 1000) * parse_frame_rate(fps)))
+
+def frames_to_ms(frames, fps):
+    """Convert a frame number to milliseconds at the given frame rate"""
+    return int(round(Fraction(frames * 1000) / parse_frame_rate(fps)))
+
+def snap_ms_to_frame(ms, fps):
+    """Round a millisecond time to the nearest frame boundary"""
+    return frames_to_ms(ms_to_frames(ms, fps), fps)
+
+def speed_ratio(source_fps, target_fps):
+    """Time scale factor for moving segments from a source-rate release to a target-rate one.
+    
+    A 23.976fps film sped up to 25fps (PAL speedup) runs shorter, so times are
+    multiplied by source/target: speed_ratio("23.976", "25") ~= 0.959.
+    """
+    return parse_frame_rate(source_fps) / parse_frame_rate(target_fps)
+
+def retime_segments(segments, ratio=1, offset_ms=0, fps=None):
+    """Apply a speed ratio and then an offset to a whole timeline.
+    
+    new_time = old_time * ratio + offset_ms, optionally snapped to frame
+    boundaries of fps. Returns new SegmentItem objects; segments pushed
+    entirely before zero are dropped, partially negative ones are clamped.
+    """
+    ratio = Fraction(ratio)
+    
+    def transform(ms):
+        value = int(round(ms * ratio)) + offset_ms
+        if fps:
+            value = snap_ms_to_frame(value, fps)
+        return value
+    
+    result = []
+    for seg in segments:
+        start = transform(seg.start_ms)
+        end = transform(seg.end_ms)
+        if end <= 0:
+            log(f"⚠️ Dropping segment retimed before start of video: {seg}")
+            continue
+        result.append(seg.copy_with(max(0, start), end))
+    return result
+
+def find_out_of_range(segments, duration_ms):
+    """Return indices of segments that extend beyond the end of the video"""
+    if not duration_ms:
+        return []
+    return [i for i, seg in enumerate(segments) if seg.end_ms > duration_ms]
+
+def find_nested_and_overlapping(segments):
+    """Return (nested_indices, overlapping_indices).
+    
+    A segment is nested when another segment fully contains it, and
+    overlapping when it partially overlaps a non-nested segment.
+    """
+    nested_indices = set()
+    for i, seg in enumerate(segments):
+        for j, other_seg in enumerate(segments):
+            if i != j:
+                # Check if seg is nested inside other_seg
+                if (other_seg.start_ms <= seg.start_ms and 
+                    seg.end_ms <= other_seg.end_ms):
+                    nested_indices.add(i)
+                    break
+    
+    overlapping_indices = set()
+    for i, seg in enumerate(segments):
+        if i in nested_indices:
+            continue  # Skip if already marked as nested
+        for j, other_seg in enumerate(segments):
+            if i != j and j not in nested_indices:
+                # Two segments overlap if: seg1.start < seg2.end AND seg2.start < seg1.end
+                if (seg.start_ms < other_seg.end_ms and 
+                    other_seg.start_ms < seg.end_ms):
+                    # Make sure neither is fully nested
+                    seg_nested_in_other = (other_seg.start_ms <= seg.start_ms and 
+                                           seg.end_ms <= other_seg.end_ms)
+                    other_nested_in_seg = (seg.start_ms <= other_seg.start_ms and 
+                                           other_seg.end_ms <= seg.end_ms)
+                    if not seg_nested_in_other and not other_nested_in_seg:
+                        overlapping_indices.add(i)
+                    break
+    return nested_indices, overlapping_indices
+
+# Kodi's built-in EDL actions: 0 cut, 1 mute, 2 scene marker, 3 commercial break
+EDL_ACTIONS = (0, 1, 2, 3)
+# Written for segments whose label has no mapped action
+DEFAULT_ACTION = 4
+
+SEVERITY_ERROR = "error"
+SEVERITY_WARNING = "warning"
+SEVERITY_ORDER = {SEVERITY_ERROR: 0, SEVERITY_WARNING: 1}
+
+def validate_segments(segments, duration_ms=None, action_mapping=None):
+    """Return (index, severity, message) tuples for problematic segments.
+    
+    Checks zero-length, nested and overlapping segments, segments beyond the
+    video duration (when known) and action types that are neither Kodi EDL
+    actions nor in the action mapping. Reversed times can't be represented
+    by SegmentItem; check raw sidecar text for those.
+    """
+    if action_mapping is None:
+        action_mapping = get_action_mapping()
+    issues = []
+    nested, overlapping = find_nested_and_overlapping(segments)
+    for i, seg in enumerate(segments):
+        span = f"{ms_to_hms(seg.start_ms)}-{ms_to_hms(seg.end_ms)}"
+        if seg.end_ms == seg.start_ms:
+            issues.append((i, SEVERITY_WARNING, f"zero-length segment at {ms_to_hms(seg.start_ms)}"))
+        if i in nested:
+            issues.append((i, SEVERITY_WARNING, f"segment {span} is nested inside another segment"))
+        if i in overlapping:
+            issues.append((i, SEVERITY_WARNING, f"segment {span} overlaps another segment"))
+        known = seg.action_type in EDL_ACTIONS or seg.action_type == DEFAULT_ACTION or seg.action_type in action_mapping
+        if seg.action_type is not None and not known:
+            issues.append((i, SEVERITY_WARNING, f"segment {span} has unknown action type {seg.action_type}"))
+    for i in find_out_of_range(segments, duration_ms):
+        seg = segments[i]
+        issues.append((i, SEVERITY_ERROR,
+                       f"segment {ms_to_hms(seg.start_ms)}-{ms_to_hms(seg.end_ms)} extends beyond the video duration ({ms_to_hms(duration_ms)})"))
+    issues.sort(key=lambda issue: (SEVERITY_ORDER[issue[1]], issue[0]))
+    return issues
+
+def get_normalize_rules():
+    """Return normalize_segments keyword arguments from settings"""
+    rules = {"merge_overlaps": True, "drop_duplicates": True, "merge_gap_ms": 0, "min_duration_ms": 0}
+    try:
+        addon = get_addon()
+        rules["merge_gap_ms"] = hms_to_ms(addon.getSetting("normalize_merge_gap") or "0")
+        rules["min_duration_ms"] = hms_to_ms(addon.getSetting("normalize_min_duration") or "0")
+    except (ValueError, RuntimeError) as e:
+        log(f"⚠️ Invalid normalization settings, using defaults: {e}")
+    return rules
+
+def segment_key(seg):
+    """Identity of a segment for comparisons: (start_ms, end_ms, label)"""
+    return (seg.start_ms, seg.end_ms, seg.segment_type_label)
+
+def normalize_segments(segments, merge_overlaps=True, merge_gap_ms=None, drop_duplicates=True, min_duration_ms=0):
+    """Clean up a segment list in one sorted sweep.
+    
+    Rules, each optional:
+      - merge_overlaps: merge overlapping or touching segments with the same label
+      - merge_gap_ms: also merge same-label segments separated by at most this gap
+      - drop_duplicates: drop segments identical to one already kept
+      - min_duration_ms: drop segments shorter than this after merging
+    
+    Segments with different labels are never merged. Input segments are not
+    modified. Returns (segments, stats) where stats counts merged, duplicate
+    and dropped segments.
+    """
+    stats = {"merged": 0, "duplicates": 0, "dropped": 0}
+    result = []
+    seen = set()
+    last_by_label = {}  # label -> index in result of the latest kept segment with that label
+    # Largest gap between same-label segments that still merges them (None = never merge)
+    reach = max(merge_gap_ms or 0, 0) if (merge_overlaps or merge_gap_ms) else None
+    
+    for seg in sorted(segments, key=lambda s: (s.start_ms, s.end_ms)):
+        key = segment_key(seg)
+        if drop_duplicates and key in seen:
+            stats["duplicates"] += 1
+            continue
+        seen.add(key)
+        
+        last = last_by_label.get(seg.segment_type_label)
+        if last is not None and reach is not None and seg.start_ms - result[last].end_ms <= reach:
+            if seg.end_ms > result[last].end_ms:
+                result[last] = result[last].copy_with(end_ms=seg.end_ms)
+            stats["merged"] += 1
+            continue
+        last_by_label[seg.segment_type_label] = len(result)
+        result.append(seg)
+    
+    if min_duration_ms:
+        kept = [seg for seg in result if seg.get_duration_ms() >= min_duration_ms]
+        stats["dropped"] = len(result) - len(kept)
+        result = kept
+    return result, stats
+
+def merge_segment_lists(base, ours, theirs):
+    """Three-way merge of segment lists that both derive from base.
+    
+    A segment is kept if both sides have it or if either side added it;
+    segments one side removed (or changed) from base are dropped. Returns
+    (merged, conflicts) where conflicts are (ours, theirs) pairs of
+    overlapping same-label segments that the two sides added independently -
+    both are kept in merged so the user can pick one.
+    """
+    base_keys = set(map(segment_key, base))
+    our_keys = set(map(segment_key, ours))
+    their_keys = set(map(segment_key, theirs))
+    merged = [seg for seg in ours if segment_key(seg) in their_keys or segment_key(seg) not in base_keys]
+    merged.extend(seg for seg in theirs if segment_key(seg) not in our_keys and segment_key(seg) not in base_keys)
+    merged.sort(key=lambda s: (s.start_ms, s.end_ms))
+    
+    our_added = [seg for seg in ours if segment_key(seg) not in base_keys and segment_key(seg) not in their_keys]
+    their_added = [seg for seg in theirs if segment_key(seg) not in base_keys and segment_key(seg) not in our_keys]
+    conflicts = [
+        (mine, other)
+        for mine in our_added
+        for other in their_added
+        if mine.segment_type_label == other.segment_type_label
+        and mine.start_ms < other.end_ms and other.start_ms < mine.end_ms
+    ]
+    return merged, conflicts
+
+def merge_sources(*segment_lists):
+    """Merge segments loaded from several sidecars into one timeline.
+    
+    Segments with identical ranges are kept once: the label of the first list
+    wins, the action type is taken from whichever side has one and the
+    sources are joined (e.g. "xml+edl"). Input segments are not modified.
+    """
+    merged = {}
+    for segments in segment_lists:
+        for seg in segments or []:
+            key = (seg.start_ms, seg.end_ms)
+            kept = merged.get(key)
+            if kept is None:
+                merged[key] = seg
+            elif seg.source not in kept.source.split("+"):
+                merged[key] = SegmentItem.from_ms(
+                    seg.start_ms, seg.end_ms, kept.raw_label,
+                    source=f"{kept.source}+{seg.source}",
+                    action_type=kept.action_type if kept.action_type is not None else seg.action_type
+                )
+                merged[key].atom = kept.atom or seg.atom
+    return sorted(merged.values(), key=lambda s: (s.start_ms, s.end_ms))
+
+def clamp_segments(segments, duration_ms):
+    """Clamp segments to the video duration.
+    
+    Ends past the duration are pulled back to it; segments starting at or
+    after the end are dropped. Returns (segments, clamped_count, dropped_count).
+    """
+    result = []
+    clamped = dropped = 0
+    for seg in segments:
+        if seg.start_ms >= duration_ms:
+            dropped += 1
+        elif seg.end_ms > duration_ms:
+            result.append(seg.copy_with(end_ms=duration_ms))
+            clamped += 1
+        else:
+            result.append(seg)
+    return result, clamped, dropped
 
 def safe_file_read(*paths):
     """Safely read a file, trying multiple paths"""
@@ -272,8 +646,298 @@ def safe_file_read(*paths):
                 log(f"❌ Failed to read {path}: {e}")
     return None
 
-def parse_chapters(video_path):
-    """Parse chapter.xml file and return list of SegmentItem objects"""
+def get_action_mapping():
+    """Return the action_type -> label mapping from settings (empty dict if unset)"""
+    mapping = {}
+    try:
+        addon = get_addon()
+        raw = addon.getSetting("action_mapping")
+        if raw:
+            pairs = [entry.strip() for entry in raw.split(",") if ":" in entry]
+            for pair in pairs:
+                try:
+                    act, lbl = pair.split(":", 1)
+                    mapping[int(act.strip())] = lbl.strip()
+                except:
+                    pass
+    except:
+        pass
+    return mapping
+
+def parse_chapter_atoms(edition, source="xml"):
+    """Return SegmentItem objects for the ChapterAtom elements under one edition element"""
+    result = []
+    for atom in edition.findall(".//ChapterAtom"):
+        raw_label = atom.findtext(".//ChapterDisplay/ChapterString", default="")
+        label = raw_label.strip() if raw_label else "segment"
+        start = atom.findtext("ChapterTimeStart")
+        end = atom.findtext("ChapterTimeEnd")
+        if start and end:
+            seg = SegmentItem.from_ms(
+                hms_to_ms(start),
+                hms_to_ms(end),
+                label,
+                source=source
+            )
+            seg.atom = atom
+            result.append(seg)
+            log(f"📘 Parsed XML segment: {start} → {end} | label='{label}'")
+    return result
+
+def chapter_label(seg, action_mapping):
+    """Chapter title for a segment: the mapped action label if any, otherwise its own label"""
+    if seg.action_type and seg.action_type in action_mapping:
+        return action_mapping[seg.action_type]
+    return seg.raw_label if hasattr(seg, 'raw_label') else seg.segment_type_label
+
+def build_chapter_atom(parent, seg, action_mapping):
+    """Append a ChapterAtom element for seg to parent and return it"""
+    atom = ET.SubElement(parent, "ChapterAtom")
+    ET.SubElement(atom, "ChapterTimeStart").text = ms_to_hms(seg.start_ms)
+    ET.SubElement(atom, "ChapterTimeEnd").text = ms_to_hms(seg.end_ms)
+    
+    display = ET.SubElement(atom, "ChapterDisplay")
+    ET.SubElement(display, "ChapterString").text = chapter_label(seg, action_mapping)
+    return atom
+
+def patch_chapter_atom(atom, seg, action_mapping):
+    """Update an existing ChapterAtom's times and title from seg, leaving every other child
+    (ChapterUID, flags, languages, nested atoms) alone. The title is the one
+    build_chapter_atom would write. Returns True if anything changed."""
+    changed = False
+    for tag, ms in (("ChapterTimeStart", seg.start_ms), ("ChapterTimeEnd", seg.end_ms)):
+        element = atom.find(tag)
+        if hms_to_ms(element.text) != ms:
+            element.text = ms_to_hms(ms)
+            changed = True
+    title = atom.find("ChapterDisplay/ChapterString")
+    if title is None:
+        display = atom.find("ChapterDisplay")
+        title = ET.SubElement(display if display is not None else ET.SubElement(atom, "ChapterDisplay"), "ChapterString")
+    label = chapter_label(seg, action_mapping)
+    if (title.text or "").strip() != label:
+        title.text = label
+        changed = True
+    return changed
+
+# Prolog (DOCTYPE, comments) before the root element, kept when a chapter file is rewritten
+_XML_PROLOG = re.compile(r'\s*(?:<\?xml[^>]*\?>)?((?:\s*<!--.*?-->|\s*<!DOCTYPE[^>]*>)*)', re.S)
+
+class ChapterDocument:
+    """A parsed chapter XML file, indexed by EditionEntry.
+    
+    Editions are only turned into SegmentItem objects when asked for, and
+    replace_edition() swaps the atoms of one edition while every other
+    edition's elements stay exactly as loaded, so extended/theatrical cut
+    chapter sets survive an edit. A file without EditionEntry elements is
+    treated as a single edition.
+    """
+    
+    def __init__(self, root, path=None, prolog=""):
+        self.root = root
+        self.path = path
+        self.prolog = prolog
+        self.editions = root.findall("EditionEntry") or [root]
+        self._segments = {}  # edition index -> materialized segments
+    
+    @classmethod
+    def from_string(cls, xml_data, path=None):
+        # Comments inside the document are kept in the tree so they survive a save
+        parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True))
+        root = ET.fromstring(xml_data, parser=parser)
+        return cls(root, path, _XML_PROLOG.match(xml_data).group(1).strip())
+    
+    def default_edition(self):
+        """Index of the edition flagged as default, else the first"""
+        for index, edition in enumerate(self.editions):
+            if (edition.findtext("EditionFlagDefault") or "").strip() == "1":
+                return index
+        return 0
+    
+    def edition_names(self):
+        """Display names for the edition picker"""
+        default = self.default_edition()
+        names = []
+        for index, edition in enumerate(self.editions):
+            name = (edition.findtext("EditionDisplay/EditionString") or "").strip() or f"Edition {index + 1}"
+            count = len(edition.findall(".//ChapterAtom"))
+            names.append(f"{name} ({count} chapters)" + (" [default]" if index == default else ""))
+        return names
+    
+    def segments(self, edition=None, source="xml"):
+        """Segments of one edition (default edition if None), parsed on first access.
+        
+        Returns copies (tied to the same atoms), so editing them in place
+        doesn't change what the document holds until replace_edition().
+        """
+        edition = self.default_edition() if edition is None else edition
+        if edition not in self._segments:
+            self._segments[edition] = parse_chapter_atoms(self.editions[edition], source)
+        return [seg.copy_with() for seg in self._segments[edition]]
+    
+    def replace_edition(self, edition, segments, action_mapping=None):
+        """Make one edition hold exactly these segments with a minimal patch of its atoms.
+        
+        Segments parsed from an atom of this edition (or matching one exactly)
+        update that atom in place, so ChapterUID, flags, languages and other
+        metadata are kept. Atoms whose segment is gone are removed, new
+        segments get new atoms inserted in start-time order. Atoms without
+        times and the other editions are never touched. Returns
+        (updated, inserted, removed) counts.
+        """
+        if action_mapping is None:
+            action_mapping = get_action_mapping()
+        edition = self.default_edition() if edition is None else edition
+        element = self.editions[edition]
+        parents = {child: parent for parent in element.iter() for child in parent}
+        # The atoms parse_chapter_atoms turns into segments; only these are patched or removed
+        timed = [
+            atom for atom in element.iter("ChapterAtom")
+            if atom.findtext("ChapterTimeStart") and atom.findtext("ChapterTimeEnd")
+        ]
+        unclaimed = set(timed)
+        by_key = {}
+        for atom in timed:
+            by_key.setdefault((
+                hms_to_ms(atom.findtext("ChapterTimeStart")), hms_to_ms(atom.findtext("ChapterTimeEnd")),
+                (atom.findtext(".//ChapterDisplay/ChapterString") or "").strip() or "segment"
+            ), []).append(atom)
+        
+        updated = inserted = 0
+        new_segments = []
+        for seg in segments:
+            atom = seg.atom if seg.atom in unclaimed else None
+            if atom is None:
+                # Not parsed from this document (e.g. it was re-read): reuse an atom with the
+                # same times and title, written either mapped or as the segment's own label
+                atom = next((
+                    a for label in (chapter_label(seg, action_mapping), seg.raw_label)
+                    for a in by_key.get((seg.start_ms, seg.end_ms, label), ()) if a in unclaimed
+                ), None)
+            if atom is None:
+                new_segments.append(seg)
+                continue
+            unclaimed.discard(atom)
+            seg.atom = atom
+            updated += patch_chapter_atom(atom, seg, action_mapping)
+        
+        removed = 0
+        for atom in unclaimed:
+            # Keep an atom whose nested chapters are still in use
+            if any(child not in unclaimed for child in atom.iter("ChapterAtom") if child is not atom):
+                continue
+            parents[atom].remove(atom)
+            removed += 1
+        
+        level = 1 if element is self.root else 2
+        for seg in new_segments:
+            seg.atom = self._insert_atom(element, seg, action_mapping, level)
+            inserted += 1
+        self._segments[edition] = [seg.copy_with() for seg in segments]
+        log(f"🩹 Patched chapter edition {edition + 1}: {updated} updated, {inserted} inserted, {removed} removed")
+        return updated, inserted, removed
+    
+    @staticmethod
+    def _insert_atom(element, seg, action_mapping, level, indent="  "):
+        """Insert a new top-level atom before the first one starting later, matching the file's indentation"""
+        children = list(element)
+        index = len(children)
+        for i, child in enumerate(children):
+            start = child.findtext("ChapterTimeStart") if child.tag == "ChapterAtom" else None
+            if start and hms_to_ms(start) > seg.start_ms:
+                index = i
+                break
+        atom = build_chapter_atom(element, seg, action_mapping)
+        element.remove(atom)
+        indent_xml(atom, level, indent)
+        sibling_space = "\n" + level * indent
+        if index < len(children):
+            # Same whitespace before the new atom as before the one it now precedes
+            atom.tail = (element.text if index == 0 else children[index - 1].tail) or sibling_space
+        elif children:
+            atom.tail = children[-1].tail
+            children[-1].tail = sibling_space
+        else:
+            element.text = sibling_space
+            atom.tail = "\n" + (level - 1) * indent
+        element.insert(index, atom)
+        return atom
+    
+    def to_string(self):
+        """Serialize the whole document once; only patched atoms differ from the loaded file"""
+        header = '<?xml version="1.0" encoding="UTF-8"?>\n' + (self.prolog + "\n" if self.prolog else "")
+        return header + ET.tostring(self.root, encoding='unicode')
+
+def parse_chapters_content(xml_data, source="xml", edition=None):
+    """Parse chapter XML text and return the segments of one edition (default edition if None).
+    
+    Raises on bad XML.
+    """
+    return ChapterDocument.from_string(xml_data).segments(edition, source)
+
+def parse_edl_content(edl_data, source="edl", action_mapping=None):
+    """Parse EDL text and return a list of SegmentItem objects, skipping invalid lines"""
+    if action_mapping is None:
+        action_mapping = get_action_mapping()
+    
+    segments = []
+    for line in edl_data.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        
+        parts = line.split()
+        if len(parts) >= 2:
+            try:
+                s = hms_to_ms(parts[0])
+                e = hms_to_ms(parts[1])
+                action = int(parts[2]) if len(parts) > 2 else DEFAULT_ACTION
+                label = action_mapping.get(action, "segment")
+                
+                segments.append(SegmentItem.from_ms(s, e, label, source=source, action_type=action))
+                log(f"📗 Parsed EDL line: {parts[0]} → {parts[1]} | action={action} | label='{label}'")
+            except (ValueError, IndexError) as e:
+                log(f"⚠️ Skipped invalid EDL line: {line} ({e})")
+    return segments
+
+def format_chapters(segments, action_mapping=None):
+    """Build chapter XML text for the given segments"""
+    if action_mapping is None:
+        action_mapping = get_action_mapping()
+    
+    root = ET.Element("Chapters")
+    edition = ET.SubElement(root, "EditionEntry")
+    
+    for seg in segments:
+        build_chapter_atom(edition, seg, action_mapping)
+    
+    # Manually indent XML (Python 3.8 compatible - ET.indent() requires Python 3.9+)
+    indent_xml(root, indent="  ")
+    xml_str = ET.tostring(root, encoding='unicode')
+    
+    # Add XML declaration
+    return '<?xml version="1.0" encoding="UTF-8"?>\n' + xml_str
+
+def format_edl(segments, action_mapping=None):
+    """Build EDL text for the given segments"""
+    if action_mapping is None:
+        action_mapping = get_action_mapping()
+    # Reverse lookup label -> action_type
+    label_to_action = {label.lower(): action for action, label in action_mapping.items()}
+    
+    lines = []
+    for seg in segments:
+        # Determine action type: use existing, or lookup from label, or default to DEFAULT_ACTION
+        action = seg.action_type
+        if not action:
+            seg_label = (seg.raw_label if hasattr(seg, 'raw_label') else seg.segment_type_label).lower()
+            action = label_to_action.get(seg_label, DEFAULT_ACTION)
+        lines.append(f"{ms_to_decimal(seg.start_ms)}\t{ms_to_decimal(seg.end_ms)}\t{action}")
+    
+    return "\n".join(lines) + "\n"
+
+def read_chapter_document(video_path):
+    """Read and parse the video's chapter XML file. Returns a ChapterDocument or None."""
     base = os.path.splitext(video_path)[0]
     video_dir = os.path.dirname(video_path)
     suffixes = ["-chapters.xml", "_chapters.xml", "-chapter.xml", "_chapter.xml"]
@@ -284,28 +948,27 @@ def parse_chapters(video_path):
         paths_to_try.append(os.path.join(video_dir, "chapters.xml"))
     
     log(f"🔍 Attempting chapter XML paths: {paths_to_try}")
-    xml_data = safe_file_read(*paths_to_try)
-    if not xml_data:
-        log("🚫 No chapter XML file found")
+    for path in paths_to_try:
+        xml_data = safe_file_read(path)
+        if not xml_data:
+            continue
+        try:
+            document = ChapterDocument.from_string(xml_data, path)
+            log(f"✅ Indexed {len(document.editions)} chapter edition(s) in {path}")
+            return document
+        except Exception as e:
+            log(f"❌ XML parse failed: {e}")
+            return None
+    log("🚫 No chapter XML file found")
+    return None
+
+def parse_chapters(video_path, edition=None):
+    """Parse chapter.xml file and return one edition's SegmentItem objects (default edition if None)"""
+    document = read_chapter_document(video_path)
+    if not document:
         return None
-    
     try:
-        root = ET.fromstring(xml_data)
-        result = []
-        for atom in root.findall(".//ChapterAtom"):
-            raw_label = atom.findtext(".//ChapterDisplay/ChapterString", default="")
-            label = raw_label.strip() if raw_label else "segment"
-            start = atom.findtext("ChapterTimeStart")
-            end = atom.findtext("ChapterTimeEnd")
-            if start and end:
-                result.append(SegmentItem(
-                    hms_to_seconds(start),
-                    hms_to_seconds(end),
-                    label,
-                    source="xml"
-                ))
-                log(f"📘 Parsed XML segment: {start} → {end} | label='{label}'")
-        
+        result = document.segments(edition)
         if result:
             log(f"✅ Total segments parsed from XML: {len(result)}")
         return result if result else None
@@ -328,48 +991,20 @@ def parse_edl(video_path):
     
     segments = []
     try:
-        for line in edl_data.splitlines():
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            
-            parts = line.split()
-            if len(parts) >= 2:
-                try:
-                    s = float(parts[0])
-                    e = float(parts[1])
-                    action = int(parts[2]) if len(parts) > 2 else 4
-                    label = "segment"  # Default label
-                    
-                    # Try to get label from mapping if available
-                    try:
-                        addon = get_addon()
-                        mapping = {}
-                        raw = addon.getSetting("action_mapping")
-                        if raw:
-                            pairs = [entry.strip() for entry in raw.split(",") if ":" in entry]
-                            for pair in pairs:
-                                try:
-                                    act, lbl = pair.split(":", 1)
-                                    mapping[int(act.strip())] = lbl.strip()
-                                except:
-                                    pass
-                        label = mapping.get(action, "segment")
-                    except:
-                        pass
-                    
-                    segments.append(SegmentItem(s, e, label, source="edl", action_type=action))
-                    log(f"📗 Parsed EDL line: {s} → {e} | action={action} | label='{label}'")
-                except (ValueError, IndexError) as e:
-                    log(f"⚠️ Skipped invalid EDL line: {line} ({e})")
+        segments = parse_edl_content(edl_data)
     except Exception as e:
         log(f"❌ EDL parse failed: {e}")
     
     log(f"✅ Total segments parsed from EDL: {len(segments)}")
     return segments
 
-def save_chapters(video_path, segments):
-    """Save segments to chapter.xml file"""
+def save_chapters(video_path, segments, edition=None, document=None, path=None):
+    """Save segments to chapter.xml file (path, if given, instead of the video's default name).
+    
+    Only the given edition (default edition if None) is replaced; the other
+    editions of the loaded document - or of the existing file when no
+    document is passed - are written back unchanged.
+    """
     # Handle path properly - remove extension
     if '.' in video_path:
         base = video_path.rsplit('.', 1)[0]
@@ -378,13 +1013,13 @@ def save_chapters(video_path, segments):
     
     # Use the first suffix format found, or default to -chapters.xml
     suffixes = ["-chapters.xml", "_chapters.xml"]
-    output_path = None
+    output_path = path
     
     # Check which file exists
-    for suffix in suffixes:
-        path = f"{base}{suffix}"
-        if xbmcvfs.exists(path):
-            output_path = path
+    for suffix in suffixes if not output_path else ():
+        candidate = f"{base}{suffix}"
+        if xbmcvfs.exists(candidate):
+            output_path = candidate
             break
     
     # If no file exists, create new one with default suffix
@@ -393,39 +1028,6 @@ def save_chapters(video_path, segments):
     
     log(f"💾 Saving {len(segments)} segments to: {output_path}")
     
-    # Get action mapping from settings
-    action_mapping = {}
-    try:
-        addon = get_addon()
-        raw = addon.getSetting("action_mapping")
-        if raw:
-            pairs = [entry.strip() for entry in raw.split(",") if ":" in entry]
-            for pair in pairs:
-                try:
-                    action_type, label = pair.split(":", 1)
-                    action_mapping[int(action_type.strip())] = label.strip()
-                except:
-                    pass
-    except:
-        pass
-    
-    # Create XML structure
-    root = ET.Element("Chapters")
-    edition = ET.SubElement(root, "EditionEntry")
-    
-    for seg in segments:
-        atom = ET.SubElement(edition, "ChapterAtom")
-        ET.SubElement(atom, "ChapterTimeStart").text = seconds_to_hms(seg.start_seconds)
-        ET.SubElement(atom, "ChapterTimeEnd").text = seconds_to_hms(seg.end_seconds)
-        
-        display = ET.SubElement(atom, "ChapterDisplay")
-        # Use label from action mapping if available, otherwise use segment label
-        if seg.action_type and seg.action_type in action_mapping:
-            label = action_mapping[seg.action_type]
-        else:
-            label = seg.raw_label if hasattr(seg, 'raw_label') else seg.segment_type_label
-        ET.SubElement(display, "ChapterString").text = label
-    
     # Write to file
     try:
         # Ensure directory exists
@@ -437,12 +1039,16 @@ def save_chapters(video_path, segments):
         except Exception as dir_err:
             log(f"⚠️ Could not ensure directory exists: {dir_err}")
         
-        # Manually indent XML (Python 3.8 compatible - ET.indent() requires Python 3.9+)
-        indent_xml(root, indent="  ")
-        xml_str = ET.tostring(root, encoding='unicode')
-        
-        # Add XML declaration
-        xml_str = '<?xml version="1.0" encoding="UTF-8"?>\n' + xml_str
+        if document is None and xbmcvfs.exists(output_path):
+            try:
+                document = ChapterDocument.from_string(safe_file_read(output_path) or "", output_path)
+            except ET.ParseError as parse_err:
+                log(f"⚠️ Existing chapter XML is invalid, writing a new one: {parse_err}")
+        if document is not None:
+            document.replace_edition(edition, segments)
+            xml_str = document.to_string()
+        else:
+            xml_str = format_chapters(segments)
         
         log(f"📝 Writing XML content to: {output_path}")
         log(f"📝 XML content length: {len(xml_str)} bytes")
@@ -469,14 +1075,14 @@ def save_chapters(video_path, segments):
         log(f"Traceback: {traceback.format_exc()}")
         return False
 
-def save_edl(video_path, segments):
-    """Save segments to .edl file"""
+def save_edl(video_path, segments, path=None):
+    """Save segments to .edl file (path, if given, instead of the video's default name)"""
     # Handle path properly - remove extension
     if '.' in video_path:
         base = video_path.rsplit('.', 1)[0]
     else:
         base = video_path
-    output_path = f"{base}.edl"
+    output_path = path or f"{base}.edl"
     
     # Check if EDL file already exists - if so, use that exact path format
     # This ensures we use the path format that Kodi recognizes for writes
@@ -487,37 +1093,8 @@ def save_edl(video_path, segments):
     
     log(f"💾 Saving {len(segments)} segments to: {output_path}")
     
-    # Get action mapping from settings to reverse lookup label -> action_type
-    label_to_action = {}
-    try:
-        addon = get_addon()
-        raw = addon.getSetting("action_mapping")
-        if raw:
-            pairs = [entry.strip() for entry in raw.split(",") if ":" in entry]
-            for pair in pairs:
-                try:
-                    action_type, label = pair.split(":", 1)
-                    label_to_action[label.strip().lower()] = int(action_type.strip())
-                except:
-                    pass
-    except:
-        pass
-    
     try:
-        lines = []
-        for seg in segments:
-            # Determine action type: use existing, or lookup from label, or default to 4
-            action = seg.action_type if seg.action_type else 4
-            if not seg.action_type:
-                # Try to find action type from label using reverse mapping
-                seg_label = (seg.raw_label if hasattr(seg, 'raw_label') else seg.segment_type_label).lower()
-                if seg_label in label_to_action:
-                    action = label_to_action[seg_label]
-                else:
-                    action = 4  # Default action type
-            lines.append(f"{seg.start_seconds:.3f}\t{seg.end_seconds:.3f}\t{action}")
-        
-        content = "\n".join(lines) + "\n"
+        content = format_edl(segments)
         
         # Ensure directory exists
         try:
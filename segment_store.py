@@ -0,0 +1,351 @@
+"""
+Central segment store for libraries on read-only or slow shares.
+
+With the central store enabled, the editor and the service read and write
+segments in a SQLite database keyed by video identity (the content
+fingerprint from video_identity, or the path if the video can't be
+fingerprinted) instead of in sidecars next to the video. A save is one local
+transaction, and works on shares that are mounted read-only. Rows are looked
+up by path first; the video is only fingerprinted when its path has no row
+(first save, or a renamed video being recovered).
+
+Batch writers (segments.set, imports, restores, season propagation) go
+through bulk_write_segments and propagate_to_season here, which write to the
+store instead of the sidecars while it is enabled.
+
+The database lives in the addon profile, or in a configured folder so several
+Kodi clients can share it. Rows remember which revision was last exported;
+StoreExporter periodically writes pending rows out as sidecars, so they
+appear next to the videos once the share becomes writable.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import xbmcvfs
+
+import library
+from library import (
+    segments_to_json, segments_from_json, parallel_map, sibling_dir, current_checkpoint, load_video_segments,
+    merge_labelled_segments, DEFAULT_WORKERS
+)
+from segment_parser import segment_key
+from sidecar_formats import get_format, save_video_segments, delete_video_sidecars
+from video_identity import get_video_fingerprint
+from jobs import Job, PRIORITY_LOW
+from utils import get_addon, log, log_always, get_profile_path, stat_file
+
+STORE_FILENAME = "segment_store.db"
+STORE_TARGET = "store"
+STORE_LABEL = "Segment Store"
+EXPORT_INTERVAL_MINUTES = 10
+# How long a client waits for another client's write lock on a shared store
+BUSY_TIMEOUT_SECONDS = 10
+# export_row outcomes
+EXPORTED, VIDEO_MISSING, EXPORT_FAILED = "exported", "missing", "failed"
+
+class SegmentStore:
+    """Thread-safe wrapper around the store database"""
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS segments (
+            identity TEXT PRIMARY KEY,
+            video_path TEXT NOT NULL,
+            segments_json TEXT NOT NULL,
+            save_format TEXT,
+            revision INTEGER NOT NULL,
+            exported INTEGER NOT NULL DEFAULT 0,
+            updated INTEGER
+        )""",
+    ]
+
+    INDEXES = [
+        "CREATE INDEX IF NOT EXISTS segments_video_path ON segments (video_path)",
+        "CREATE INDEX IF NOT EXISTS segments_pending ON segments (exported, revision)",
+    ]
+
+    def __init__(self, db_path, shared=False):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # WAL needs shared memory, which network filesystems don't provide
+        if not shared:
+            try:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            except sqlite3.DatabaseError as e:
+                log(f"⚠️ Could not enable WAL for segment store: {e}")
+        with self._lock, self._conn:
+            for statement in self.SCHEMA + self.INDEXES:
+                self._conn.execute(statement)
+
+    def get_by_path(self, video_path):
+        """Return the newest row stored for the path, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM segments WHERE video_path = ? ORDER BY updated DESC LIMIT 1", (video_path,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_by_identity(self, identity):
+        """Return the row stored under identity, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM segments WHERE identity = ?", (identity,)).fetchone()
+        return dict(row) if row else None
+
+    def put(self, identity, video_path, segments_json, save_format):
+        """Store a video's segments as a new revision awaiting export"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT revision FROM segments WHERE identity = ?", (identity,)).fetchone()
+            # The path may have been stored under an older identity (video replaced or remuxed)
+            self._conn.execute("DELETE FROM segments WHERE video_path = ? AND identity != ?", (video_path, identity))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO segments (identity, video_path, segments_json, save_format, revision, "
+                "exported, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (identity, video_path, segments_json, save_format, (row["revision"] if row else 0) + 1,
+                 0, int(time.time()))
+            )
+
+    def pending_exports(self):
+        """Rows whose latest revision hasn't been written out as sidecars yet"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM segments WHERE exported < revision").fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_exported(self, identity, revision):
+        """Record an export, unless the row was saved again in the meantime"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE segments SET exported = ? WHERE identity = ? AND revision = ?",
+                (revision, identity, revision)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def central_store_enabled():
+    try:
+        return get_addon().getSettingBool("central_store")
+    except Exception:
+        return False
+
+def store_db_path():
+    """Return (database path, shared) from the store folder setting (addon profile if empty)"""
+    folder = (get_addon().getSetting("central_store_path") or "").strip()
+    if folder:
+        folder = xbmcvfs.translatePath(folder)
+        # SQLite opens real filesystem paths only; smb:// and nfs:// shares must be mounted
+        if "://" not in folder:
+            return os.path.join(folder, STORE_FILENAME), True
+        log_always(f"⚠️ Segment store folder {folder} is not a local or mounted path, using the addon profile")
+    return get_profile_path(STORE_FILENAME), False
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Return the SegmentStore for the configured folder, reopening it when the setting changes"""
+    global _store
+    with _store_lock:
+        try:
+            db_path, shared = store_db_path()
+            if _store is None or _store.db_path != db_path:
+                if _store is not None:
+                    _store.close()
+                _store = SegmentStore(db_path, shared)
+                log(f"🗄️ Segment store opened at {db_path}")
+        except Exception as e:
+            log(f"❌ Could not open segment store: {e}")
+            _store = None
+        return _store
+
+def video_identity(video_path):
+    """Store key of a video: its content fingerprint, so segments follow renames, else its path"""
+    fingerprint = get_video_fingerprint(video_path)
+    return fingerprint or f"path:{video_path}"
+
+def find_store_row(store, video_path):
+    """The video's row: by path (no I/O on the video), else by fingerprint for a renamed video"""
+    row = store.get_by_path(video_path)
+    if row is None:
+        identity = video_identity(video_path)
+        row = store.get_by_identity(identity) if not identity.startswith("path:") else None
+    return row
+
+def load_store_segments(video_path):
+    """Return the video's stored segments, or None if the store has no entry for it"""
+    store = get_store()
+    if not store:
+        return None
+    row = find_store_row(store, video_path)
+    if row is None:
+        return None
+    try:
+        segments = segments_from_json(row["segments_json"])
+    except (ValueError, TypeError) as e:
+        log(f"⚠️ Ignoring corrupt stored segments for {video_path}: {e}")
+        return None
+    log(f"🗄️ Loaded {len(segments)} segments for {os.path.basename(video_path)} from the segment store")
+    return segments
+
+def save_store_segments(video_path, segments, save_format="auto"):
+    """Store segments (an empty list removes the sidecars on export). Returns True on success."""
+    store = get_store()
+    if not store:
+        return False
+    try:
+        # Keep the identity the path is stored under; only a new path is fingerprinted
+        row = store.get_by_path(video_path)
+        identity = row["identity"] if row else video_identity(video_path)
+        store.put(identity, video_path, segments_to_json(segments), save_format)
+        log(f"🗄️ Stored {len(segments)} segments for {os.path.basename(video_path)}")
+        return True
+    except sqlite3.Error as e:
+        log(f"❌ Failed to store segments for {video_path}: {e}")
+        return False
+
+def write_segments(video_path, segments, save_format="auto", sidecars=None, edition=None, document=None):
+    """Save to the central store when it is enabled, else to sidecars. Returns {target: success}."""
+    if central_store_enabled():
+        return {STORE_TARGET: save_store_segments(video_path, segments, save_format)}
+    return save_video_segments(video_path, segments, save_format, sidecars, edition, document)
+
+def save_format_for_kinds(kinds):
+    """Store save_format for a batch write's sidecar kinds"""
+    kinds = tuple(dict.fromkeys(kinds))
+    if len(kinds) == 1:
+        return kinds[0]
+    return "both" if set(kinds) == {"edl", "xml"} else "auto"
+
+def current_segments(video_path):
+    """What the editor would show for a video in store mode: the stored row, else its sidecars"""
+    stored = load_store_segments(video_path)
+    return stored if stored is not None else load_video_segments(video_path)[0]
+
+def bulk_write_segments(items, max_workers=DEFAULT_WORKERS, merge=False):
+    """library.bulk_write_segments, writing to the central store while it is enabled"""
+    if not central_store_enabled():
+        return library.bulk_write_segments(items, max_workers, merge)
+
+    def store_item(item):
+        video_path, segments, kinds = item
+        if merge:
+            segments = merge_labelled_segments(current_segments(video_path), segments)
+        ok = save_store_segments(video_path, segments, save_format_for_kinds(kinds))
+        return {"video": video_path, "written": [STORE_TARGET] if ok else [],
+                "error": None if ok else "segment store write failed"}
+
+    results = parallel_map(store_item, items, max_workers)
+    log_always(f"🗄️ Bulk write: {sum(1 for r in results if not r['error'])} of {len(results)} videos stored")
+    return results
+
+def propagate_to_stored_sibling(video_path, sidecars, segments, labels, default_kinds, dry_run=True,
+                                action_mapping=None):
+    """Store-mode counterpart of library.propagate_to_sibling"""
+    result = {"video": video_path, "paths": [], "changed": False, "written": False, "error": None}
+    try:
+        existing = current_segments(video_path)
+        merged = merge_labelled_segments(existing, segments, labels)
+        if [segment_key(seg) for seg in merged] != [segment_key(seg) for seg in existing]:
+            result["paths"].append(f"{STORE_LABEL}: {video_path}")
+            result["changed"] = True
+            if not dry_run and not save_store_segments(video_path, merged, save_format_for_kinds(sidecars or default_kinds)):
+                result["error"] = "segment store write failed"
+        result["written"] = result["changed"] and not dry_run and not result["error"]
+    except Exception as e:
+        result["error"] = str(e)
+        log(f"❌ Failed to propagate segments to {video_path}: {e}")
+    return result
+
+def propagate_to_season(video_path, segments, labels=None, default_kinds=("edl",), dry_run=True,
+                        max_workers=DEFAULT_WORKERS):
+    """library.propagate_to_season, writing to the central store while it is enabled"""
+    propagate = propagate_to_stored_sibling if central_store_enabled() else library.propagate_to_sibling
+    return library.propagate_to_season(
+        video_path, segments, labels, default_kinds, dry_run, max_workers, propagate=propagate
+    )
+
+def target_label(target):
+    """Display name of a write_segments result key"""
+    return STORE_LABEL if target == STORE_TARGET else get_format(target).label
+
+def export_row(row):
+    """Write one stored row out as sidecars. Returns EXPORTED, VIDEO_MISSING or EXPORT_FAILED."""
+    video_path = row["video_path"]
+    if not stat_file(video_path):
+        # Renamed or deleted; the row stays for a fingerprint lookup at the new path
+        return VIDEO_MISSING
+    segments = segments_from_json(row["segments_json"])
+    save_format = row["save_format"] or "auto"
+    if not segments:
+        delete_video_sidecars(video_path, save_format)
+        return EXPORTED
+    return EXPORTED if all(save_video_segments(video_path, segments, save_format).values()) else EXPORT_FAILED
+
+def export_pending(max_workers=DEFAULT_WORKERS):
+    """Export every pending row, one directory per worker.
+
+    A directory whose first export fails is assumed read-only and the rest of
+    its rows wait for the next run, so a read-only share costs one failed
+    write per directory. Rows whose video is gone are skipped, not counted as
+    failures. Returns a summary dict.
+    """
+    store = get_store()
+    if not store:
+        return None
+    rows = store.pending_exports()
+    directories = {}
+    for row in rows:
+        directories.setdefault(sibling_dir(row["video_path"]), []).append(row)
+
+    # The directories run on pool threads, which don't carry the job's checkpoint
+    job_checkpoint = current_checkpoint()
+
+    def export_directory(directory_rows):
+        exported = missing = 0
+        for row in directory_rows:
+            job_checkpoint()
+            try:
+                status = export_row(row)
+            except Exception as e:
+                log(f"⚠️ Could not export stored segments for {row['video_path']}: {e}")
+                status = EXPORT_FAILED
+            if status == VIDEO_MISSING:
+                missing += 1
+                continue
+            if status == EXPORT_FAILED:
+                break
+            store.mark_exported(row["identity"], row["revision"])
+            exported += 1
+        return exported, missing
+
+    counts = parallel_map(export_directory, directories.values(), max_workers)
+    exported = sum(done for done, _ in counts)
+    summary = {"pending": len(rows), "exported": exported, "missing": sum(gone for _, gone in counts),
+               "directories": len(directories)}
+    if rows:
+        log_always(f"🗄️ Segment store export: {exported} of {len(rows)} videos written to sidecars")
+    return summary
+
+class StoreExporter:
+    """Schedules export_pending on the job scheduler while the central store is enabled"""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.job = None
+        self.last_run = 0
+
+    def tick(self):
+        """Called from the service loop; queues an export when one is due and none is running"""
+        if self.job and self.job.status in (Job.QUEUED, Job.RUNNING):
+            return
+        if time.time() - self.last_run < EXPORT_INTERVAL_MINUTES * 60:
+            return
+        addon = get_addon()
+        if not addon.getSettingBool("central_store") or not addon.getSettingBool("central_store_export"):
+            return
+        self.last_run = time.time()
+        self.job = self.scheduler.submit(export_pending, name="segment store export", priority=PRIORITY_LOW)
@@ -6,8 +6,17 @@ import xbmcvfs
 import xbmcaddon
 import json
 
-from segment_parser import parse_edl, parse_chapters, save_edl, save_chapters, SegmentItem
+from segment_parser import SegmentItem
+from sidecar_formats import get_save_format, delete_video_sidecars
+from library import load_video_segments
 from editor_dialog import SegmentEditorDialog
+from media_probe import read_mkv_chapters
+from video_identity import recover_sidecars, snapshot_sidecars_async
+from sidecar_sync import capture_sidecar_state
+from api_server import start_api_server, stop_api_server, DEFAULT_PORT
+from jobs import JobScheduler
+from watcher import LibraryWatcher
+from segment_store import central_store_enabled, load_store_segments, write_segments, StoreExporter
 from utils import get_addon, log, log_always, get_video_file
 
 CHECK_INTERVAL = 1.0
@@ -301,12 +310,31 @@ def update_keymap_file():
         log(f"Traceback: {traceback.format_exc()}")
         return False
 
+def update_api_server():
+    """Start, stop or restart the local segment API to match the current settings"""
+    try:
+        addon = get_addon()
+        enabled = addon.getSettingBool("enable_api")
+        config = (addon.getSettingInt("api_port") or DEFAULT_PORT, addon.getSetting("api_token").strip())
+        if monitor.api_server and (not enabled or config != monitor.api_config):
+            stop_api_server(monitor.api_server)
+            monitor.api_server = None
+        if enabled and not monitor.api_server:
+            monitor.api_server = start_api_server(*config, scheduler=monitor.scheduler)
+            monitor.api_config = config
+    except Exception as e:
+        log(f"⚠️ Error updating segment API server: {e}")
+
 class PlaybackMonitor(xbmc.Monitor):
     def __init__(self):
         super().__init__()
         self.last_video = None
         self.editor_open = False
         self.last_shortcut_key = None
+        self.api_server = None
+        self.api_config = None
+        self.scheduler = None  # Runs library-wide jobs; throttled while a video plays
+        self.editor_dialog = None  # The editor window, kept alive and reset for every session
     
     def onSettingsChanged(self):
         """Handle settings changes"""
@@ -317,6 +345,7 @@ class PlaybackMonitor(xbmc.Monitor):
                 log_always(f"🔧 Shortcut key setting changed to '{current_key}'")
                 self.last_shortcut_key = current_key
                 update_keymap_file()
+            update_api_server()
         except Exception as e:
             log(f"⚠️ Error handling settings change: {e}")
     
@@ -345,6 +374,17 @@ class PlaybackMonitor(xbmc.Monitor):
 monitor = PlaybackMonitor()
 player = xbmc.Player()
 
+def get_editor_dialog():
+    """Return the editor window, creating it (parsing the skin XML) on first use"""
+    if monitor.editor_dialog is None:
+        log_always("🎨 Creating SegmentEditorDialog...")
+        monitor.editor_dialog = SegmentEditorDialog(
+            "SegmentEditorDialog.xml",
+            get_addon().getAddonInfo("path"),
+            "default"
+        )
+    return monitor.editor_dialog
+
 def open_segment_editor(video_path=None):
     """Open the segment editor dialog for the current or specified video"""
     log_always("📝 open_segment_editor() called")
@@ -367,9 +407,23 @@ def open_segment_editor(video_path=None):
     
     try:
         # Try to load existing segments
-        segments = parse_chapters(video_path)
-        if not segments:
-            segments = parse_edl(video_path)
+        # With the central store, a stored entry wins and no sidecar is touched
+        store_mode = central_store_enabled()
+        stored = load_store_segments(video_path) if store_mode else None
+        if stored is not None:
+            segments, chapter_document, sidecars = stored, None, {}
+        else:
+            # Chapter XML and EDL are read side by side and shown as one timeline
+            segments, chapter_document, sidecars = load_video_segments(video_path)
+            if segments:
+                # Keep the content-hash snapshot current so a later rename can be recovered
+                snapshot_sidecars_async(video_path)
+            elif get_addon().getSettingBool("recover_by_fingerprint") and recover_sidecars(video_path):
+                # Renamed or moved video - sidecars were restored from the segment index by content hash
+                segments, chapter_document, sidecars = load_video_segments(video_path)
+        if not segments and get_addon().getSettingBool("read_embedded_chapters"):
+            # No sidecars - fall back to chapters embedded in the video container
+            segments = read_mkv_chapters(video_path)
         
         # Get current playback time if available
         current_time = None
@@ -379,96 +433,56 @@ def open_segment_editor(video_path=None):
         except:
             pass
         
-        # Create and show editor dialog
-        addon = get_addon()
-        log_always("🎨 Creating SegmentEditorDialog...")
+        # Show the editor dialog; the window is reused, only its session state is reset
         try:
-            dialog = SegmentEditorDialog(
-                "SegmentEditorDialog.xml",
-                addon.getAddonInfo("path"),
-                "default",
+            dialog = get_editor_dialog()
+            dialog.reset(
                 video_path=video_path,
                 segments=segments or [],
-                current_time=current_time
+                current_time=current_time,
+                chapter_document=chapter_document,
+                sidecars=sidecars,
+                # Store saves don't write the sidecar, so there's nothing to track
+                sidecar_state=None if store_mode else capture_sidecar_state(video_path, segments, sidecars)
             )
-            log_always("✅ Dialog created, calling doModal()...")
+            log_always("✅ Dialog ready, calling doModal()...")
             dialog.doModal()
             log_always("✅ doModal() completed")
         except Exception as dialog_err:
+            # Don't reuse a window that failed; the next open creates a fresh one
+            monitor.editor_dialog = None
             log_always(f"❌ Error creating/showing dialog: {dialog_err}")
             import traceback
             log_always(f"Traceback: {traceback.format_exc()}")
             raise  # Re-raise to be caught by outer try/except
         
         # Check if segments were modified
-        if dialog.segments_modified:
+        save = False
+        while dialog.segments_modified:
+            if dialog.resolve_concurrent_change():
+                save = True
+                break
+            if not dialog.merge_conflicts:
+                break  # Cancelled
+            # Merged with conflicts: show the result again instead of saving it unreviewed
+            dialog.review_merge()
+        if save:
             log("💾 Segments were modified, saving...")
-            addon = get_addon()
-            save_format = addon.getSetting("save_format")
-            
-            if dialog.segments:
-                # Determine what to save based on setting
-                if save_format == "both":
-                    # Save to both formats
-                    save_edl(video_path, dialog.segments)
-                    save_chapters(video_path, dialog.segments)
-                    log("💾 Saved to both EDL and XML formats")
-                elif save_format == "xml":
-                    # Save to XML only
-                    save_chapters(video_path, dialog.segments)
-                    log("💾 Saved to XML format")
-                elif save_format == "edl":
-                    # Save to EDL only
-                    save_edl(video_path, dialog.segments)
-                    log("💾 Saved to EDL format")
-                else:
-                    # Auto detect - use existing format or default to EDL
-                    if dialog.segments[0].source == "xml":
-                        save_chapters(video_path, dialog.segments)
-                    else:
-                        save_edl(video_path, dialog.segments)
-                    log("💾 Saved using auto-detected format")
+            save_format = get_save_format()
+            if dialog.segments or store_mode:
+                write_segments(
+                    video_path, dialog.segments, save_format, dialog.sidecars, dialog.edition, dialog.chapter_document
+                )
             else:
-                # No segments left, delete files based on save format
-                base = os.path.splitext(video_path)[0]
-                files_to_delete = []
-                
-                if save_format == "both":
-                    files_to_delete = [
-                        f"{base}-chapters.xml",
-                        f"{base}_chapters.xml",
-                        f"{base}.edl"
-                    ]
-                elif save_format == "xml":
-                    files_to_delete = [
-                        f"{base}-chapters.xml",
-                        f"{base}_chapters.xml"
-                    ]
-                elif save_format == "edl":
-                    files_to_delete = [f"{base}.edl"]
-                else:
-                    # Auto detect - delete all possible files
-                    files_to_delete = [
-                        f"{base}-chapters.xml",
-                        f"{base}_chapters.xml",
-                        f"{base}.edl"
-                    ]
-                
-                for path in files_to_delete:
-                    if xbmcvfs.exists(path):
-                        try:
-                            xbmcvfs.delete(path)
-                            log(f"🗑️ Deleted empty segment file: {path}")
-                        except:
-                            pass
+                # No segments left, delete the files the save format would have written
+                delete_video_sidecars(video_path, save_format, dialog.sidecars)
             
+            snapshot_sidecars_async(video_path)
             xbmcgui.Dialog().notification(
                 "Segment Editor",
                 "Segments saved successfully",
                 time=2000
             )
-        
-        del dialog
     except Exception as e:
         log(f"❌ Error opening editor: {e}")
         import traceback
@@ -502,6 +516,20 @@ try:
                 log_always("⚠️ Keymap file update failed - you may need to manually edit keymap.xml")
         except Exception as keymap_err:
             log_always(f"⚠️ Error updating keymap: {keymap_err}")
+        
+        # Library-wide work (validation, imports, exports) runs here, not on the monitor loop
+        monitor.scheduler = JobScheduler(monitor, player)
+        monitor.scheduler.start()
+        watcher = LibraryWatcher(monitor.scheduler)
+        exporter = StoreExporter(monitor.scheduler)
+        
+        update_api_server()
+        
+        # Pre-warm the editor window so the first open doesn't wait for the skin to load
+        try:
+            get_editor_dialog()
+        except Exception as e:
+            log(f"⚠️ Could not pre-create the editor dialog: {e}")
 
         while not monitor.abortRequested():
             # Check if video is playing
@@ -512,6 +540,18 @@ try:
                     log(f"🎬 New video detected: {os.path.basename(video)}")
                     monitor.last_video = video
             
+            # Index sidecars that appeared in the library roots since the last scan
+            try:
+                watcher.tick()
+            except Exception as e:
+                log(f"⚠️ Error scheduling library scan: {e}")
+            
+            # Write centrally stored segments out to shares that have become writable
+            try:
+                exporter.tick()
+            except Exception as e:
+                log(f"⚠️ Error scheduling segment store export: {e}")
+            
             # Check for trigger file (alternative method to open editor)
             # Check this regardless of whether video is playing
             try:
@@ -557,6 +597,11 @@ try:
             if monitor.waitForAbort(CHECK_INTERVAL):
                 log_always("🛑 Abort requested — exiting monitor loop")
                 break
+        
+        stop_api_server(monitor.api_server)
+        monitor.scheduler.shutdown()
+        # Kodi warns about leaked windows unless the instance is released before exit
+        monitor.editor_dialog = None
 except Exception as critical_err:
     # Last resort error handling - use direct xbmc.log in case get_addon() fails
     try:
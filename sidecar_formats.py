@@ -0,0 +1,427 @@
+"""
+Registry of segment sidecar formats.
+
+Each format bundles the file suffixes it is discovered by, a sniff function
+that recognises it from the first few KB, a parser and a formatter. Reading
+a sidecar costs a single ranged read when the file fits in HEAD_BYTES (the
+common case). Every sidecar write goes through SidecarFormat.save(): the
+editor and service through save_video_segments(), batch tools directly.
+
+Registered formats, in discovery preference order (formats that carry
+chapter titles come first, so their labels win when sidecars are merged):
+    xml         Matroska chapter XML (<video>-chapters.xml, edition-aware)
+    webvtt      WebVTT chapters (<video>.chapters.vtt)
+    ffmetadata  FFmpeg metadata chapters (<video>.ffmetadata)
+    edl         Kodi EDL (<video>.edl)
+    comskip     Comskip frame list (<video>.txt, only if the file sniffs as one)
+    mplayer     MPlayer EDL (skip/mute only; .edl files are read as Kodi EDL)
+
+A file is never overwritten or deleted unless it is empty or its head sniffs
+as the format being written, so a notes file that happens to share a sidecar
+name is left alone.
+"""
+import re
+from fractions import Fraction
+
+import xbmcvfs
+
+from segment_parser import (
+    parse_edl_content, parse_chapters_content, format_edl, format_chapters, save_edl, save_chapters,
+    safe_file_read, safe_file_write, get_action_mapping, chapter_label, hms_to_ms, ms_to_hms, ms_to_decimal,
+    frames_to_ms, ms_to_frames, SegmentItem
+)
+from utils import get_addon, log
+
+# Enough to sniff any format and to hold most sidecars completely
+HEAD_BYTES = 4096
+
+CHAPTER_SUFFIXES = ("-chapters.xml", "_chapters.xml", "-chapter.xml", "_chapter.xml")
+# Folder-wide chapter file used when a video has no chapter XML of its own
+FOLDER_CHAPTERS = "chapters.xml"
+
+COMSKIP_DEFAULT_FPS = Fraction(2997, 100)
+COMSKIP_ACTION = 3  # Kodi EDL "commercial break"
+
+class SidecarFormat:
+    """A sidecar codec: suffixes, sniff(head) -> bool, parse(content, action_mapping), format(segments, action_mapping)
+
+    A format whose suffix other tools use too (.txt) sets sniff_required, so a
+    file is only taken for one of its sidecars after its head was sniffed.
+    """
+
+    def __init__(self, name, label, suffixes, sniff, parse, format, save=None, sniff_required=False):
+        self.name = name
+        self.label = label
+        self.suffixes = suffixes
+        self.sniff = sniff
+        self.parse = parse
+        self.format = format
+        self._save = save
+        self.sniff_required = sniff_required
+
+    def default_path(self, video_path):
+        return video_path.rsplit(".", 1)[0] + self.suffixes[0]
+
+    def save(self, video_path, segments, path=None, action_mapping=None, **kwargs):
+        """Write segments next to the video (or to path); returns True on success.
+        
+        Every sidecar write in the addon goes through here. A file that exists
+        but isn't this format (see can_replace) is never overwritten.
+        """
+        target = path or self.default_path(video_path)
+        if not can_replace(target, self.name):
+            log(f"⚠️ Not saving {self.label} over {target}: the file is not a {self.label} sidecar")
+            return False
+        if self._save:
+            return self._save(video_path, segments, path=path, **kwargs)
+        path = path or self.default_path(video_path)
+        log(f"💾 Saving {len(segments)} segments as {self.label} to: {path}")
+        try:
+            if action_mapping is None:
+                action_mapping = get_action_mapping()
+            success, _ = safe_file_write(path, self.format(segments, action_mapping))
+            return success
+        except Exception as e:
+            log(f"❌ Failed to save {self.label}: {e}")
+            return False
+
+FORMATS = {}
+
+def register_format(fmt):
+    """Add a format to the registry (registration order is the discovery preference)"""
+    FORMATS[fmt.name] = fmt
+    return fmt
+
+def get_format(name, default="edl"):
+    return FORMATS.get(name) or FORMATS.get(default)
+
+def format_names():
+    return list(FORMATS)
+
+def all_suffixes():
+    return tuple(dict.fromkeys(suffix for fmt in FORMATS.values() for suffix in fmt.suffixes))
+
+def is_folder_chapters(path):
+    """Whether path is a folder-wide chapters.xml rather than one video's sidecar"""
+    return path.lower().replace("\\", "/").rsplit("/", 1)[-1] == FOLDER_CHAPTERS
+
+def format_for_path(path):
+    """Name of the format whose suffix matches the file name (longest match wins), or None"""
+    if is_folder_chapters(path):
+        return "xml"
+    lower = path.lower()
+    best, best_length = None, 0
+    for fmt in FORMATS.values():
+        for suffix in fmt.suffixes:
+            if lower.endswith(suffix) and len(suffix) > best_length:
+                best, best_length = fmt.name, len(suffix)
+    return best
+
+def sniff_format(head, path=None, preferred=None):
+    """Decide a sidecar's format from its first bytes; the expected (or suffix's) format is tried first"""
+    head = head.lstrip("\ufeff")
+    preferred = preferred if preferred in FORMATS else (format_for_path(path) if path else None)
+    candidates = ([FORMATS[preferred]] if preferred else []) + [f for f in FORMATS.values() if f.name != preferred]
+    for fmt in candidates:
+        try:
+            if fmt.sniff(head):
+                return fmt.name
+        except Exception:
+            continue
+    return None
+
+def is_sidecar_content(content, path, kind):
+    """True if the file's head sniffs as the format its name claims (a .txt may be anything)"""
+    return sniff_format(content[:HEAD_BYTES], path, kind) == kind
+
+def file_is_sidecar(path, kind):
+    """True if the file exists and its head sniffs as kind (one ranged read)"""
+    try:
+        head, _ = read_head(path)
+    except Exception:
+        return False
+    return bool(head.strip()) and is_sidecar_content(head, path, kind)
+
+def can_replace(path, kind):
+    """True if a save or delete of a kind sidecar may touch path: it is missing, empty or sniffs as kind"""
+    if not xbmcvfs.exists(path):
+        return True
+    try:
+        head, _ = read_head(path)
+    except Exception as e:
+        log(f"⚠️ Could not read {path}: {e}")
+        return False
+    return not head.strip() or is_sidecar_content(head, path, kind)
+
+def read_head(path, size=HEAD_BYTES):
+    """Read up to size bytes. Returns (text, complete) where complete means the whole file was read."""
+    f = xbmcvfs.File(path)
+    try:
+        data = bytes(f.readBytes(size))
+    finally:
+        f.close()
+    return data.decode("utf-8", errors="replace"), len(data) < size
+
+def read_sidecar(path, action_mapping=None, kind=None):
+    """Read, sniff and parse a sidecar, with a single read when it fits in HEAD_BYTES.
+
+    Returns (format_name, segments); format_name is None if no format recognises the file.
+    """
+    try:
+        head, complete = read_head(path)
+    except Exception as e:
+        log(f"❌ Failed to read {path}: {e}")
+        return None, []
+    kind = sniff_format(head, path, kind) if head else None
+    if not kind:
+        return None, []
+    content = head if complete else safe_file_read(path)
+    if not content:
+        return kind, []
+    try:
+        return kind, FORMATS[kind].parse(content, action_mapping)
+    except Exception as e:
+        log(f"❌ {FORMATS[kind].label} parse failed for {path}: {e}")
+        return kind, []
+
+def _data_lines(head, limit=3):
+    """First few non-empty, non-comment lines"""
+    lines = []
+    for line in head.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            lines.append(line)
+            if len(lines) >= limit:
+                break
+    return lines
+
+# --- Kodi EDL / MPlayer EDL ---
+
+_EDL_LINE = re.compile(r"^[\d:.]+\s+[\d:.]+(\s+-?\d+)?$")
+_MPLAYER_LINE = re.compile(r"^[\d.]+\s+[\d.]+\s+[01]$")
+
+def _sniff_edl(head):
+    lines = _data_lines(head)
+    return bool(lines) and all(_EDL_LINE.match(line) for line in lines)
+
+def _sniff_mplayer(head):
+    lines = _data_lines(head)
+    return bool(lines) and all(_MPLAYER_LINE.match(line) for line in lines)
+
+def format_mplayer(segments, action_mapping=None):
+    """MPlayer EDL only knows skip (0) and mute (1); everything else becomes a skip"""
+    return "".join(
+        f"{ms_to_decimal(seg.start_ms)} {ms_to_decimal(seg.end_ms)} {1 if seg.action_type == 1 else 0}\n"
+        for seg in segments
+    )
+
+# --- Comskip ---
+
+_COMSKIP_HEADER = re.compile(r"FILE PROCESSING COMPLETE\s+\d+\s+FRAMES AT\s+(\d+)")
+
+def _sniff_comskip(head):
+    return head.lstrip().startswith("FILE PROCESSING COMPLETE")
+
+def parse_comskip(content, action_mapping=None):
+    """Parse a Comskip .txt frame list; frame numbers are converted with the header's frame rate"""
+    header = _COMSKIP_HEADER.search(content)
+    fps = Fraction(int(header.group(1)), 100) if header and int(header.group(1)) else COMSKIP_DEFAULT_FPS
+    label = (action_mapping or {}).get(COMSKIP_ACTION, "Commercial")
+    segments = []
+    for line in content.splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].isdigit() and parts[1].isdigit():
+            start, end = frames_to_ms(int(parts[0]), fps), frames_to_ms(int(parts[1]), fps)
+            if end >= start:
+                segments.append(SegmentItem.from_ms(start, end, label, source="comskip", action_type=COMSKIP_ACTION))
+    return segments
+
+def format_comskip(segments, action_mapping=None, fps=COMSKIP_DEFAULT_FPS):
+    frames = [(ms_to_frames(seg.start_ms, fps), ms_to_frames(seg.end_ms, fps)) for seg in segments]
+    total = max((end for _, end in frames), default=0)
+    lines = [f"FILE PROCESSING COMPLETE {total:6d} FRAMES AT {int(round(fps * 100)):4d}", "-------------------"]
+    lines.extend(f"{start}\t{end}" for start, end in frames)
+    return "\n".join(lines) + "\n"
+
+# --- FFmetadata ---
+
+_FFMETADATA_ESCAPE = re.compile(r"([=;#\\\n])")
+
+def _sniff_ffmetadata(head):
+    return head.startswith(";FFMETADATA1")
+
+def parse_ffmetadata(content, action_mapping=None):
+    """Parse [CHAPTER] sections of an FFmpeg metadata file"""
+    chapters = []
+    current = None
+    for line in content.splitlines():
+        line = line.rstrip("\r")
+        if line.startswith("["):
+            current = {} if line.strip().upper() == "[CHAPTER]" else None
+            if current is not None:
+                chapters.append(current)
+        elif current is not None and "=" in line and not line.startswith((";", "#")):
+            key, _, value = line.partition("=")
+            current[key.strip().upper()] = re.sub(r"\\(.)", r"\1", value)
+    segments = []
+    for chapter in chapters:
+        try:
+            num, _, den = chapter.get("TIMEBASE", "1/1000").partition("/")
+            timebase = Fraction(int(num), int(den or 1))
+            start = int(round(int(chapter["START"]) * timebase * 1000))
+            end = int(round(int(chapter["END"]) * timebase * 1000))
+            segments.append(SegmentItem.from_ms(start, end, chapter.get("TITLE") or "segment", source="ffmetadata"))
+        except (KeyError, ValueError, ZeroDivisionError) as e:
+            log(f"⚠️ Skipped invalid FFmetadata chapter {chapter}: {e}")
+    return segments
+
+def format_ffmetadata(segments, action_mapping=None):
+    if action_mapping is None:
+        action_mapping = get_action_mapping()
+    lines = [";FFMETADATA1"]
+    for seg in segments:
+        title = _FFMETADATA_ESCAPE.sub(r"\\\1", chapter_label(seg, action_mapping))
+        lines.extend(["[CHAPTER]", "TIMEBASE=1/1000", f"START={seg.start_ms}", f"END={seg.end_ms}", f"title={title}"])
+    return "\n".join(lines) + "\n"
+
+# --- WebVTT chapters ---
+
+def _sniff_webvtt(head):
+    return head.startswith("WEBVTT")
+
+def parse_webvtt(content, action_mapping=None):
+    """Parse WebVTT chapter cues; the cue text is the chapter title"""
+    segments = []
+    for block in re.split(r"\r?\n\s*\r?\n", content):
+        lines = [line.strip() for line in block.strip().splitlines()]
+        timing = next((i for i, line in enumerate(lines) if "-->" in line), None)
+        if timing is None:
+            continue
+        start, _, rest = lines[timing].partition("-->")
+        try:
+            segments.append(SegmentItem.from_ms(
+                hms_to_ms(start), hms_to_ms(rest.split()[0]),
+                " ".join(lines[timing + 1:]) or "segment", source="webvtt"
+            ))
+        except (ValueError, IndexError) as e:
+            log(f"⚠️ Skipped invalid WebVTT cue: {lines[timing]} ({e})")
+    return segments
+
+def format_webvtt(segments, action_mapping=None):
+    if action_mapping is None:
+        action_mapping = get_action_mapping()
+    blocks = ["WEBVTT"]
+    for number, seg in enumerate(segments, 1):
+        blocks.append(f"{number}\n{ms_to_hms(seg.start_ms)} --> {ms_to_hms(seg.end_ms)}\n{chapter_label(seg, action_mapping)}")
+    return "\n\n".join(blocks) + "\n"
+
+register_format(SidecarFormat(
+    "xml", "Chapter XML", CHAPTER_SUFFIXES, lambda head: "<Chapters" in head,
+    lambda content, action_mapping=None: parse_chapters_content(content), format_chapters,
+    save=lambda video_path, segments, path=None, edition=None, document=None: save_chapters(
+        video_path, segments, edition, document, path
+    )
+))
+register_format(SidecarFormat("webvtt", "WebVTT chapters", (".chapters.vtt", "-chapters.vtt"), _sniff_webvtt, parse_webvtt, format_webvtt))
+register_format(SidecarFormat("ffmetadata", "FFmetadata", (".ffmetadata",), _sniff_ffmetadata, parse_ffmetadata, format_ffmetadata))
+register_format(SidecarFormat(
+    "edl", "EDL", (".edl",), _sniff_edl,
+    lambda content, action_mapping=None: parse_edl_content(content, action_mapping=action_mapping), format_edl,
+    save=lambda video_path, segments, path=None, **_: save_edl(video_path, segments, path)
+))
+register_format(SidecarFormat(
+    "comskip", "Comskip", (".txt",), _sniff_comskip, parse_comskip, format_comskip, sniff_required=True
+))
+register_format(SidecarFormat(
+    "mplayer", "MPlayer EDL", (".edl",), _sniff_mplayer,
+    lambda content, action_mapping=None: parse_edl_content(content, source="mplayer", action_mapping=action_mapping),
+    format_mplayer
+))
+
+SAVE_FORMAT_LABELS = {
+    "Auto Detect": "auto",
+    "EDL Only": "edl",
+    "Chapter XML Only": "xml",
+    "Both Formats": "both",
+    "Comskip Only": "comskip",
+    "MPlayer EDL Only": "mplayer",
+    "FFmetadata Only": "ffmetadata",
+    "WebVTT Chapters Only": "webvtt",
+}
+
+def get_save_format():
+    """The save_format setting as a format name, "both" or "auto" """
+    raw = get_addon().getSetting("save_format") or ""
+    return SAVE_FORMAT_LABELS.get(raw, raw.lower() or "auto")
+
+def resolve_save_kinds(segments, save_format, sidecar_kinds=()):
+    """Formats a save writes: the chosen one, EDL + XML for "both", or for "auto"
+    every format the video had sidecars in or the segments came from (EDL if none)"""
+    if save_format == "both":
+        return ["edl", "xml"]
+    if save_format in FORMATS:
+        return [save_format]
+    sources = {kind for seg in segments for kind in (seg.source or "").split("+")}
+    kinds = [name for name in FORMATS if name in sidecar_kinds or name in sources]
+    # MPlayer files share the .edl name with Kodi EDL and are read through it
+    if "edl" in kinds and "mplayer" in kinds:
+        kinds.remove("mplayer")
+    return kinds or ["edl"]
+
+def route_segments(segments, kinds):
+    """Split a merged timeline back into {format: segments} by each segment's source.
+
+    A segment goes to every listed format named in its source ("xml+edl" goes
+    to both); one from anywhere else (typed in, imported, embedded chapters)
+    goes to the first format. MPlayer segments follow the .edl file; segments
+    of formats that aren't listed are left out.
+    """
+    routed = {kind: [] for kind in kinds}
+    for seg in segments:
+        sources = (seg.source or "").split("+")
+        targets = [kind for kind in sources if kind in routed]
+        if "mplayer" in sources and "mplayer" not in routed and "edl" in routed:
+            targets.append("edl")
+        if not targets and not any(kind in FORMATS for kind in sources):
+            targets = kinds[:1]
+        for kind in targets:
+            routed[kind].append(seg)
+    return routed
+
+def save_video_segments(video_path, segments, save_format="auto", sidecars=None, edition=None, document=None):
+    """The single write path for the editor and the service. Returns {format_name: success}.
+
+    With "auto" each sidecar gets only the segments that came from it, so
+    merging EDL and chapter XML into one timeline doesn't copy commercial
+    breaks into the chapters or chapters into the EDL. An explicit format or
+    "both" writes the whole timeline.
+    """
+    sidecars = sidecars or {}
+    kinds = resolve_save_kinds(segments, save_format, sidecars)
+    if save_format == "both" or save_format in FORMATS:
+        routed = {kind: segments for kind in kinds}
+    else:
+        routed = route_segments(segments, kinds)
+    results = {}
+    for kind in kinds:
+        results[kind] = FORMATS[kind].save(
+            video_path, routed[kind], path=sidecars.get(kind), edition=edition, document=document
+        )
+    log(f"💾 Saved {video_path} as {', '.join(k for k, ok in results.items() if ok) or 'nothing'}")
+    return results
+
+def delete_video_sidecars(video_path, save_format="auto", sidecars=None):
+    """Remove the sidecars a save would have written, for when every segment was deleted"""
+    base = video_path.rsplit(".", 1)[0]
+    kinds = ["edl", "xml"] + list(sidecars or {}) if save_format == "auto" else resolve_save_kinds([], save_format)
+    deleted = []
+    for kind in dict.fromkeys(kinds):
+        for path in (f"{base}{suffix}" for suffix in FORMATS[kind].suffixes):
+            if path not in deleted and xbmcvfs.exists(path) and can_replace(path, kind):
+                try:
+                    xbmcvfs.delete(path)
+                    deleted.append(path)
+                    log(f"🗑️ Deleted empty segment file: {path}")
+                except Exception:
+                    pass
+    return deleted
@@ -0,0 +1,145 @@
+"""
+Optimistic concurrency for sidecars edited from several Kodi clients.
+
+When the editor opens, the sidecar it loaded from is stat'ed once and the
+loaded segments are kept as the merge base. At save time a single stat tells
+whether another client wrote the file in the meantime; only then is it read
+and parsed, and the editor offers a three-way merge instead of overwriting.
+While the editor is open, the same check runs at an adaptive interval
+(SidecarPoller) so external rewrites show up without reopening it.
+
+Changes are compared by content (parsed segments) rather than by a hash of
+the file, so a sidecar that was merely touched or rewritten with different
+formatting doesn't raise a conflict.
+"""
+import os
+import threading
+import time
+
+import xbmcvfs
+
+from segment_parser import safe_file_read, get_action_mapping, segment_key, parse_chapters_content
+from library import sidecar_kind, parse_sidecar_content, format_sidecar_content, join_path, sibling_dir
+from sidecar_formats import format_names, route_segments, CHAPTER_SUFFIXES
+from utils import log
+
+MISSING = (0, 0)
+
+# Live-reload polling interval: starts short, doubles while the file stays unchanged
+POLL_MIN_SECONDS = 5
+POLL_MAX_SECONDS = 60
+
+def stat_once(path):
+    """Return (size, mtime) with a single VFS call; (0, 0) when the file doesn't exist"""
+    try:
+        st = xbmcvfs.Stat(path)
+        return st.st_size(), st.st_mtime()
+    except Exception:
+        return MISSING
+
+def tracked_sidecar(video_path, segments, sidecars=None):
+    """The sidecar the editor's segments were loaded from (the .edl if none was).
+
+    sidecars is the {format: path} mapping found when loading; without it the
+    chapter XML names are probed.
+    """
+    base = os.path.splitext(video_path)[0]
+    if sidecars:
+        sources = {kind for seg in segments or [] for kind in (seg.source or "").split("+")}
+        for kind in format_names():
+            if kind in sidecars and kind in sources:
+                return sidecars[kind]
+    elif any("xml" in (seg.source or "") for seg in segments or []):
+        candidates = [f"{base}{suffix}" for suffix in CHAPTER_SUFFIXES]
+        candidates.append(join_path(sibling_dir(video_path), "chapters.xml"))
+        for path in candidates:
+            if xbmcvfs.exists(path):
+                return path
+    return f"{base}.edl"
+
+class SidecarState:
+    """What the editor knows about its sidecar: path, (size, mtime) and the segments last loaded/saved"""
+
+    def __init__(self, path, stat, base, edition=None):
+        self.path = path
+        self.stat = stat
+        self.base = base
+        self.edition = edition  # Chapter XML edition being edited (default edition if None)
+        self.disk_stat = stat  # Stat of the version detect_concurrent_change last returned
+
+def capture_sidecar_state(video_path, segments, sidecars=None):
+    """Remember the loaded sidecar's stat and segments; called once when the editor opens"""
+    path = tracked_sidecar(video_path, segments, sidecars)
+    state = SidecarState(path, stat_once(path), [seg.copy_with() for seg in segments or []])
+    log(f"🔒 Tracking {os.path.basename(path)} for concurrent edits ({state.stat})")
+    return state
+
+def detect_concurrent_change(state):
+    """Return the other client's segments if the sidecar changed since load/save, else None.
+
+    Costs one stat when nothing changed; the file is only read when it did.
+    An "auto" save writes each sidecar only the segments that came from it,
+    so the file is compared with that part of the base, and the returned
+    timeline keeps the base's segments that live in the other sidecars.
+    """
+    stat = stat_once(state.path)
+    if stat == state.stat:
+        return None
+    kind = sidecar_kind(state.path)
+    ours = route_segments(state.base, [kind])[kind]
+    others = [seg for seg in state.base if not any(seg is mine for mine in ours)]
+    action_mapping = get_action_mapping()
+    content = safe_file_read(state.path) if stat != MISSING else None
+    if not content:
+        theirs = []
+    elif kind == "xml":
+        theirs = parse_chapters_content(content, edition=state.edition)
+    else:
+        theirs = parse_sidecar_content(kind, content, action_mapping)
+    # A sidecar format may not keep everything (EDL has no labels), so match the
+    # file against the base as the base itself would read back from that format
+    as_written = {}
+    for seg in ours:
+        for written in parse_sidecar_content(kind, format_sidecar_content(kind, [seg], action_mapping), action_mapping):
+            as_written.setdefault(segment_key(written), seg)
+    theirs = [as_written.get(segment_key(seg), seg) for seg in theirs]
+    if sorted(map(segment_key, theirs)) == sorted(map(segment_key, ours)):
+        # Touched or reformatted, but the segments are the same
+        state.stat = stat
+        return None
+    log(f"🔀 {os.path.basename(state.path)} changed on disk since it was loaded ({state.stat} -> {stat})")
+    state.disk_stat = stat
+    return sorted(theirs + others, key=lambda s: (s.start_ms, s.end_ms))
+
+def rebase_on_disk(state, theirs):
+    """Make the on-disk version returned by detect_concurrent_change the new merge base"""
+    state.base = [seg.copy_with() for seg in theirs]
+    state.stat = state.disk_stat
+
+def mark_saved(state, segments):
+    """Make the saved segments the new merge base and refresh the stat off the UI thread"""
+    state.base = [seg.copy_with() for seg in segments]
+
+    def refresh():
+        state.stat = stat_once(state.path)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+class SidecarPoller:
+    """Decides when the open editor should re-check its sidecar.
+
+    The interval doubles from POLL_MIN_SECONDS up to POLL_MAX_SECONDS while
+    nothing changes and drops back to the minimum after a change, so an idle
+    editor costs one stat a minute.
+    """
+
+    def __init__(self):
+        self.interval = POLL_MIN_SECONDS
+        self.next_check = time.time() + self.interval
+
+    def due(self):
+        return time.time() >= self.next_check
+
+    def checked(self, changed):
+        self.interval = POLL_MIN_SECONDS if changed else min(self.interval * 2, POLL_MAX_SECONDS)
+        self.next_check = time.time() + self.interval
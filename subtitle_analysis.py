@@ -0,0 +1,185 @@
+"""
+Segment suggestions from sidecar subtitles (.srt / .ass / .ssa).
+
+Subtitles are streamed through xbmcvfs in chunks and parsed line by line;
+only the cues near the start and the end of the episode are kept. Recaps
+start at a "Previously on..." cue, intros and credits show up as runs of
+song lyrics (♪) or as long dialogue gaps.
+"""
+import re
+from collections import deque
+
+import xbmcvfs
+
+from segment_parser import SegmentItem
+from library import list_directory, sibling_dir, join_path, path_separator
+from utils import log, iter_lines
+
+SUBTITLE_EXTENSIONS = (".srt", ".ass", ".ssa")
+READ_CHUNK_SIZE = 64 * 1024
+
+# Only cues in these windows are kept while streaming
+OPENING_WINDOW_MS = 15 * 60 * 1000
+CLOSING_CUES = 40
+
+# A silence at least this long ends a recap / song run
+GAP_MS = 4000
+# Silent stretches in the opening window between these lengths look like an intro without lyrics
+SILENT_INTRO_MIN_MS = 20000
+SILENT_INTRO_MAX_MS = 150000
+# Silence after the last cue longer than this is treated as credits
+SILENT_CREDITS_MIN_MS = 30000
+
+RECAP_PATTERN = re.compile(r"previously\s+on|last\s+time\s+on|what\s+happened\s+before|bisher\s+bei|précédemment", re.I)
+MUSIC_PATTERN = re.compile(r"[♪♫♬]")
+MUSIC_STYLES = ("op", "ed", "song", "opening", "ending", "karaoke", "lyrics")
+
+SRT_TIME = re.compile(r"(\d+):(\d{2}):(\d{2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{1,3})")
+ASS_TAGS = re.compile(r"\{[^}]*\}")
+HTML_TAGS = re.compile(r"<[^>]+>")
+
+def find_subtitles(video_path):
+    """Return subtitle sidecars for a video (e.g. Show.S01E01.en.srt), .srt first"""
+    directory = sibling_dir(video_path)
+    base = video_path.rsplit(path_separator(video_path), 1)[-1].rsplit(".", 1)[0]
+    _, files = list_directory(directory)
+    matches = [
+        name for name in files
+        if name.startswith(base + ".") and name.lower().endswith(SUBTITLE_EXTENSIONS)
+    ]
+    matches.sort(key=lambda name: (not name.lower().endswith(".srt"), len(name), name))
+    return [join_path(directory, name) for name in matches]
+
+def _clock_ms(h, m, s, frac):
+    return ((int(h) * 60 + int(m)) * 60 + int(s)) * 1000 + int(frac.ljust(3, "0")[:3])
+
+def iter_srt_cues(lines):
+    """Yield (start_ms, end_ms, text, style) from SRT lines"""
+    timing = None
+    text = []
+    for line in lines:
+        match = SRT_TIME.search(line)
+        if match:
+            timing = match.groups()
+            text = []
+        elif not line.strip():
+            if timing:
+                yield _clock_ms(*timing[:4]), _clock_ms(*timing[4:]), HTML_TAGS.sub("", " ".join(text)), ""
+            timing = None
+        elif timing:
+            text.append(line.strip())
+    if timing:
+        yield _clock_ms(*timing[:4]), _clock_ms(*timing[4:]), HTML_TAGS.sub("", " ".join(text)), ""
+
+def _ass_time_ms(value):
+    h, m, rest = value.strip().split(":")
+    s, _, cs = rest.partition(".")
+    return _clock_ms(h, m, s, cs.ljust(2, "0")[:2] + "0")
+
+def iter_ass_cues(lines):
+    """Yield (start_ms, end_ms, text, style) from ASS/SSA Dialogue lines"""
+    fields = None
+    in_events = False
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("["):
+            in_events = stripped.lower() == "[events]"
+            continue
+        if not in_events:
+            continue
+        if stripped.lower().startswith("format:"):
+            fields = [f.strip().lower() for f in stripped[7:].split(",")]
+        elif stripped.startswith("Dialogue:") and fields:
+            values = stripped[9:].split(",", len(fields) - 1)
+            if len(values) != len(fields):
+                continue
+            event = dict(zip(fields, values))
+            try:
+                start_ms, end_ms = _ass_time_ms(event["start"]), _ass_time_ms(event["end"])
+            except (KeyError, ValueError):
+                continue
+            text = ASS_TAGS.sub("", event.get("text", "")).replace("\\N", " ").replace("\\n", " ")
+            yield start_ms, end_ms, text.strip(), event.get("style", "").strip().lower()
+
+def iter_cues(path):
+    """Yield cues from a subtitle file, choosing the parser by extension"""
+    lines = iter_lines(path, READ_CHUNK_SIZE)
+    if path.lower().endswith(".srt"):
+        return iter_srt_cues(lines)
+    return iter_ass_cues(lines)
+
+def is_music_cue(text, style=""):
+    return bool(MUSIC_PATTERN.search(text)) or style in MUSIC_STYLES
+
+def _cue_run(cues, first, predicate):
+    """Extend from cues[first] while predicate holds and no gap exceeds GAP_MS; return (start, end)"""
+    start_ms, end_ms = cues[first][0], cues[first][1]
+    for cue in cues[first + 1:]:
+        if cue[0] - end_ms > GAP_MS or not predicate(cue):
+            break
+        end_ms = max(end_ms, cue[1])
+    return start_ms, end_ms
+
+def suggest_from_cues(opening, closing, duration_ms=None):
+    """Turn the kept opening/closing cues into [(SegmentItem, confidence), ...]"""
+    suggestions = []
+
+    recap_end = 0
+    for i, cue in enumerate(opening):
+        if RECAP_PATTERN.search(cue[2]):
+            start_ms, recap_end = _cue_run(opening, i, lambda c: not is_music_cue(c[2], c[3]))
+            suggestions.append((SegmentItem.from_ms(start_ms, recap_end, "Recap", "subtitles"), 0.8))
+            break
+
+    intro = None
+    for i, cue in enumerate(opening):
+        if cue[0] >= recap_end and is_music_cue(cue[2], cue[3]):
+            intro = _cue_run(opening, i, lambda c: is_music_cue(c[2], c[3]))
+            if intro[1] > intro[0]:
+                suggestions.append((SegmentItem.from_ms(intro[0], intro[1], "Intro", "subtitles"), 0.7))
+            break
+    if intro is None:
+        # No lyrics: the first long silence after the recap (or cold open) is the likeliest intro
+        previous_end = recap_end
+        for cue in opening:
+            if cue[0] < recap_end:
+                continue
+            gap = cue[0] - previous_end
+            if previous_end and SILENT_INTRO_MIN_MS <= gap <= SILENT_INTRO_MAX_MS:
+                suggestions.append((SegmentItem.from_ms(previous_end, cue[0], "Intro", "subtitles"), 0.4))
+                break
+            previous_end = max(previous_end, cue[1])
+
+    closing = list(closing)
+    for i, cue in enumerate(closing):
+        if is_music_cue(cue[2], cue[3]) and all(is_music_cue(c[2], c[3]) for c in closing[i:]):
+            end_ms = duration_ms or closing[-1][1]
+            suggestions.append((SegmentItem.from_ms(cue[0], max(end_ms, cue[1]), "Credits", "subtitles"), 0.6))
+            break
+    else:
+        if closing and duration_ms and duration_ms - closing[-1][1] >= SILENT_CREDITS_MIN_MS:
+            suggestions.append((SegmentItem.from_ms(closing[-1][1], duration_ms, "Credits", "subtitles"), 0.4))
+
+    return suggestions
+
+def suggest_from_subtitles(video_path, duration_ms=None):
+    """Propose segments for a video from its first usable subtitle sidecar"""
+    for path in find_subtitles(video_path):
+        try:
+            opening = []
+            closing = deque(maxlen=CLOSING_CUES)
+            count = 0
+            for cue in iter_cues(path):
+                count += 1
+                if cue[0] < OPENING_WINDOW_MS:
+                    opening.append(cue)
+                closing.append(cue)
+            if not count:
+                continue
+            opening.sort()
+            suggestions = suggest_from_cues(opening, sorted(closing), duration_ms)
+            log(f"💬 {len(suggestions)} subtitle suggestions from {path} ({count} cues)")
+            return suggestions
+        except Exception as e:
+            log(f"⚠️ Could not analyze subtitles {path}: {e}")
+    return []
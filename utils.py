@@ -1,3 +1,5 @@
+import codecs
+import os
 import xbmc
 import xbmcaddon
 import xbmcvfs
@@ -33,3 +35,83 @@ def get_video_file():
     
     return None
 
+
+def stat_file(path):
+    """Return (size, mtime) for a file via the VFS, or None if it can't be stat'ed"""
+    try:
+        if not xbmcvfs.exists(path):
+            return None
+        st = xbmcvfs.Stat(path)
+        return st.st_size(), st.st_mtime()
+    except Exception:
+        return None
+
+def get_profile_path(*parts):
+    """Return a path inside the addon's profile (userdata) directory, creating it if needed"""
+    addon = get_addon()
+    profile = xbmcvfs.translatePath(addon.getAddonInfo('profile'))
+    if not xbmcvfs.exists(profile):
+        xbmcvfs.mkdirs(profile)
+    return os.path.join(profile, *parts)
+
+def iter_lines(path, chunk_size=64 * 1024):
+    """Stream a UTF-8 text file through the VFS line by line without loading it whole"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    f = xbmcvfs.File(path)
+    try:
+        pending = ""
+        while True:
+            chunk = f.readBytes(chunk_size)
+            if not chunk:
+                break
+            pending += decoder.decode(bytes(chunk))
+            lines = pending.split("\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line.rstrip("\r")
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            yield pending.rstrip("\r")
+    finally:
+        f.close()
+
+class BufferedVFSWriter:
+    """Write text to a VFS file in large blocks; network filesystems pay per write call"""
+
+    def __init__(self, path, buffer_size=1024 * 1024):
+        self.path = path
+        self.buffer_size = buffer_size
+        self._parts = []
+        self._pending = 0
+        self.bytes_written = 0
+        self._file = xbmcvfs.File(path, "w")
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self._parts.append(data)
+        self._pending += len(data)
+        if self._pending >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self._parts:
+            return
+        data = b"".join(self._parts)
+        if self._file.write(data) is False:
+            raise IOError(f"write failed: {self.path}")
+        self.bytes_written += len(data)
+        self._parts = []
+        self._pending = 0
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,166 @@
+"""
+Library-wide segment validation.
+
+Every sidecar under the library roots is checked for reversed, zero-length,
+nested, overlapping, out-of-duration and unknown-action segments; results
+are written to a text report sorted by severity. Results are stored in the
+segment index keyed by the sidecar's and video's size/mtime, so a nightly
+run over a large library only re-reads files that changed since the last run.
+"""
+import json
+import time
+import xml.etree.ElementTree as ET
+
+from segment_parser import (
+    safe_file_read, hms_to_ms, validate_segments, get_action_mapping,
+    SEVERITY_ERROR, SEVERITY_ORDER
+)
+from library import (
+    walk_directories, group_sidecars, parallel_map, parse_sidecar_content, segments_to_json,
+    DEFAULT_WORKERS
+)
+from media_probe import get_video_duration_ms
+from segment_index import get_index
+from utils import log, log_always, stat_file, get_profile_path, BufferedVFSWriter
+
+REPORT_FILENAME = "validation_report.txt"
+# Results are committed to the index in chunks so an interrupted run keeps its progress
+CHUNK_SIZE = 1000
+
+def find_reversed(kind, content):
+    """Return messages for entries whose end is before their start.
+
+    The parsers drop such entries, so this looks at the raw sidecar text.
+    """
+    issues = []
+    if kind == "xml":
+        try:
+            root = ET.fromstring(content.encode("utf-8"))
+        except ET.ParseError as e:
+            return [f"invalid chapter XML: {e}"]
+        for number, atom in enumerate(root.iter("ChapterAtom"), 1):
+            start, end = atom.findtext("ChapterTimeStart"), atom.findtext("ChapterTimeEnd")
+            try:
+                if start and end and hms_to_ms(end) < hms_to_ms(start):
+                    issues.append(f"chapter {number} ends ({end}) before it starts ({start})")
+            except ValueError:
+                issues.append(f"chapter {number} has an invalid time")
+        return issues
+    if kind not in ("edl", "mplayer"):
+        # The other formats' parsers already skip entries they can't read
+        return issues
+
+    for number, line in enumerate(content.splitlines(), 1):
+        parts = line.split()
+        if len(parts) < 2 or line.lstrip().startswith("#"):
+            continue
+        try:
+            if hms_to_ms(parts[1]) < hms_to_ms(parts[0]):
+                issues.append(f"line {number} ends ({parts[1]}) before it starts ({parts[0]})")
+        except ValueError:
+            issues.append(f"line {number} has an invalid time")
+    return issues
+
+def validate_sidecar(video_path, kind, path, action_mapping=None):
+    """Validate one sidecar. Returns (issues, segments) where issues are (severity, message)."""
+    content = safe_file_read(path)
+    if not content:
+        return [(SEVERITY_ERROR, "empty or unreadable")], []
+    issues = [(SEVERITY_ERROR, message) for message in find_reversed(kind, content)]
+    segments = parse_sidecar_content(kind, content, action_mapping)
+    duration_ms = get_video_duration_ms(video_path)
+    issues.extend((severity, message) for _, severity, message in validate_segments(segments, duration_ms, action_mapping))
+    return issues, segments
+
+def check_video(video_path, sidecars, full=False, action_mapping=None):
+    """Validate a video's sidecars, reusing stored results for unchanged files.
+
+    Returns {"video", "issues": [{"severity", "sidecar", "message"}], "checked",
+    "skipped", "rows"} where rows are new index entries to store.
+    """
+    result = {"video": video_path, "issues": [], "checked": 0, "skipped": 0, "rows": []}
+    index = get_index()
+    video_stat = stat_file(video_path)
+    for kind, path in sorted(sidecars.items()):
+        try:
+            sidecar_stat = stat_file(path)
+            cached = index.get_validation(path, sidecar_stat, video_stat) if (index and sidecar_stat and not full) else None
+            if cached is not None:
+                issues = json.loads(cached)
+                result["skipped"] += 1
+            else:
+                issues, segments = validate_sidecar(video_path, kind, path, action_mapping)
+                result["checked"] += 1
+                if index and sidecar_stat:
+                    result["rows"].append((path, sidecar_stat, video_stat, json.dumps(issues)))
+                    # Warm the parse cache for the season analysis and API reads too
+                    index.set_sidecar_segments(path, *sidecar_stat, segments_to_json(segments))
+            result["issues"].extend(
+                {"severity": severity, "sidecar": path, "message": message} for severity, message in issues
+            )
+        except Exception as e:
+            log(f"❌ Validation failed for {path}: {e}")
+            result["issues"].append({"severity": SEVERITY_ERROR, "sidecar": path, "message": f"validation failed: {e}"})
+    return result
+
+def write_report(path, issues, summary):
+    """Write the issues sorted by severity, then sidecar path"""
+    issues.sort(key=lambda issue: (SEVERITY_ORDER.get(issue["severity"], 99), issue["sidecar"], issue["message"]))
+    with BufferedVFSWriter(path) as writer:
+        writer.write(f"Segment validation report - {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        writer.write(
+            f"{summary['errors']} errors, {summary['warnings']} warnings in {summary['videos_with_issues']} "
+            f"of {summary['videos']} videos ({summary['checked']} sidecars checked, {summary['skipped']} unchanged)\n\n"
+        )
+        for issue in issues:
+            writer.write(f"{issue['severity'].upper():<8}{issue['sidecar']}: {issue['message']}\n")
+
+def validate_library(roots, report_path=None, full=False, max_workers=DEFAULT_WORKERS * 2):
+    """Validate every sidecar under roots and write a severity-sorted report.
+
+    Unless full=True, sidecars whose size/mtime (and their video's) match the
+    previous run are not re-read. Returns a summary dict including the
+    report path.
+    """
+    if isinstance(roots, str):
+        roots = [roots]
+    report_path = report_path or get_profile_path(REPORT_FILENAME)
+    started = time.time()
+    action_mapping = get_action_mapping()
+    index = get_index()
+
+    summary = {"videos": 0, "videos_with_issues": 0, "checked": 0, "skipped": 0,
+               "errors": 0, "warnings": 0, "report": report_path}
+    issues = []
+
+    def run(jobs):
+        results = parallel_map(lambda job: check_video(job[0], job[1], full, action_mapping), jobs, max_workers)
+        rows = [row for r in results for row in r["rows"]]
+        if index and rows:
+            index.set_validations(rows)
+        for r in results:
+            summary["videos"] += 1
+            summary["checked"] += r["checked"]
+            summary["skipped"] += r["skipped"]
+            if r["issues"]:
+                summary["videos_with_issues"] += 1
+            issues.extend(r["issues"])
+
+    jobs = []
+    for root in roots:
+        for directory, _, files in walk_directories(root):
+            jobs.extend((video, sidecars) for video, sidecars in group_sidecars(directory, files) if sidecars)
+            if len(jobs) >= CHUNK_SIZE:
+                run(jobs)
+                jobs = []
+    if jobs:
+        run(jobs)
+
+    summary["errors"] = sum(1 for issue in issues if issue["severity"] == SEVERITY_ERROR)
+    summary["warnings"] = len(issues) - summary["errors"]
+    write_report(report_path, issues, summary)
+    log_always(
+        f"🩺 Validated {summary['videos']} videos in {time.time() - started:.1f}s: {summary['errors']} errors, "
+        f"{summary['warnings']} warnings ({summary['skipped']} unchanged sidecars skipped) - report: {report_path}"
+    )
+    return summary
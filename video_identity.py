@@ -0,0 +1,125 @@
+"""
+Content-based video identity, so segments survive renames and moves.
+
+A fingerprint is the file size plus a SHA-1 of the first and last 64KB, read
+with two ranged reads - never the whole file. Sidecar snapshots are stored in
+the segment index under the fingerprint, so a renamed or moved video can have
+its sidecars re-materialized next to the new path.
+"""
+import hashlib
+import os
+import threading
+
+import xbmcvfs
+
+from segment_parser import safe_file_read, safe_file_write
+from sidecar_formats import all_suffixes, format_for_path, is_sidecar_content
+from segment_index import get_index
+from utils import log, log_always, stat_file
+
+FINGERPRINT_CHUNK = 64 * 1024
+
+# Sidecar suffixes (appended to the video path without extension) that are snapshotted
+SIDECAR_SUFFIXES = all_suffixes()
+
+def compute_fingerprint(video_path, size=None):
+    """Return "<size hex>-<sha1>" from the first and last 64KB of the file (bounded I/O)"""
+    f = xbmcvfs.File(video_path)
+    try:
+        if size is None:
+            size = f.size()
+        digest = hashlib.sha1()
+        digest.update(bytes(f.readBytes(FINGERPRINT_CHUNK)))
+        if size > FINGERPRINT_CHUNK:
+            f.seek(max(FINGERPRINT_CHUNK, size - FINGERPRINT_CHUNK), 0)
+            digest.update(bytes(f.readBytes(FINGERPRINT_CHUNK)))
+    finally:
+        f.close()
+    return f"{size:x}-{digest.hexdigest()}"
+
+def get_video_fingerprint(video_path):
+    """Return the fingerprint of a video, cached in the segment index by size/mtime"""
+    stat = stat_file(video_path)
+    if not stat:
+        return None
+    index = get_index()
+    if index:
+        row = index.get_fresh_video(video_path, *stat)
+        if row and row.get("fingerprint"):
+            return row["fingerprint"]
+    try:
+        fingerprint = compute_fingerprint(video_path, stat[0])
+    except Exception as e:
+        log(f"⚠️ Could not fingerprint {video_path}: {e}")
+        return None
+    if index:
+        index.update_video(video_path, *stat, fingerprint=fingerprint)
+    return fingerprint
+
+def read_sidecars(video_path):
+    """Read the sidecars next to a video. Returns {suffix: content}.
+
+    Files whose content isn't the format their suffix names (a notes .txt)
+    are left out, so a recovery never writes them back as sidecars.
+    """
+    base = os.path.splitext(video_path)[0]
+    sidecars = {}
+    for suffix in SIDECAR_SUFFIXES:
+        path = f"{base}{suffix}"
+        if xbmcvfs.exists(path):
+            content = safe_file_read(path)
+            if content and is_sidecar_content(content, path, format_for_path(path)):
+                sidecars[suffix] = content
+    return sidecars
+
+def snapshot_sidecars(video_path):
+    """Store the video's current sidecars in the index under its fingerprint"""
+    try:
+        index = get_index()
+        if not index:
+            return False
+        sidecars = read_sidecars(video_path)
+        if not sidecars:
+            return False
+        fingerprint = get_video_fingerprint(video_path)
+        if not fingerprint:
+            return False
+        index.set_fingerprint_sidecars(fingerprint, video_path, sidecars)
+        log(f"🧬 Snapshotted {len(sidecars)} sidecars for {os.path.basename(video_path)} ({fingerprint})")
+        return True
+    except Exception as e:
+        log(f"⚠️ Could not snapshot sidecars for {video_path}: {e}")
+        return False
+
+def recover_sidecars(video_path):
+    """Re-materialize sidecars for a renamed/moved video found by fingerprint.
+
+    Returns the list of sidecar paths written (empty if nothing was found).
+    """
+    index = get_index()
+    if not index:
+        return []
+    fingerprint = get_video_fingerprint(video_path)
+    if not fingerprint:
+        return []
+    sidecars, previous_path = index.get_fingerprint_sidecars(fingerprint)
+    if not sidecars or previous_path == video_path:
+        return []
+
+    log_always(f"🧬 Found segments for {os.path.basename(video_path)} by content hash (was {previous_path})")
+    base = os.path.splitext(video_path)[0]
+    written = []
+    for suffix, content in sidecars.items():
+        path = f"{base}{suffix}"
+        if xbmcvfs.exists(path):
+            continue
+        success, _ = safe_file_write(path, content)
+        if success:
+            written.append(path)
+    if written:
+        index.set_fingerprint_sidecars(fingerprint, video_path, sidecars)
+    return written
+
+def snapshot_sidecars_async(video_path):
+    """Snapshot sidecars on a background thread (never delays the caller)"""
+    threading.Thread(target=snapshot_sidecars, args=(video_path,), daemon=True).start()
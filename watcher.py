@@ -0,0 +1,121 @@
+"""
+Incremental library watcher.
+
+Periodically walks the configured library roots and indexes new or changed
+segment sidecars (parse cache in the segment index), so files dropped in by
+comskip or intro detectors are known before anyone opens the editor.
+
+Each directory's mtime and subdirectory names are stored in the index.
+A directory whose mtime hasn't changed is not listed again; the walk only
+stats it and descends into its recorded subdirectories. After the first
+run, a scan costs one stat per directory plus listings of the directories
+that actually changed. Creating, deleting or renaming a file updates its
+directory's mtime; sidecars rewritten in place are picked up when the
+editor or a batch tool next reads them.
+"""
+import time
+
+import xbmcvfs
+
+from segment_parser import get_action_mapping
+from library import (
+    list_directory, join_path, path_separator, group_sidecars, parallel_map, read_sidecar_segments,
+    checkpoint, DEFAULT_WORKERS
+)
+from segment_index import get_index
+from jobs import Job, PRIORITY_LOW
+from utils import get_addon, log, log_always
+
+DEFAULT_INTERVAL_MINUTES = 15
+
+def get_library_roots():
+    """Library roots from settings ('|'-separated, since VFS URLs may contain commas)"""
+    raw = get_addon().getSetting("library_roots") or ""
+    return [root.strip() for root in raw.split("|") if root.strip()]
+
+def directory_mtime(path):
+    """Return a directory's mtime through the VFS, or None if it is gone / can't be stat'ed"""
+    sep = path_separator(path)
+    try:
+        if not xbmcvfs.exists(path if path.endswith(sep) else path + sep):
+            return None
+        return xbmcvfs.Stat(path).st_mtime()
+    except Exception:
+        return None
+
+def scan_roots(roots, max_workers=DEFAULT_WORKERS):
+    """Walk roots, listing only changed directories, and index their sidecars.
+
+    Returns a summary dict with directory and sidecar counts.
+    """
+    index = get_index()
+    if not index:
+        return None
+    started = time.time()
+    summary = {"directories": 0, "listed": 0, "removed": 0, "sidecars": 0}
+    action_mapping = get_action_mapping()
+    pending = list(roots)
+    while pending:
+        checkpoint()
+        directory = pending.pop(0)
+        summary["directories"] += 1
+        mtime = directory_mtime(directory)
+        if mtime is None:
+            index.delete_directory(directory, join_path(directory, ""))
+            summary["removed"] += 1
+            continue
+
+        recorded = index.get_directory(directory)
+        # mtime 0 means the VFS doesn't report it, so the directory is always listed
+        if recorded and mtime and recorded[0] == mtime:
+            pending.extend(join_path(directory, name) for name in recorded[1])
+            continue
+
+        dirs, files = list_directory(directory)
+        summary["listed"] += 1
+        sidecars = [
+            (kind, path)
+            for _, found in group_sidecars(directory, files)
+            for kind, path in found.items()
+        ]
+        # read_sidecar_segments only parses files whose size/mtime changed since they were cached
+        parallel_map(lambda item: read_sidecar_segments(item[1], item[0], action_mapping), sidecars, max_workers)
+        summary["sidecars"] += len(sidecars)
+        subdirs = sorted(dirs)
+        index.set_directory(directory, mtime, subdirs)
+        pending.extend(join_path(directory, name) for name in subdirs)
+
+    log_always(
+        f"👀 Library scan: {summary['directories']} directories, {summary['listed']} listed, "
+        f"{summary['sidecars']} sidecars indexed in {time.time() - started:.1f}s"
+    )
+    return summary
+
+class LibraryWatcher:
+    """Schedules scan_roots on the job scheduler every watch interval"""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.job = None
+        self.last_run = 0
+
+    def interval_seconds(self):
+        try:
+            minutes = get_addon().getSettingInt("watch_interval")
+        except Exception:
+            minutes = 0
+        return (minutes or DEFAULT_INTERVAL_MINUTES) * 60
+
+    def tick(self):
+        """Called from the service loop; queues a scan when one is due and none is running"""
+        if self.job and self.job.status in (Job.QUEUED, Job.RUNNING):
+            return
+        if time.time() - self.last_run < self.interval_seconds():
+            return
+        roots = get_library_roots()
+        if not roots:
+            return
+        self.last_run = time.time()
+        # Low priority: never starts or continues while a video is playing
+        self.job = self.scheduler.submit(scan_roots, roots, name="library scan", priority=PRIORITY_LOW)
+        log(f"👀 Library scan queued for {len(roots)} roots")